@@ -0,0 +1,532 @@
+"""
+Combat styles compiled into per-character action tables.
+
+A combat style (melee_combat_styles.py, ranged_combat_styles.py) trains a set of weapon subskills
+from player.py: it adjusts hit chance and damage with those weapons, widens the critical range,
+changes the wielder's Dodge and grappling defense, and adds maneuvers. A maneuver is a special
+attack: an aimed shot, a trip, a grapple.
+
+Walking these rules for every swing is too slow for large battles, so they are compiled once per
+character into an ActionTable. Each row is one (style, weapon, maneuver) the character can use,
+holding its final attack bonus, critical threshold and the cumulative distributions of its normal
+and critical damage. Resolving an attack is then a row lookup, a d20 and one uniform draw mapped
+through the damage distribution. Recompile the table when the character's stats, styles or
+weapons change.
+
+Attacks resolve as in encounter_simulation: d20 + attack bonus against 10 + the defender's Dodge
+(natural 1 always misses, natural 20 always hits). Contested maneuvers such as grapples skip Dodge
+and are an opposed roll of d20 + the attacker's contest bonus against d20 + the defender's
+grappling defense.
+"""
+
+
+from functools import lru_cache
+from typing import Any, Iterable
+
+import numpy as np
+
+
+DODGE_BASE: int = 10
+GRAPPLING_STAT: str = "Strength.Combat.Grappling"
+DODGE_STAT: str = "Agility.Dodge"
+ACROBATICS_STAT: str = "Agility.Acrobatics"
+
+
+class Weapon:
+    """A weapon, tied to the subskill that governs it."""
+    __slots__ = ("name", "category", "subskill", "dice_count", "dice_sides", "damage_bonus", "reach")
+
+    def __init__(
+            self,
+            name: str,
+            category: str,
+            subskill: str,
+            dice_count: int,
+            dice_sides: int,
+            damage_bonus: int = 0,
+            reach: int = 5
+        ) -> None:
+        """Initialize a Weapon instance.
+
+        Args:
+            name (str):
+                The weapon's name.
+            category (str):
+                "Melee" or "Ranged".
+            subskill (str):
+                The weapon subskill under Agility.<category> Attack, such as "Swords".
+            dice_count (int):
+                The number of damage dice.
+            dice_sides (int):
+                The sides on each damage die.
+            damage_bonus (int, optional):
+                Flat damage added on a hit. Defaults to 0.
+            reach (int, optional):
+                Reach or range in feet. Defaults to 5.
+        """
+        self.name: str = name
+        self.category: str = category
+        self.subskill: str = subskill
+        self.dice_count: int = dice_count
+        self.dice_sides: int = dice_sides
+        self.damage_bonus: int = damage_bonus
+        self.reach: int = reach
+
+    @property
+    def skill_path(self) -> str:
+        """The player.Character stat path of the weapon's subskill."""
+        return f"Agility.{self.category} Attack.{self.subskill}"
+
+    @property
+    def damage_path(self) -> str:
+        """The player.Character stat path added to the weapon's damage."""
+        return f"Strength.Combat.{self.category} damage"
+
+
+class Maneuver:
+    """A kind of attack: a plain strike or a special move a style teaches."""
+    __slots__ = (
+        "name", "hit_bonus", "damage_bonus", "extra_dice", "damage_multiplier", "contested",
+        "effect",
+    )
+
+    def __init__(
+            self,
+            name: str,
+            hit_bonus: int = 0,
+            damage_bonus: int = 0,
+            extra_dice: int = 0,
+            damage_multiplier: float = 1.0,
+            contested: bool = False,
+            effect: str | None = None
+        ) -> None:
+        """Initialize a Maneuver instance.
+
+        Args:
+            name (str):
+                The maneuver's name.
+            hit_bonus (int, optional):
+                Added to the attack (or contest) roll. Defaults to 0.
+            damage_bonus (int, optional):
+                Flat damage added on a hit. Defaults to 0.
+            extra_dice (int, optional):
+                Extra weapon damage dice rolled on a hit. Defaults to 0.
+            damage_multiplier (float, optional):
+                Multiplies the damage dealt, 0 for maneuvers that only apply their effect.
+                Defaults to 1.0.
+            contested (bool, optional):
+                Whether the maneuver is an opposed grappling roll rather than an attack against
+                Dodge. Defaults to False.
+            effect (str | None, optional):
+                The condition applied to the defender on success, such as "grappled" or "prone".
+                Defaults to None.
+        """
+        self.name: str = name
+        self.hit_bonus: int = hit_bonus
+        self.damage_bonus: int = damage_bonus
+        self.extra_dice: int = extra_dice
+        self.damage_multiplier: float = damage_multiplier
+        self.contested: bool = contested
+        self.effect: str | None = effect
+
+
+class CombatStyle:
+    """A fighting style and the weapon subskills it trains."""
+    __slots__ = (
+        "name", "subskills", "hit_bonus", "damage_bonus", "critical_range", "dodge_bonus",
+        "grapple_bonus", "maneuvers", "requirements",
+    )
+
+    def __init__(
+            self,
+            name: str,
+            subskills: Iterable[str],
+            hit_bonus: int = 0,
+            damage_bonus: int = 0,
+            critical_range: int = 0,
+            dodge_bonus: int = 0,
+            grapple_bonus: int = 0,
+            maneuvers: Iterable[Maneuver] = (),
+            requirements: dict[str, float] | None = None
+        ) -> None:
+        """Initialize a CombatStyle instance.
+
+        Args:
+            name (str):
+                The style's name.
+            subskills (Iterable[str]):
+                The weapon subskills the style works with, such as "Swords".
+            hit_bonus (int, optional):
+                Added to attack rolls with those weapons. Defaults to 0.
+            damage_bonus (int, optional):
+                Added to damage with those weapons. Defaults to 0.
+            critical_range (int, optional):
+                How far below a natural 20 critical hits start. Defaults to 0.
+            dodge_bonus (int, optional):
+                Added to Dodge while fighting in the style; negative for reckless styles.
+                Defaults to 0.
+            grapple_bonus (int, optional):
+                Added to grappling contests and grappling defense. Defaults to 0.
+            maneuvers (Iterable[Maneuver], optional):
+                The maneuvers the style teaches. Defaults to ().
+            requirements (dict[str, float] | None, optional):
+                Minimum stats to use the style, keyed by player.Character stat path. Defaults to
+                None.
+        """
+        self.name: str = name
+        self.subskills: frozenset[str] = frozenset(subskills)
+        self.hit_bonus: int = hit_bonus
+        self.damage_bonus: int = damage_bonus
+        self.critical_range: int = critical_range
+        self.dodge_bonus: int = dodge_bonus
+        self.grapple_bonus: int = grapple_bonus
+        self.maneuvers: tuple[Maneuver, ...] = tuple(maneuvers)
+        self.requirements: dict[str, float] = requirements or {}
+
+    def applies_to(self, weapon: Weapon) -> bool:
+        """Whether the style works with a weapon.
+
+        Args:
+            weapon (Weapon):
+                The weapon.
+
+        Returns:
+            bool: Whether the weapon's subskill is one the style trains.
+        """
+        return weapon.subskill in self.subskills
+
+    def usable_by(self, character: Any) -> bool:
+        """Whether a character meets the style's requirements.
+
+        Args:
+            character (Any):
+                A player.Character.
+
+        Returns:
+            bool: Whether every required stat is met.
+        """
+        return all(character[path] >= minimum for path, minimum in self.requirements.items())
+
+
+@lru_cache(maxsize=1024)
+def damage_distribution(
+        dice_count: int,
+        dice_sides: int,
+        bonus: int,
+        multiplier: float = 1.0
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """Get the exact distribution of a damage roll.
+
+    Args:
+        dice_count (int):
+            The number of dice.
+        dice_sides (int):
+            The sides on each die.
+        bonus (int):
+            Flat damage added to the dice.
+        multiplier (float, optional):
+            Multiplies the total, rounding down. Defaults to 1.0.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The possible damage values (never below 0) and the
+            cumulative probability of each, for np.searchsorted.
+    """
+    probabilities = np.ones(1)
+    die = np.full(dice_sides, 1.0 / dice_sides)
+    for _ in range(dice_count):
+        probabilities = np.convolve(probabilities, die)
+    totals = np.arange(dice_count, dice_count + len(probabilities)) + bonus
+    damage = np.maximum(np.floor(totals * multiplier), 0).astype(np.int64)
+    values, inverse = np.unique(damage, return_inverse=True)
+    cumulative = np.cumsum(np.bincount(inverse, weights=probabilities))
+    cumulative[-1] = 1.0
+    values.flags.writeable = False
+    cumulative.flags.writeable = False
+    return values, cumulative
+
+
+# Weapon category -> maneuvers anyone can make with such a weapon. Filled in by
+# melee_combat_styles and ranged_combat_styles.
+BASIC_MANEUVERS: dict[str, tuple[Maneuver, ...]] = {}
+
+
+class Action:
+    """One compiled row of an ActionTable."""
+    __slots__ = (
+        "style", "weapon", "maneuver", "attack_bonus", "critical_threshold", "damage_values",
+        "damage_cumulative", "critical_values", "critical_cumulative",
+    )
+
+    def __init__(
+            self,
+            style: CombatStyle | None,
+            weapon: Weapon,
+            maneuver: Maneuver,
+            attack_bonus: int,
+            critical_threshold: int,
+            damage: tuple[np.ndarray, np.ndarray],
+            critical_damage: tuple[np.ndarray, np.ndarray]
+        ) -> None:
+        """Initialize an Action instance.
+
+        Args:
+            style (CombatStyle | None):
+                The style fought in, None for none.
+            weapon (Weapon):
+                The weapon used.
+            maneuver (Maneuver):
+                The maneuver made.
+            attack_bonus (int):
+                Added to the d20, or the contest bonus for contested maneuvers.
+            critical_threshold (int):
+                The lowest natural roll that is a critical hit.
+            damage (tuple[np.ndarray, np.ndarray]):
+                The damage_distribution of a hit.
+            critical_damage (tuple[np.ndarray, np.ndarray]):
+                The damage_distribution of a critical hit.
+        """
+        self.style: CombatStyle | None = style
+        self.weapon: Weapon = weapon
+        self.maneuver: Maneuver = maneuver
+        self.attack_bonus: int = attack_bonus
+        self.critical_threshold: int = critical_threshold
+        self.damage_values, self.damage_cumulative = damage
+        self.critical_values, self.critical_cumulative = critical_damage
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        """The (style, weapon, maneuver) names the row is looked up by; style is "" for none."""
+        return ("" if self.style is None else self.style.name, self.weapon.name, self.maneuver.name)
+
+
+class AttackOutcome:
+    """The result of one resolved attack."""
+    __slots__ = ("hit", "critical", "damage", "effect")
+
+    def __init__(self, hit: bool, critical: bool, damage: int, effect: str | None) -> None:
+        self.hit: bool = hit
+        self.critical: bool = critical
+        self.damage: int = damage
+        self.effect: str | None = effect
+
+    def __repr__(self) -> str:
+        if not self.hit:
+            return "AttackOutcome(miss)"
+        critical = " critical" if self.critical else ""
+        effect = f", {self.effect}" if self.effect else ""
+        return f"AttackOutcome({self.damage}{critical}{effect})"
+
+
+class ActionTable:
+    """Every attack a character can make, with its numbers worked out ahead of time."""
+    __slots__ = (
+        "name", "actions", "index", "dodge", "grapple_defense", "attack_bonus", "critical_threshold",
+    )
+
+    def __init__(
+            self,
+            character: Any,
+            weapons: Iterable[Weapon],
+            styles: Iterable[CombatStyle] = (),
+            basic_maneuvers: dict[str, Iterable[Maneuver]] | None = None
+        ) -> None:
+        """Compile a character's action table.
+
+        Args:
+            character (Any):
+                A player.Character, or anything indexable by stat path.
+            weapons (Iterable[Weapon]):
+                The weapons the character carries.
+            styles (Iterable[CombatStyle], optional):
+                The styles the character knows. Styles whose requirements are not met are left
+                out. Defaults to ().
+            basic_maneuvers (dict[str, Iterable[Maneuver]] | None, optional):
+                Weapon category -> maneuvers anyone can make with such a weapon, in or out of a
+                style. Defaults to BASIC_MANEUVERS, or a plain attack for unknown categories.
+        """
+        self.name: str = getattr(character, "name", "")
+        styles = [style for style in styles if style.usable_by(character)]
+        basic_maneuvers = BASIC_MANEUVERS if basic_maneuvers is None else basic_maneuvers
+        grappling = character[GRAPPLING_STAT]
+        acrobatics = character[ACROBATICS_STAT]
+
+        self.actions: list[Action] = []
+        for weapon in weapons:
+            category_bonus = character[f"Agility.{weapon.category} Attack"]
+            skill = character[weapon.skill_path] + category_bonus
+            strength = character[weapon.damage_path]
+            basics = tuple(basic_maneuvers.get(weapon.category, (Maneuver("Attack"),)))
+            for style in [None, *(style for style in styles if style.applies_to(weapon))]:
+                maneuvers = basics if style is None else basics + style.maneuvers
+                for maneuver in maneuvers:
+                    self.actions.append(
+                        self._compile(style, weapon, maneuver, skill, strength, grappling))
+
+        self.index: dict[tuple[str, str, str], int] = {
+            action.key: row for row, action in enumerate(self.actions)}
+        self.attack_bonus: np.ndarray = np.array(
+            [action.attack_bonus for action in self.actions], dtype=np.int64)
+        self.critical_threshold: np.ndarray = np.array(
+            [action.critical_threshold for action in self.actions], dtype=np.int64)
+
+        # Stance (style name, "" for none) -> defenses while fighting in it.
+        dodge = int(character[DODGE_STAT])
+        grapple_defense = int(max(grappling, acrobatics))
+        self.dodge: dict[str, int] = {"": dodge}
+        self.grapple_defense: dict[str, int] = {"": grapple_defense}
+        for style in styles:
+            self.dodge[style.name] = dodge + style.dodge_bonus
+            self.grapple_defense[style.name] = grapple_defense + style.grapple_bonus
+
+    @staticmethod
+    def _compile(
+            style: CombatStyle | None,
+            weapon: Weapon,
+            maneuver: Maneuver,
+            skill: float,
+            strength: float,
+            grappling: float
+        ) -> Action:
+        """Work out one row of the table."""
+        style_hit = 0 if style is None else style.hit_bonus
+        style_damage = 0 if style is None else style.damage_bonus
+        if maneuver.contested:
+            grapple_bonus = 0 if style is None else style.grapple_bonus
+            attack_bonus = int(grappling) + grapple_bonus + maneuver.hit_bonus
+        else:
+            attack_bonus = int(skill) + style_hit + maneuver.hit_bonus
+        dice = weapon.dice_count + maneuver.extra_dice
+        bonus = weapon.damage_bonus + int(strength) + style_damage + maneuver.damage_bonus
+        return Action(
+            style, weapon, maneuver, attack_bonus,
+            20 - (0 if style is None else style.critical_range),
+            damage_distribution(dice, weapon.dice_sides, bonus, maneuver.damage_multiplier),
+            # Critical hits roll the damage dice twice.
+            damage_distribution(2 * dice, weapon.dice_sides, bonus, maneuver.damage_multiplier),
+        )
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def row(self, weapon: str, maneuver: str = "Attack", style: str = "") -> int:
+        """Look up an action's row.
+
+        Args:
+            weapon (str):
+                The weapon's name.
+            maneuver (str, optional):
+                The maneuver's name. Defaults to "Attack".
+            style (str, optional):
+                The style's name, "" for none. Defaults to "".
+
+        Returns:
+            int: The row.
+        """
+        return self.index[(style, weapon, maneuver)]
+
+    def hit_chance(self, row: int, defender: "ActionTable", stance: str = "") -> float:
+        """Get the chance an action succeeds against a defender, such as for choosing between
+        actions.
+
+        Args:
+            row (int):
+                The action's row.
+            defender (ActionTable):
+                The defender's table.
+            stance (str, optional):
+                The style the defender fights in, "" for none. Defaults to "".
+
+        Returns:
+            float: The chance from 0 to 1.
+        """
+        action = self.actions[row]
+        if action.maneuver.contested:
+            # P(d20 + bonus > d20 + defense), ties going to the defender.
+            margin = action.attack_bonus - defender.grapple_defense[stance]
+            wins = sum(max(0, min(20, first + margin - 1)) for first in range(1, 21))
+            return wins / 400
+        needed = DODGE_BASE + defender.dodge[stance] - action.attack_bonus
+        return min(max(21 - needed, 1), 19) / 20
+
+    def resolve(
+            self,
+            row: int,
+            defender: "ActionTable",
+            rng: np.random.Generator,
+            stance: str = ""
+        ) -> AttackOutcome:
+        """Resolve one attack.
+
+        Args:
+            row (int):
+                The action's row.
+            defender (ActionTable):
+                The defender's table.
+            rng (np.random.Generator):
+                The random generator.
+            stance (str, optional):
+                The style the defender fights in, "" for none. Defaults to "".
+
+        Returns:
+            AttackOutcome: The outcome.
+        """
+        action = self.actions[row]
+        roll = int(rng.integers(1, 21))
+        if action.maneuver.contested:
+            defense = int(rng.integers(1, 21)) + defender.grapple_defense[stance]
+            hit = roll + action.attack_bonus > defense
+            critical = False
+        else:
+            critical = roll >= action.critical_threshold
+            hit = roll != 1 and (
+                roll == 20 or roll + action.attack_bonus >= DODGE_BASE + defender.dodge[stance])
+        if not hit:
+            return AttackOutcome(False, False, 0, None)
+        if critical:
+            values, cumulative = action.critical_values, action.critical_cumulative
+        else:
+            values, cumulative = action.damage_values, action.damage_cumulative
+        damage = int(values[np.searchsorted(cumulative, rng.random(), side="right")])
+        return AttackOutcome(True, critical, damage, action.maneuver.effect)
+
+    def resolve_many(
+            self,
+            row: int,
+            dodge: np.ndarray,
+            rng: np.random.Generator,
+            grapple_defense: np.ndarray | None = None
+        ) -> tuple[np.ndarray, np.ndarray]:
+        """Resolve the same action against many defenders at once, such as a unit of soldiers
+        sharing this table attacking a line of enemies.
+
+        Args:
+            row (int):
+                The action's row.
+            dodge (np.ndarray):
+                Each defender's Dodge.
+            rng (np.random.Generator):
+                The random generator.
+            grapple_defense (np.ndarray | None, optional):
+                Each defender's grappling defense, needed for contested maneuvers. Defaults to
+                None.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Whether each attack succeeded and the damage it dealt.
+        """
+        action = self.actions[row]
+        dodge = np.asarray(dodge)
+        rolls = rng.integers(1, 21, size=dodge.shape)
+        if action.maneuver.contested:
+            defense = np.asarray(grapple_defense)
+            hits = rolls + action.attack_bonus > rng.integers(1, 21, size=dodge.shape) + defense
+            critical = np.zeros(dodge.shape, dtype=bool)
+        else:
+            critical = rolls >= action.critical_threshold
+            hits = (rolls != 1) & ((rolls == 20) | (rolls + action.attack_bonus >= DODGE_BASE + dodge))
+        draws = rng.random(size=dodge.shape)
+        damage = np.where(
+            critical,
+            action.critical_values[np.searchsorted(action.critical_cumulative, draws, side="right")],
+            action.damage_values[np.searchsorted(action.damage_cumulative, draws, side="right")],
+        )
+        return hits, np.where(hits, damage, 0)
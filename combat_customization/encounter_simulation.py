@@ -0,0 +1,331 @@
+"""
+Monte Carlo duel simulator for balancing.
+
+Each trial is a fight between two combatants who roll initiative and then trade attacks each round
+until one drops or the round limit is reached. Attacks resolve as described in the magic docs:
+- Projectile attacks roll d20 + attack bonus against 10 + the target's Dodge (the AC equivalent).
+- Touch attacks let the target make a Dexterity (Agility) save against the attack's DC to avoid
+  the effect entirely.
+- Area attacks let the target make the same save to take half damage.
+
+Trials run in fixed-size blocks, each with its own seed spawned from the simulation seed, and every
+die in a block is drawn from NumPy in batches across all of the block's trials at once. Blocks are
+spread across a process pool and their counts are summed, so the same seed gives the same result
+no matter how many workers are used.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Any
+
+import numpy as np
+
+
+class AttackKinds(str, Enum):
+    """How an attack is resolved against its target."""
+    PROJECTILE = "projectile"
+    TOUCH = "touch"
+    AREA = "area"
+
+
+class Attack:
+    """One attack a combatant makes each round."""
+    __slots__ = ("kind", "dice_count", "dice_sides", "damage_bonus", "attack_bonus", "save_dc")
+
+    def __init__(
+            self,
+            kind: AttackKinds,
+            dice_count: int,
+            dice_sides: int,
+            damage_bonus: int = 0,
+            attack_bonus: int = 0,
+            save_dc: int = 10
+        ) -> None:
+        """Initialize an Attack instance.
+
+        Args:
+            kind (AttackKinds):
+                How the attack is resolved.
+            dice_count (int):
+                The number of damage dice.
+            dice_sides (int):
+                The sides on each damage die.
+            damage_bonus (int, optional):
+                Flat damage added on a hit. Defaults to 0.
+            attack_bonus (int, optional):
+                Added to projectile attack rolls. Defaults to 0.
+            save_dc (int, optional):
+                The DC of the target's save against touch and area attacks. Defaults to 10.
+        """
+        self.kind: AttackKinds = kind
+        self.dice_count: int = dice_count
+        self.dice_sides: int = dice_sides
+        self.damage_bonus: int = damage_bonus
+        self.attack_bonus: int = attack_bonus
+        self.save_dc: int = save_dc
+
+    @property
+    def max_damage(self) -> int:
+        """The most damage the attack can deal."""
+        return max(self.dice_count * self.dice_sides + self.damage_bonus, 0)
+
+
+class Combatant:
+    """The numbers a combatant needs for a simulated fight."""
+    __slots__ = ("name", "health", "dodge", "save_bonus", "initiative", "attack")
+
+    def __init__(
+            self,
+            name: str,
+            health: int,
+            dodge: int,
+            save_bonus: int,
+            initiative: int,
+            attack: Attack
+        ) -> None:
+        """Initialize a Combatant instance.
+
+        Args:
+            name (str):
+                The combatant's name.
+            health (int):
+                Starting health.
+            dodge (int):
+                Dodge, added to 10 to get the target number for projectile attacks.
+            save_bonus (int):
+                Added to Dexterity (Agility) saves.
+            initiative (int):
+                Added to initiative rolls.
+            attack (Attack):
+                The attack made each round.
+        """
+        self.name: str = name
+        self.health: int = health
+        self.dodge: int = dodge
+        self.save_bonus: int = save_bonus
+        self.initiative: int = initiative
+        self.attack: Attack = attack
+
+    @classmethod
+    def from_character(cls, character: Any, attack: Attack) -> "Combatant":
+        """Build a combatant from a player.Character.
+
+        Args:
+            character (Any):
+                A player.Character.
+            attack (Attack):
+                The attack made each round.
+
+        Returns:
+            Combatant: The combatant.
+        """
+        return cls(
+            character.name,
+            int(character["Willpower.Vitality"]),
+            int(character["Agility.Dodge"]),
+            int(character["Agility"]),
+            int(character["Agility.Initiative"]),
+            attack,
+        )
+
+
+class EncounterResult:
+    """Win counts, fight lengths and per-attack damage distributions over many trials."""
+    __slots__ = ("wins", "rounds", "damage")
+
+    def __init__(self, max_rounds: int, first: Combatant, second: Combatant) -> None:
+        """Initialize an empty EncounterResult instance.
+
+        Args:
+            max_rounds (int):
+                The round limit of each fight.
+            first (Combatant):
+                The first combatant.
+            second (Combatant):
+                The second combatant.
+        """
+        # First wins, second wins, neither (both down or round limit reached).
+        self.wins: np.ndarray = np.zeros(3, dtype=np.int64)
+        self.rounds: np.ndarray = np.zeros(max_rounds + 1, dtype=np.int64)
+        self.damage: tuple[np.ndarray, np.ndarray] = (
+            np.zeros(first.attack.max_damage + 1, dtype=np.int64),
+            np.zeros(second.attack.max_damage + 1, dtype=np.int64),
+        )
+
+    @property
+    def trials(self) -> int:
+        """The number of fights simulated."""
+        return int(self.wins.sum())
+
+    @property
+    def win_rates(self) -> np.ndarray:
+        """The first's, second's and neither's share of fights won."""
+        return self.wins / max(self.trials, 1)
+
+    def merge(self, other: "EncounterResult") -> None:
+        """Add another result's counts into this one.
+
+        Args:
+            other (EncounterResult):
+                The result to add.
+        """
+        self.wins += other.wins
+        self.rounds += other.rounds
+        self.damage[0][:] += other.damage[0]
+        self.damage[1][:] += other.damage[1]
+
+
+def roll_attacks(
+        rng: np.random.Generator,
+        attack: Attack,
+        target: Combatant,
+        trials: int
+    ) -> np.ndarray:
+    """Roll one attack against a target for every trial at once.
+
+    Args:
+        rng (np.random.Generator):
+            The random generator.
+        attack (Attack):
+            The attack made.
+        target (Combatant):
+            The combatant attacked.
+        trials (int):
+            The number of trials.
+
+    Returns:
+        np.ndarray: The damage dealt in each trial.
+    """
+    d20 = rng.integers(1, 21, size=trials)
+    damage = rng.integers(1, attack.dice_sides + 1, size=(trials, attack.dice_count)).sum(axis=1)
+    damage += attack.damage_bonus
+    # A large negative bonus cannot heal the target, and bincount needs non-negative damage.
+    np.maximum(damage, 0, out=damage)
+
+    if attack.kind == AttackKinds.PROJECTILE:
+        return np.where(d20 + attack.attack_bonus >= 10 + target.dodge, damage, 0)
+    saved = d20 + target.save_bonus >= attack.save_dc
+    if attack.kind == AttackKinds.TOUCH:
+        return np.where(saved, 0, damage)
+    return np.where(saved, damage // 2, damage)
+
+
+def simulate_block(
+        first: Combatant,
+        second: Combatant,
+        trials: int,
+        seed: np.random.SeedSequence,
+        max_rounds: int
+    ) -> EncounterResult:
+    """Simulate one block of fights with its own seed.
+
+    Args:
+        first (Combatant):
+            The first combatant.
+        second (Combatant):
+            The second combatant.
+        trials (int):
+            The number of fights in the block.
+        seed (np.random.SeedSequence):
+            The block's seed.
+        max_rounds (int):
+            The round limit of each fight.
+
+    Returns:
+        EncounterResult: The block's counts.
+    """
+    rng = np.random.default_rng(seed)
+    result = EncounterResult(max_rounds, first, second)
+
+    first_health = np.full(trials, first.health, dtype=np.int64)
+    second_health = np.full(trials, second.health, dtype=np.int64)
+    first_acts_first = (
+        rng.integers(1, 21, size=trials) + first.initiative
+        >= rng.integers(1, 21, size=trials) + second.initiative
+    )
+    length = np.full(trials, max_rounds, dtype=np.int64)
+    ongoing = np.ones(trials, dtype=bool)
+
+    for current_round in range(1, max_rounds + 1):
+        to_second = roll_attacks(rng, first.attack, second, trials)
+        to_first = roll_attacks(rng, second.attack, first, trials)
+
+        # The quicker side strikes first; the other only strikes back if still standing.
+        first_opens = ongoing & first_acts_first
+        second_opens = ongoing & ~first_acts_first
+        second_health -= np.where(first_opens, to_second, 0)
+        first_health -= np.where(second_opens, to_first, 0)
+        first_replies = second_opens & (first_health > 0)
+        second_replies = first_opens & (second_health > 0)
+        second_health -= np.where(first_replies, to_second, 0)
+        first_health -= np.where(second_replies, to_first, 0)
+
+        result.damage[0][:] += np.bincount(
+            to_second[first_opens | first_replies], minlength=result.damage[0].size)
+        result.damage[1][:] += np.bincount(
+            to_first[second_opens | second_replies], minlength=result.damage[1].size)
+
+        ended = ongoing & ((first_health <= 0) | (second_health <= 0))
+        length[ended] = current_round
+        ongoing &= ~ended
+        if not ongoing.any():
+            break
+
+    first_won = (second_health <= 0) & (first_health > 0)
+    second_won = (first_health <= 0) & (second_health > 0)
+    result.wins += (
+        int(first_won.sum()), int(second_won.sum()), trials - int(first_won.sum() + second_won.sum()))
+    result.rounds += np.bincount(length, minlength=max_rounds + 1)
+    return result
+
+
+def simulate(
+        first: Combatant,
+        second: Combatant,
+        trials: int,
+        seed: int,
+        workers: int | None = None,
+        block_size: int = 4096,
+        max_rounds: int = 100
+    ) -> EncounterResult:
+    """Simulate many fights between two combatants across a process pool.
+
+    Args:
+        first (Combatant):
+            The first combatant.
+        second (Combatant):
+            The second combatant.
+        trials (int):
+            The number of fights.
+        seed (int):
+            The simulation seed. The same seed always gives the same result.
+        workers (int | None, optional):
+            Worker processes, 1 to run in this process, None for one per core. Defaults to None.
+        block_size (int, optional):
+            Fights per block. Part of what the seed produces, so keep it fixed to compare runs.
+            Defaults to 4096.
+        max_rounds (int, optional):
+            The round limit of each fight. Defaults to 100.
+
+    Returns:
+        EncounterResult: The merged counts.
+    """
+    sizes = [block_size] * (trials // block_size)
+    if trials % block_size:
+        sizes.append(trials % block_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    result = EncounterResult(max_rounds, first, second)
+    if workers == 1:
+        for size, block_seed in zip(sizes, seeds):
+            result.merge(simulate_block(first, second, size, block_seed, max_rounds))
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        blocks = pool.map(
+            simulate_block,
+            [first] * len(sizes), [second] * len(sizes), sizes, seeds, [max_rounds] * len(sizes))
+        for block in blocks:
+            result.merge(block)
+    return result
@@ -0,0 +1,98 @@
+"""
+Melee weapons, maneuvers and combat styles.
+
+Every melee weapon is governed by one of the Agility.Melee Attack subskills of player.py and adds
+Strength.Combat.Melee damage to its damage. Anyone can attack, grapple or shove; styles add their
+own maneuvers on top. Grapples and shoves are contested by the defender's grappling defense (the
+better of Strength.Combat.Grappling and Agility.Acrobatics) instead of Dodge.
+
+Compile a character's styles into an action table with combat_styles.ActionTable, for example:
+    table = ActionTable(character, [MELEE_WEAPONS["Longsword"]], [MELEE_STYLES["Duelist"]])
+"""
+
+
+from combat_styles import BASIC_MANEUVERS, CombatStyle, Maneuver, Weapon
+
+
+MELEE_SUBSKILLS: tuple[str, ...] = ("Swords", "Axes", "Fists", "Spears", "Daggers", "Blunts", "Staffs")
+
+MELEE_MANEUVERS: tuple[Maneuver, ...] = (
+    Maneuver("Attack"),
+    Maneuver("Grapple", damage_multiplier=0, contested=True, effect="grappled"),
+    Maneuver("Shove", damage_multiplier=0, contested=True, effect="prone"),
+)
+BASIC_MANEUVERS["Melee"] = MELEE_MANEUVERS
+
+
+def _weapon(name: str, subskill: str, dice_count: int, dice_sides: int, reach: int = 5) -> Weapon:
+    return Weapon(name, "Melee", subskill, dice_count, dice_sides, reach=reach)
+
+
+MELEE_WEAPONS: dict[str, Weapon] = {weapon.name: weapon for weapon in (
+    _weapon("Shortsword", "Swords", 1, 6),
+    _weapon("Longsword", "Swords", 1, 8),
+    _weapon("Greatsword", "Swords", 2, 6),
+    _weapon("Handaxe", "Axes", 1, 6),
+    _weapon("Battleaxe", "Axes", 1, 8),
+    _weapon("Greataxe", "Axes", 1, 12),
+    _weapon("Unarmed", "Fists", 1, 4),
+    _weapon("Cestus", "Fists", 1, 6),
+    _weapon("Spear", "Spears", 1, 6, reach=10),
+    _weapon("Pike", "Spears", 1, 10, reach=15),
+    _weapon("Dagger", "Daggers", 1, 4),
+    _weapon("Stiletto", "Daggers", 1, 4),
+    _weapon("Club", "Blunts", 1, 4),
+    _weapon("Mace", "Blunts", 1, 6),
+    _weapon("Warhammer", "Blunts", 1, 8),
+    _weapon("Quarterstaff", "Staffs", 1, 6, reach=10),
+)}
+
+MELEE_STYLES: dict[str, CombatStyle] = {style.name: style for style in (
+    CombatStyle(
+        "Duelist", ("Swords", "Daggers"), hit_bonus=2, critical_range=1, dodge_bonus=1,
+        maneuvers=(
+            Maneuver("Riposte", hit_bonus=1, damage_bonus=2),
+            Maneuver("Disarm", hit_bonus=-2, damage_multiplier=0, effect="disarmed"),
+        ),
+        requirements={"Agility": 3}),
+    CombatStyle(
+        "Berserker", ("Axes", "Blunts", "Swords"), hit_bonus=-1, damage_bonus=3, dodge_bonus=-2,
+        maneuvers=(
+            Maneuver("Reckless Swing", hit_bonus=-3, extra_dice=1),
+            Maneuver("Sunder", hit_bonus=-1, damage_multiplier=0.5, effect="armor broken"),
+        ),
+        requirements={"Strength": 3}),
+    CombatStyle(
+        "Brawler", ("Fists", "Blunts"), damage_bonus=1, grapple_bonus=3,
+        maneuvers=(
+            Maneuver("Haymaker", hit_bonus=-2, extra_dice=1, effect="dazed"),
+            Maneuver("Throw", contested=True, hit_bonus=1, damage_bonus=2, effect="prone"),
+            Maneuver("Chokehold", contested=True, hit_bonus=-2, effect="restrained"),
+        )),
+    CombatStyle(
+        "Phalanx", ("Spears",), hit_bonus=1, dodge_bonus=2,
+        maneuvers=(
+            Maneuver("Brace", hit_bonus=1, extra_dice=1),
+            Maneuver("Trip", contested=True, damage_multiplier=0, effect="prone"),
+        )),
+    CombatStyle(
+        "Staff Dancer", ("Staffs", "Spears"), dodge_bonus=3, grapple_bonus=1,
+        maneuvers=(
+            Maneuver("Sweep", contested=True, hit_bonus=2, damage_multiplier=0, effect="prone"),
+            Maneuver("Flurry", hit_bonus=-2, damage_multiplier=1.5),
+        ),
+        requirements={"Agility.Acrobatics": 2}),
+    CombatStyle(
+        "Assassin", ("Daggers",), hit_bonus=1, critical_range=2,
+        maneuvers=(
+            Maneuver("Backstab", hit_bonus=-1, extra_dice=2),
+            Maneuver("Hamstring", damage_multiplier=0.5, effect="slowed"),
+        ),
+        requirements={"Agility.Stealth": 2}),
+    CombatStyle(
+        "Guardian", ("Swords", "Blunts", "Axes", "Spears"), damage_bonus=-1, dodge_bonus=3,
+        grapple_bonus=1,
+        maneuvers=(
+            Maneuver("Shield Bash", contested=True, effect="pushed"),
+        )),
+)}
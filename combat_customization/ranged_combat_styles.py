@@ -0,0 +1,74 @@
+"""
+Ranged weapons, maneuvers and combat styles.
+
+Every ranged weapon is governed by one of the Agility.Ranged Attack subskills of player.py and adds
+Strength.Combat.Ranged damage to its damage. Anyone can shoot or throw; styles add their own
+maneuvers on top. Weapon reach is the normal range in feet.
+
+Compile a character's styles into an action table with combat_styles.ActionTable, for example:
+    table = ActionTable(character, [RANGED_WEAPONS["Longbow"]], [RANGED_STYLES["Sharpshooter"]])
+"""
+
+
+from combat_styles import BASIC_MANEUVERS, CombatStyle, Maneuver, Weapon
+
+
+RANGED_SUBSKILLS: tuple[str, ...] = (
+    "Archery", "Crossbow", "Throwing Daggers", "Slings", "Javelins", "Firearms",
+)
+
+RANGED_MANEUVERS: tuple[Maneuver, ...] = (
+    Maneuver("Attack"),
+)
+BASIC_MANEUVERS["Ranged"] = RANGED_MANEUVERS
+
+
+def _weapon(name: str, subskill: str, dice_count: int, dice_sides: int, reach: int) -> Weapon:
+    return Weapon(name, "Ranged", subskill, dice_count, dice_sides, reach=reach)
+
+
+RANGED_WEAPONS: dict[str, Weapon] = {weapon.name: weapon for weapon in (
+    _weapon("Shortbow", "Archery", 1, 6, 80),
+    _weapon("Longbow", "Archery", 1, 8, 150),
+    _weapon("Hand Crossbow", "Crossbow", 1, 6, 30),
+    _weapon("Heavy Crossbow", "Crossbow", 1, 10, 100),
+    _weapon("Throwing Knife", "Throwing Daggers", 1, 4, 20),
+    _weapon("Sling", "Slings", 1, 4, 30),
+    _weapon("Javelin", "Javelins", 1, 6, 30),
+    _weapon("Pistol", "Firearms", 1, 10, 30),
+    _weapon("Musket", "Firearms", 1, 12, 120),
+)}
+
+RANGED_STYLES: dict[str, CombatStyle] = {style.name: style for style in (
+    CombatStyle(
+        "Sharpshooter", ("Archery", "Crossbow", "Firearms"), hit_bonus=2, critical_range=1,
+        maneuvers=(
+            Maneuver("Aimed Shot", hit_bonus=3, damage_bonus=2),
+            Maneuver("Called Shot", hit_bonus=-4, damage_multiplier=0.5, effect="disarmed"),
+        ),
+        requirements={"Agility.Ranged Attack": 2}),
+    CombatStyle(
+        "Skirmisher", ("Archery", "Javelins", "Throwing Daggers", "Slings"), dodge_bonus=2,
+        maneuvers=(
+            Maneuver("Snap Shot", hit_bonus=-2),
+            Maneuver("Pinning Shot", hit_bonus=-1, damage_multiplier=0.5, effect="slowed"),
+        )),
+    CombatStyle(
+        "Volley", ("Archery", "Crossbow"), hit_bonus=-1,
+        maneuvers=(
+            Maneuver("Double Shot", hit_bonus=-3, extra_dice=1),
+        ),
+        requirements={"Strength.Combat.Ranged damage": 1}),
+    CombatStyle(
+        "Knife Thrower", ("Throwing Daggers",), hit_bonus=1, critical_range=2,
+        maneuvers=(
+            Maneuver("Fan of Knives", hit_bonus=-2, extra_dice=1),
+        ),
+        requirements={"Agility": 3}),
+    CombatStyle(
+        "Gunslinger", ("Firearms",), damage_bonus=1, critical_range=1, dodge_bonus=-1,
+        maneuvers=(
+            Maneuver("Point Blank", hit_bonus=2, extra_dice=1),
+            Maneuver("Ricochet", hit_bonus=-3, effect="startled"),
+        )),
+)}
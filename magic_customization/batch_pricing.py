@@ -0,0 +1,168 @@
+"""
+Vectorized spell pricing for balance tooling.
+
+Evaluates the closed-form cost rules of spell_costs over NumPy arrays of range, duration, volume
+and target count in a single call. Every formula follows the same operation order as
+CostPlan.power and CostPlan.complexity, and powers are taken with Python's own float power for each
+distinct exponent (NumPy's vectorized power can differ from it by an ulp), so each element matches
+the scalar path exactly.
+"""
+
+
+from typing import Any, Iterable
+
+import numpy as np
+
+from magic import DeliveryMethod, Target
+from spell_costs import CostPlan, compile_shape, component_terms
+
+
+def delivery_plan(
+        delivery: DeliveryMethod,
+        target: Target,
+        components: Iterable[Any] = ()
+    ) -> CostPlan:
+    """Compile a CostPlan from a delivery method, a target and any extra components.
+
+    Args:
+        delivery (DeliveryMethod):
+            The delivery method, registered or not.
+        target (Target):
+            The target type, registered or not.
+        components (Iterable[Any], optional):
+            Extra components (triggers, power sources, ...) to fold into the plan. Defaults to ().
+
+    Returns:
+        CostPlan: The compiled plan.
+    """
+    parts = [component_terms(delivery), component_terms(target)]
+    parts.extend(component_terms(component) for component in components)
+    return compile_shape((
+        tuple(parts),
+        delivery.range_power_cost,
+        delivery.duration_complexity_cost,
+        target.volume_power_cost,
+    ))
+
+
+def _power(base: float, exponents: np.ndarray) -> np.ndarray:
+    """Raise a base to an array of exponents exactly as the scalar ** does, once per distinct
+    exponent."""
+    distinct, inverse = np.unique(exponents, return_inverse=True)
+    powers = np.array([base ** exponent for exponent in distinct.tolist()], dtype=np.float64)
+    return powers[inverse].reshape(exponents.shape)
+
+
+def price_plan(
+        plan: CostPlan,
+        range_ft: Any = 0,
+        duration: Any = 1,
+        volume: Any = 0,
+        targets: Any = 1
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """Evaluate a CostPlan over broadcastable arrays of parameters.
+
+    Args:
+        plan (CostPlan):
+            The plan to evaluate.
+        range_ft (Any, optional):
+            Distances in feet. Defaults to 0.
+        duration (Any, optional):
+            Durations in rounds (timeframe steps for enchantments). Defaults to 1.
+        volume (Any, optional):
+            Volumes in 5ft cubes. Defaults to 0.
+        targets (Any, optional):
+            Target counts. Defaults to 1.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]:
+            The power costs and complexities, as read-only views broadcast to a common shape.
+    """
+    range_ft = np.asarray(range_ft, dtype=np.float64)
+    duration = np.asarray(duration, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+
+    power = (
+        (plan.base_power + plan.volume_power_cost * volume)
+        * plan.power_mult
+        * (1 + plan.range_power_cost * range_ft / 5)
+        * _power(2.0, np.maximum(targets, 1) - 1)
+    )
+    complexity = (
+        plan.base_complexity
+        * plan.complexity_mult
+        * _power(plan.duration_complexity_cost, np.maximum(duration, 1) - 1)
+    )
+    shape = np.broadcast_shapes(range_ft.shape, duration.shape, volume.shape, targets.shape)
+    return np.broadcast_to(power, shape), np.broadcast_to(complexity, shape)
+
+
+def price_batch(
+        delivery: DeliveryMethod,
+        target: Target,
+        range_ft: Any = 0,
+        duration: Any = 1,
+        volume: Any = 0,
+        targets: Any = 1,
+        components: Iterable[Any] = ()
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """Price a delivery method and target over broadcastable arrays of parameters.
+
+    Args:
+        delivery (DeliveryMethod):
+            The delivery method, registered or not.
+        target (Target):
+            The target type, registered or not.
+        range_ft (Any, optional):
+            Distances in feet. Defaults to 0.
+        duration (Any, optional):
+            Durations in rounds (timeframe steps for enchantments). Defaults to 1.
+        volume (Any, optional):
+            Volumes in 5ft cubes. Defaults to 0.
+        targets (Any, optional):
+            Target counts. Defaults to 1.
+        components (Iterable[Any], optional):
+            Extra components to fold into the plan. Defaults to ().
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The power costs and complexities.
+    """
+    return price_plan(
+        delivery_plan(delivery, target, components), range_ft, duration, volume, targets)
+
+
+def price_grid(
+        delivery: DeliveryMethod,
+        target: Target,
+        ranges: Any,
+        durations: Any,
+        volumes: Any,
+        targets: Any,
+        components: Iterable[Any] = ()
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """Price every combination of range x duration x volume x target count, for balance charts.
+
+    Args:
+        delivery (DeliveryMethod):
+            The delivery method, registered or not.
+        target (Target):
+            The target type, registered or not.
+        ranges (Any):
+            1D array of distances in feet.
+        durations (Any):
+            1D array of durations.
+        volumes (Any):
+            1D array of volumes in 5ft cubes.
+        targets (Any):
+            1D array of target counts.
+        components (Iterable[Any], optional):
+            Extra components to fold into the plan. Defaults to ().
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]:
+            The power costs and complexities, each shaped (ranges, durations, volumes, targets).
+    """
+    grid = np.ix_(
+        np.asarray(ranges), np.asarray(durations), np.asarray(volumes), np.asarray(targets))
+    return price_batch(delivery, target, *grid, components=components)
@@ -0,0 +1,347 @@
+"""
+Benchmarks for the magic system's hot paths.
+
+Each benchmark runs over synthetic spells at several scales (10, 1k and 100k spells by default):
+- lookups: DeliveryMethodTypes / TargetTypes member lookups and cost attribute reads
+- construction: building magic_2.Spell objects
+- evaluation: complexity and initial mana cost of freshly built spells
+- apply: Payload.apply on every spell
+- round: casting every spell through rounds.RoundEngine and advancing until they all end
+
+Each benchmark is timed as several samples with the garbage collector off, each sample running it
+enough times to process at least min_spells spells. A fixed reference workload is timed right
+before each sample and each sample is measured in reference runs, so that a machine running faster
+or slower as a whole (frequency scaling, other load) is not mistaken for the code getting slower.
+The best of these relative samples is the benchmark's score and their spread (median over best)
+its noise.
+
+Results are written as JSON. Given a baseline file from an earlier run, any benchmark whose best
+time per spell, relative to the reference, grew by more than the threshold plus the larger of the
+two runs' noise is reported as a regression and the runner exits with status 1.
+
+Usage:
+    python benchmarks.py --output results.json
+    python benchmarks.py --baseline results.json --threshold 0.2
+"""
+
+
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+from magic import DeliveryMethod, DeliveryMethodTypes, TargetTypes
+from magic_2 import Container, Payload, PayloadItem, Propulsion, Spell, SpellComponent
+from rounds import RoundEngine
+
+
+DEFAULT_SCALES: tuple[int, ...] = (10, 1_000, 100_000)
+DEFAULT_THRESHOLD: float = 0.2
+DEFAULT_SAMPLES: int = 7
+EFFECT_TYPES: tuple[str, ...] = ("fire", "cold", "lightning", "healing", "force", "poison")
+
+# (delivery method, maximum range in ft, maximum duration) used by the generator so that every
+# synthetic spell is legal for a level 1 caster.
+_DELIVERIES: tuple[tuple[DeliveryMethod, int, int], ...] = (
+    (DeliveryMethodTypes.INSTANT_RELEASE, 5, 1),
+    (DeliveryMethodTypes.TOUCH, 5, 10),
+    (DeliveryMethodTypes.RANGED, 100, 10),
+    (DeliveryMethodTypes.SELF, 0, 10),
+)
+
+
+def synthetic_spell_parts(count: int, seed: int = 0) -> list[tuple]:
+    """Generate the constructor arguments of synthetic spells, so building them can be timed
+    separately.
+
+    Args:
+        count (int):
+            The number of spells.
+        seed (int, optional):
+            The generator seed. Defaults to 0.
+
+    Returns:
+        list[tuple]: The magic_2.Spell arguments for each spell.
+    """
+    generator = random.Random(seed)
+    targets = list(TargetTypes)
+    trigger = SpellComponent("On Contact", 1, 1)
+    power_source = SpellComponent("Caster Mana", 0, 0)
+    parts = []
+    for number in range(count):
+        method, max_range, max_duration = generator.choice(_DELIVERIES)
+        effects = [
+            PayloadItem(generator.choice(EFFECT_TYPES), generator.randint(1, 20),
+                        generator.randint(1, 5))
+            for _ in range(generator.randint(1, 3))
+        ]
+        parts.append((
+            f"Spell {number}",
+            Container(generator.choice(targets), generator.randint(0, 4), generator.randint(1, 3)),
+            Propulsion(method, generator.randint(0, max_range // 5) * 5,
+                       generator.randint(1, max_duration)),
+            [trigger],
+            power_source,
+            None,
+            ["target"] * generator.randint(0, 2),
+            Payload(effects),
+        ))
+    return parts
+
+
+def synthetic_spells(count: int, seed: int = 0) -> list[Spell]:
+    """Generate synthetic spells.
+
+    Args:
+        count (int):
+            The number of spells.
+        seed (int, optional):
+            The generator seed. Defaults to 0.
+
+    Returns:
+        list[Spell]: The spells.
+    """
+    return [Spell(*parts) for parts in synthetic_spell_parts(count, seed)]
+
+
+def bench_lookups(spells: list[Spell]) -> None:
+    for spell in spells:
+        method = DeliveryMethodTypes[spell.propulsion.method.name]
+        shape = TargetTypes[spell.container.shape.name]
+        method.range_power_cost * method.duration_complexity_cost * shape.volume_power_cost
+
+
+def bench_construction(parts: list[tuple]) -> None:
+    for arguments in parts:
+        Spell(*arguments)
+
+
+def bench_evaluation(spells: list[Spell]) -> None:
+    for spell in spells:
+        spell.invalidate_costs()
+        spell.complexity
+        spell.initial_mana_cost
+
+
+def bench_apply(spells: list[Spell]) -> None:
+    for spell in spells:
+        spell.payload.apply("target")
+
+
+def bench_round(spells: list[Spell]) -> None:
+    engine = RoundEngine()
+    engine.add_caster("caster", float("inf"))
+    for spell in spells:
+        engine.cast(spell, "caster", "target")
+    while engine.active_spells("caster"):
+        engine.advance()
+
+
+# Benchmark name -> (function, whether it takes constructor arguments instead of spells).
+BENCHMARKS: dict[str, tuple[Callable[[list], None], bool]] = {
+    "lookups": (bench_lookups, False),
+    "construction": (bench_construction, True),
+    "evaluation": (bench_evaluation, False),
+    "apply": (bench_apply, False),
+    "round": (bench_round, False),
+}
+
+
+def bench_reference(data: list) -> None:
+    """A fixed workload of plain interpreted code, independent of the magic system and the scale."""
+    table = {}
+    total = 0
+    for number in range(20_000):
+        table[number % 251] = total
+        total += table.get(number % 127, number) % 7
+    sorted(table.values())
+
+
+def time_benchmark(
+        function: Callable[[list], None],
+        data: list,
+        samples: int,
+        loops: int,
+        reference_loops: int = 5
+    ) -> tuple[list[float], list[float]]:
+    """Time a benchmark and the reference workload with the garbage collector off.
+
+    Collections would otherwise land in some samples only. The reference workload is timed right
+    before each sample, so each sample can be compared to how fast the machine was running then.
+
+    Args:
+        function (Callable[[list], None]):
+            The benchmark.
+        data (list):
+            The spells or constructor arguments to run it over.
+        samples (int):
+            The number of samples, after one warm-up run.
+        loops (int):
+            The number of back-to-back runs timed together in each sample.
+        reference_loops (int, optional):
+            The number of reference runs timed before each sample. Defaults to 5.
+
+    Returns:
+        tuple[list[float], list[float]]: The average duration of one benchmark run and of one
+            reference run in each sample, in seconds.
+    """
+    function(data)
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        times = []
+        references = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            for _ in range(reference_loops):
+                bench_reference(data)
+            middle = time.perf_counter()
+            for _ in range(loops):
+                function(data)
+            end = time.perf_counter()
+            references.append((middle - start) / reference_loops)
+            times.append((end - middle) / loops)
+    finally:
+        if enabled:
+            gc.enable()
+    return times, references
+
+
+def run(
+        scales: tuple[int, ...] = DEFAULT_SCALES,
+        names: tuple[str, ...] | None = None,
+        seed: int = 0,
+        samples: int = DEFAULT_SAMPLES,
+        min_spells: int = 20_000
+    ) -> dict[str, Any]:
+    """Run the benchmarks.
+
+    Args:
+        scales (tuple[int, ...], optional):
+            The spell counts to run at. Defaults to DEFAULT_SCALES.
+        names (tuple[str, ...] | None, optional):
+            The benchmarks to run, None for all of them. Defaults to None.
+        seed (int, optional):
+            The synthetic spell seed. Defaults to 0.
+        samples (int, optional):
+            The number of timed samples per benchmark. Defaults to DEFAULT_SAMPLES.
+        min_spells (int, optional):
+            Small scales are run several times per sample until about this many spells have been
+            processed, so their timings are not dominated by timer resolution. Defaults to 20_000.
+
+    Returns:
+        dict[str, Any]: The report, with results keyed by "name@scale".
+    """
+    results = {}
+    for scale in scales:
+        parts = synthetic_spell_parts(scale, seed)
+        spells = [Spell(*arguments) for arguments in parts]
+        loops = max(1, min(min_spells // max(scale, 1), 1_000))
+        for name, (function, takes_parts) in BENCHMARKS.items():
+            if names is not None and name not in names:
+                continue
+            times, references = time_benchmark(
+                function, parts if takes_parts else spells, samples, loops)
+            best = min(times)
+            # Each sample's time in reference runs, which cancels out the machine's speed.
+            relative = sorted(
+                duration / reference for duration, reference in zip(times, references))
+            results[f"{name}@{scale}"] = {
+                "benchmark": name,
+                "scale": scale,
+                "samples": samples,
+                "loops": loops,
+                "best_seconds": best,
+                "median_seconds": statistics.median(times),
+                "ns_per_spell": best / max(scale, 1) * 1e9,
+                "relative_per_spell": relative[0] / max(scale, 1),
+                "noise": statistics.median(relative) / relative[0] - 1,
+            }
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(
+        report: dict[str, Any],
+        baseline: dict[str, Any],
+        threshold: float = DEFAULT_THRESHOLD
+    ) -> list[str]:
+    """Find benchmarks that slowed down compared to a baseline report.
+
+    Args:
+        report (dict[str, Any]):
+            The current report from run.
+        baseline (dict[str, Any]):
+            An earlier report.
+        threshold (float, optional):
+            The allowed slowdown, as a fraction of the baseline time per spell relative to the
+            reference workload, on top of the larger of the two reports' noise for the benchmark.
+            Defaults to DEFAULT_THRESHOLD.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    regressions = []
+    for key, result in report["results"].items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        # Reports from before the reference workload was timed can only be compared in seconds.
+        measure = "relative_per_spell" if "relative_per_spell" in previous else "ns_per_spell"
+        change = result[measure] / previous[measure] - 1
+        basis = "against the reference, " if measure == "relative_per_spell" else ""
+        # Reports from before noise was recorded count as noiseless.
+        noise = max(result.get("noise", 0.0), previous.get("noise", 0.0))
+        if change > threshold + noise:
+            regressions.append(
+                f"{key}: {previous['ns_per_spell']:.0f}ns -> {result['ns_per_spell']:.0f}ns "
+                f"per spell (+{change:.0%} {basis}noise {noise:.0%})")
+    return regressions
+
+
+def main(arguments: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES))
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help=f"timed samples per benchmark (default {DEFAULT_SAMPLES})")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help="a previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown per spell beyond the measured noise, as a fraction "
+                             "(default 0.2)")
+    options = parser.parse_args(arguments)
+
+    report = run(
+        tuple(options.scales), tuple(options.only) if options.only else None, options.seed,
+        options.samples)
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), options.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Elemental interaction rules from the "Elemental Components V2" and "Elemental combinations" sections
+of magic_2.py, compiled into lookup tables.
+
+Target conditions are bit flags (wet, burning, frozen, ...). Every rule below is folded at import
+into one dense table indexed by [element][partner element][target conditions], where the partner
+is Elements.NONE when the element is used alone. Each entry holds the element's damage multiplier,
+the conditions it adds and removes and the name of the combination it forms, so resolving a one
+or two element payload against a target is one table read per element.
+
+Summary of the rules:
+- Fire ignites targets, but is halved against wet or frozen targets, drying or melting them instead.
+  Oiled targets burn hotter.
+- Water drenches targets and puts out fires.
+- Lightning is amplified on wet targets and counteracted by earth, both on grounded targets and
+  when earth is part of the same payload.
+- Cold needs moisture: it is halved on dry targets, amplified on wet ones (freezing them) and
+  counteracts fire.
+- Fire and water or fire and cold counteract each other.
+- Pairs such as water + cold, water + lightning, fire + air, water + fire (steam), earth + water
+  (mud), earth + fire (lava) and water + air (ice storm) form combination effects.
+"""
+
+
+from enum import IntEnum, IntFlag
+from typing import Iterable, Sequence
+
+
+class Elements(IntEnum):
+    """The elements of Elemental Components V2."""
+    NONE = 0
+    AIR = 1
+    EARTH = 2
+    FIRE = 3
+    WATER = 4
+    LIGHTNING = 5
+    COLD = 6
+
+
+class Conditions(IntFlag):
+    """Elemental conditions a target can be in."""
+    NONE = 0
+    WET = 1
+    BURNING = 2
+    FROZEN = 4
+    OILED = 8
+    GROUNDED = 16
+
+
+ELEMENT_COUNT: int = len(Elements)
+CONDITION_COUNT: int = 1 << len(Conditions)
+
+
+class ElementalOutcome:
+    """What one element does to a target in a given condition."""
+    __slots__ = ("multiplier", "adds", "removes", "combination")
+
+    def __init__(self, multiplier: float, adds: int, removes: int, combination: str | None) -> None:
+        """Initialize an ElementalOutcome instance.
+
+        Args:
+            multiplier (float):
+                The multiplier on the element's damage or magnitude.
+            adds (int):
+                The Conditions bits the element adds to the target.
+            removes (int):
+                The Conditions bits the element removes from the target.
+            combination (str | None):
+                The combination effect formed with the partner element, if any.
+        """
+        self.multiplier: float = multiplier
+        self.adds: int = adds
+        self.removes: int = removes
+        self.combination: str | None = combination
+
+    def __repr__(self) -> str:
+        return f"x{self.multiplier:g} +{Conditions(self.adds)!r} -{Conditions(self.removes)!r}"
+
+
+# (element, conditions required, multiplier, conditions added, conditions removed)
+# Rules apply in order and every rule whose required conditions are all present applies.
+CONDITION_RULES: tuple[tuple[Elements, Conditions, float, Conditions, Conditions], ...] = (
+    (Elements.FIRE, Conditions.NONE, 1, Conditions.BURNING, Conditions.NONE),
+    (Elements.FIRE, Conditions.OILED, 1.5, Conditions.NONE, Conditions.OILED),
+    (Elements.FIRE, Conditions.WET, 0.5, Conditions.NONE, Conditions.WET | Conditions.BURNING),
+    (Elements.FIRE, Conditions.FROZEN, 0.5, Conditions.WET, Conditions.FROZEN | Conditions.BURNING),
+    (Elements.WATER, Conditions.NONE, 1, Conditions.WET, Conditions.BURNING),
+    (Elements.LIGHTNING, Conditions.WET, 2, Conditions.NONE, Conditions.NONE),
+    (Elements.LIGHTNING, Conditions.GROUNDED, 0.5, Conditions.NONE, Conditions.NONE),
+    (Elements.COLD, Conditions.NONE, 0.5, Conditions.NONE, Conditions.NONE),
+    (Elements.COLD, Conditions.WET, 3, Conditions.FROZEN, Conditions.WET),
+    (Elements.COLD, Conditions.BURNING, 0.5, Conditions.NONE, Conditions.BURNING),
+)
+
+# (element, partner element): multiplier on the element when combined with the partner.
+PAIR_MULTIPLIERS: dict[tuple[Elements, Elements], float] = {
+    (Elements.LIGHTNING, Elements.EARTH): 0.5,
+    (Elements.LIGHTNING, Elements.WATER): 1.5,
+    # Brings its own moisture, cancelling the dry-target penalty and adding the wet bonus.
+    (Elements.COLD, Elements.WATER): 3,
+    (Elements.FIRE, Elements.WATER): 0.5,
+    (Elements.WATER, Elements.FIRE): 0.5,
+    (Elements.FIRE, Elements.COLD): 0.5,
+    (Elements.COLD, Elements.FIRE): 0.5,
+    (Elements.FIRE, Elements.AIR): 1.25,
+}
+
+# Unordered element pairs that form a combination effect.
+COMBINATIONS: dict[frozenset[Elements], str] = {
+    frozenset((Elements.WATER, Elements.COLD)): "Ice",
+    frozenset((Elements.WATER, Elements.LIGHTNING)): "Electrified Water",
+    frozenset((Elements.FIRE, Elements.AIR)): "Firestorm",
+    frozenset((Elements.WATER, Elements.FIRE)): "Steam",
+    frozenset((Elements.EARTH, Elements.WATER)): "Mud",
+    frozenset((Elements.EARTH, Elements.FIRE)): "Lava",
+    frozenset((Elements.WATER, Elements.AIR)): "Ice Storm",
+}
+
+
+def _condition_outcome(element: Elements, conditions: int) -> tuple[float, int, int]:
+    """Fold every condition rule for an element against a set of target conditions."""
+    multiplier = 1.0
+    adds = 0
+    removes = 0
+    for rule_element, required, factor, added, removed in CONDITION_RULES:
+        if rule_element == element and conditions & required == required:
+            multiplier *= factor
+            adds = (adds | added) & ~removed
+            removes = (removes | removed) & ~added
+    return multiplier, adds, removes
+
+
+def _compile() -> tuple[ElementalOutcome, ...]:
+    """Build the dense [element][partner][conditions] table."""
+    table = []
+    for element in Elements:
+        for partner in Elements:
+            pair = PAIR_MULTIPLIERS.get((element, partner), 1.0)
+            combination = COMBINATIONS.get(frozenset((element, partner)))
+            for conditions in range(CONDITION_COUNT):
+                multiplier, adds, removes = _condition_outcome(element, conditions)
+                table.append(ElementalOutcome(multiplier * pair, adds, removes, combination))
+    return tuple(table)
+
+
+INTERACTIONS: tuple[ElementalOutcome, ...] = _compile()
+
+
+def outcome(element: Elements, partner: Elements, conditions: int) -> ElementalOutcome:
+    """Look up what an element does to a target.
+
+    Args:
+        element (Elements):
+            The element applied.
+        partner (Elements):
+            The other element in the payload, or Elements.NONE if used alone.
+        conditions (int):
+            The target's Conditions bits.
+
+    Returns:
+        ElementalOutcome: The outcome.
+    """
+    return INTERACTIONS[(element * ELEMENT_COUNT + partner) * CONDITION_COUNT + conditions]
+
+
+def resolve(
+        elements: Sequence[Elements],
+        conditions: int = Conditions.NONE
+    ) -> tuple[list[float], int, set[str]]:
+    """Resolve a multi-element payload against one target.
+
+    One and two element payloads take one table read per element. Larger payloads read each
+    element's solo entry and multiply in its pair multipliers with every other element.
+
+    Args:
+        elements (Sequence[Elements]):
+            The payload's elements, in the order they are applied.
+        conditions (int, optional):
+            The target's Conditions bits before the payload. Defaults to Conditions.NONE.
+
+    Returns:
+        tuple[list[float], int, set[str]]:
+            The multiplier for each element, the target's Conditions bits afterwards and the
+            combination effects formed.
+    """
+    if len(elements) == 1:
+        entry = INTERACTIONS[elements[0] * ELEMENT_COUNT * CONDITION_COUNT + conditions]
+        return [entry.multiplier], (conditions | entry.adds) & ~entry.removes, set()
+
+    multipliers = []
+    combinations = set()
+    adds = 0
+    removes = 0
+    for index, element in enumerate(elements):
+        if len(elements) == 2:
+            entry = INTERACTIONS[
+                (element * ELEMENT_COUNT + elements[1 - index]) * CONDITION_COUNT + conditions]
+            multiplier = entry.multiplier
+        else:
+            entry = INTERACTIONS[element * ELEMENT_COUNT * CONDITION_COUNT + conditions]
+            multiplier = entry.multiplier
+            for partner in elements:
+                if partner != element:
+                    multiplier *= PAIR_MULTIPLIERS.get((element, partner), 1.0)
+                    combination = COMBINATIONS.get(frozenset((element, partner)))
+                    if combination:
+                        combinations.add(combination)
+        if entry.combination:
+            combinations.add(entry.combination)
+        multipliers.append(multiplier)
+        adds = (adds | entry.adds) & ~entry.removes
+        removes = (removes | entry.removes) & ~entry.adds
+    return multipliers, (conditions | adds) & ~removes, combinations
+
+
+def resolve_targets(
+        elements: Sequence[Elements],
+        target_conditions: Iterable[int]
+    ) -> list[tuple[list[float], int, set[str]]]:
+    """Resolve the same payload against many targets, such as every arc of chain lightning.
+
+    Args:
+        elements (Sequence[Elements]):
+            The payload's elements.
+        target_conditions (Iterable[int]):
+            Each target's Conditions bits.
+
+    Returns:
+        list[tuple[list[float], int, set[str]]]: The resolve result for each target.
+    """
+    return [resolve(elements, conditions) for conditions in target_conditions]
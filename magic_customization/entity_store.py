@@ -0,0 +1,447 @@
+"""
+Struct-of-arrays storage for summoned creatures and emulated constructs.
+
+Summon payloads and the Creation -> Emulation tiers of magic_2 let one caster fill the board with
+hundreds of short-lived entities: animated objects, golems, constructs that dissipate after a
+duration. Rather than one Python object per creature, every entity is a slot in a set of
+contiguous NumPy arrays (position, health, stats, expiry, owner, ...). Spawning a swarm takes
+slots from a free stack in one slice and despawning pushes them back, so slots are reused and
+nothing is allocated per creature. Per-round work (regeneration, expiry and death sweeps, upkeep
+per owner) is a handful of array operations over the whole store.
+
+Slots are reused, so code holding on to an entity across rounds should keep its handle (slot and
+generation packed into one int64) and check it with EntityStore.slots_of before use. slots_of
+gives -1 for entities that no longer exist, and every method taking slots skips negative ones, so
+its result can be passed on as is.
+
+Living constructs need Master Emulation or better, as described in magic_2. Materialized
+constructs never expire.
+"""
+
+
+from enum import IntEnum
+from typing import Hashable, Iterable
+
+import numpy as np
+
+
+# Columns of EntityStore.stats.
+STAT_FIELDS: tuple[str, ...] = ("attack", "damage", "dodge", "speed")
+STAT_COLUMN: dict[str, int] = {name: column for column, name in enumerate(STAT_FIELDS)}
+# EntityStore.expires of entities that never expire.
+NEVER: int = np.iinfo(np.int32).max
+NO_SOURCE: int = -1
+
+
+class EmulationTiers(IntEnum):
+    """How an entity was made, from the Summon and Creation payloads of magic_2."""
+    SUMMONED = 0
+    BASIC_EMULATION = 1
+    STANDARD_EMULATION = 2
+    ADVANCED_EMULATION = 3
+    MASTER_EMULATION = 4
+    TRUE_EMULATION = 5
+    MATERIALIZATION = 6
+
+
+class EntityTemplate:
+    """The stats every entity of one kind starts with."""
+    __slots__ = ("name", "health", "stats", "regeneration", "upkeep", "living")
+
+    def __init__(
+            self,
+            name: str,
+            health: float,
+            attack: float = 0,
+            damage: float = 0,
+            dodge: float = 0,
+            speed: float = 30,
+            regeneration: float = 0,
+            upkeep: float = 0,
+            living: bool = False
+        ) -> None:
+        """Initialize an EntityTemplate instance.
+
+        Args:
+            name (str):
+                The kind of entity, such as "Animated Sword".
+            health (float):
+                Maximum health.
+            attack (float, optional):
+                Attack bonus. Defaults to 0.
+            damage (float, optional):
+                Damage per hit. Defaults to 0.
+            dodge (float, optional):
+                Dodge. Defaults to 0.
+            speed (float, optional):
+                Movement per round in feet. Defaults to 30.
+            regeneration (float, optional):
+                Health regained per round, negative for constructs that crumble. Defaults to 0.
+            upkeep (float, optional):
+                Mana per round its owner pays to keep it. Defaults to 0.
+            living (bool, optional):
+                Whether it is a living construct. Defaults to False.
+        """
+        self.name: str = name
+        self.health: float = health
+        self.stats: tuple[float, ...] = (attack, damage, dodge, speed)
+        self.regeneration: float = regeneration
+        self.upkeep: float = upkeep
+        self.living: bool = living
+
+
+class EntityStore:
+    """Every summoned or constructed entity on the board, one array slot each."""
+    # Every per-slot array, resized together.
+    _COLUMNS: tuple[str, ...] = (
+        "alive", "generation", "kind", "tier", "owner", "source", "x", "y", "health", "max_health",
+        "regeneration", "upkeep", "stats", "expires",
+    )
+
+    def __init__(self, capacity: int = 256) -> None:
+        """Initialize an empty EntityStore.
+
+        Args:
+            capacity (int, optional):
+                Slots allocated up front. The store doubles when full. Defaults to 256.
+        """
+        self.capacity: int = 0
+        self.count: int = 0
+        self.templates: list[EntityTemplate] = []
+        self._template_index: dict[str, int] = {}
+        self.owners: list[Hashable] = []
+        self._owner_index: dict[Hashable, int] = {}
+        self._source_index: dict[Hashable, int] = {}
+        self._next_source: int = 0
+
+        self.alive: np.ndarray = np.zeros(0, dtype=bool)
+        self.generation: np.ndarray = np.zeros(0, dtype=np.uint32)
+        self.kind: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.tier: np.ndarray = np.zeros(0, dtype=np.uint8)
+        self.owner: np.ndarray = np.zeros(0, dtype=np.int32)
+        self.source: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.x: np.ndarray = np.zeros(0, dtype=np.float32)
+        self.y: np.ndarray = np.zeros(0, dtype=np.float32)
+        self.health: np.ndarray = np.zeros(0, dtype=np.float32)
+        self.max_health: np.ndarray = np.zeros(0, dtype=np.float32)
+        self.regeneration: np.ndarray = np.zeros(0, dtype=np.float32)
+        self.upkeep: np.ndarray = np.zeros(0, dtype=np.float32)
+        self.stats: np.ndarray = np.zeros((0, len(STAT_FIELDS)), dtype=np.float32)
+        # The first round the entity no longer exists.
+        self.expires: np.ndarray = np.zeros(0, dtype=np.int32)
+        # Free slots; the top of the stack is self._free[self._free_count - 1].
+        self._free: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._free_count: int = 0
+        self._grow(capacity)
+
+    def _grow(self, capacity: int) -> None:
+        """Resize every column to a new capacity and push the new slots on the free stack."""
+        old = self.capacity
+        for name in EntityStore._COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:old] = column
+            setattr(self, name, grown)
+        # The new slots go under the slots already free, highest first, so freed slots are reused
+        # before new ones and new ones are handed out lowest first.
+        added = capacity - old
+        free = np.zeros(capacity, dtype=np.int64)
+        free[:added] = np.arange(capacity - 1, old - 1, -1)
+        free[added:added + self._free_count] = self._free[:self._free_count]
+        self._free = free
+        self._free_count += added
+        self.capacity = capacity
+
+    def __len__(self) -> int:
+        return self.count
+
+    def register(self, template: EntityTemplate) -> int:
+        """Add a template, or get the index of one already registered under its name.
+
+        Args:
+            template (EntityTemplate):
+                The template.
+
+        Returns:
+            int: The template's index, the value of EntityStore.kind for its entities.
+        """
+        index = self._template_index.get(template.name)
+        if index is None:
+            index = self._template_index[template.name] = len(self.templates)
+            self.templates.append(template)
+        return index
+
+    def _owner_code(self, owner: Hashable) -> int:
+        code = self._owner_index.get(owner)
+        if code is None:
+            code = self._owner_index[owner] = len(self.owners)
+            self.owners.append(owner)
+        return code
+
+    def _source_code(self, source: Hashable) -> int:
+        code = self._source_index.get(source)
+        if code is None:
+            # Codes are never reused, since dispelled sources are dropped from the index.
+            code = self._source_index[source] = self._next_source
+            self._next_source += 1
+        return code
+
+    @staticmethod
+    def _existing(slots: np.ndarray, *per_slot: np.ndarray | float) -> tuple[np.ndarray, ...]:
+        """Drop negative slots (stale handles from slots_of) along with their per-slot values."""
+        slots = np.asarray(slots, dtype=np.int64)
+        keep = slots >= 0
+        values = (
+            np.broadcast_to(np.asarray(value, dtype=np.float32), slots.shape)[keep]
+            for value in per_slot)
+        return (slots[keep], *values)
+
+    def spawn(
+            self,
+            template: EntityTemplate | str,
+            positions: Iterable[tuple[float, float]] | np.ndarray,
+            owner: Hashable,
+            expires: int = NEVER,
+            tier: EmulationTiers = EmulationTiers.SUMMONED,
+            source: Hashable | None = None
+        ) -> np.ndarray:
+        """Spawn a swarm of entities of one kind.
+
+        Args:
+            template (EntityTemplate | str):
+                The template, or the name of a registered one.
+            positions (Iterable[tuple[float, float]] | np.ndarray):
+                One (x, y) position in feet per entity.
+            owner (Hashable):
+                The caster who controls them and pays their upkeep.
+            expires (int, optional):
+                The first round they no longer exist, such as the end round of the spell that
+                made them plus one. Defaults to NEVER.
+            tier (EmulationTiers, optional):
+                How they were made. Defaults to EmulationTiers.SUMMONED.
+            source (Hashable | None, optional):
+                What made them, such as the rounds.ActiveSpell, so they can be dispelled together
+                with despawn_source. Defaults to None.
+
+        Raises:
+            ValueError: If the template is living and the tier cannot create living constructs.
+
+        Returns:
+            np.ndarray: The new entities' slots.
+        """
+        if isinstance(template, str):
+            template = self.templates[self._template_index[template]]
+        emulated = EmulationTiers.BASIC_EMULATION <= tier < EmulationTiers.MASTER_EMULATION
+        if template.living and emulated:
+            tier_name = tier.name.replace("_", " ").title()
+            raise ValueError(f"{tier_name} cannot create living constructs.")
+        positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+        amount = len(positions)
+        if amount > self._free_count:
+            self._grow(max(self.capacity * 2, self.count + amount))
+
+        self._free_count -= amount
+        slots = self._free[self._free_count:self._free_count + amount][::-1].copy()
+        self.alive[slots] = True
+        self.kind[slots] = self.register(template)
+        self.tier[slots] = tier
+        self.owner[slots] = self._owner_code(owner)
+        self.source[slots] = NO_SOURCE if source is None else self._source_code(source)
+        self.x[slots] = positions[:, 0]
+        self.y[slots] = positions[:, 1]
+        self.health[slots] = self.max_health[slots] = template.health
+        self.regeneration[slots] = template.regeneration
+        self.upkeep[slots] = template.upkeep
+        self.stats[slots] = template.stats
+        self.expires[slots] = NEVER if tier == EmulationTiers.MATERIALIZATION else expires
+        self.count += amount
+        return slots
+
+    def despawn(self, slots: np.ndarray) -> None:
+        """Remove entities and return their slots to the free stack.
+
+        Args:
+            slots (np.ndarray):
+                The slots. Slots already free and negative slots are ignored.
+        """
+        slots = np.unique(self._existing(slots)[0])
+        slots = slots[self.alive[slots]]
+        self.alive[slots] = False
+        # Bump the generation so handles to the old occupants stop resolving.
+        self.generation[slots] += 1
+        self._free[self._free_count:self._free_count + len(slots)] = slots
+        self._free_count += len(slots)
+        self.count -= len(slots)
+
+    def despawn_source(self, source: Hashable) -> np.ndarray:
+        """Remove every entity made by a source, such as a spell that was dispelled or fizzled.
+
+        Args:
+            source (Hashable):
+                The source given to spawn.
+
+        Returns:
+            np.ndarray: The slots removed.
+        """
+        code = self._source_index.pop(source, None)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        slots = np.flatnonzero(self.alive & (self.source == code))
+        self.despawn(slots)
+        return slots
+
+    def handles(self, slots: np.ndarray) -> np.ndarray:
+        """Get stable handles for entities, valid until they despawn.
+
+        Args:
+            slots (np.ndarray):
+                The slots.
+
+        Returns:
+            np.ndarray: The handles, -1 for negative slots.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        handles = (self.generation[slots].astype(np.int64) << 32) | slots
+        return np.where(slots >= 0, handles, -1)
+
+    def slots_of(self, handles: np.ndarray) -> np.ndarray:
+        """Get the slots of handles, with -1 for entities that no longer exist.
+
+        Args:
+            handles (np.ndarray):
+                Handles from EntityStore.handles.
+
+        Returns:
+            np.ndarray: The slots.
+        """
+        handles = np.asarray(handles, dtype=np.int64)
+        valid = handles >= 0
+        slots = np.where(valid, handles & 0xFFFFFFFF, 0)
+        current = valid & self.alive[slots] & (self.generation[slots] == (handles >> 32))
+        return np.where(current, slots, -1)
+
+    def living_slots(self) -> np.ndarray:
+        """Get the slots of every entity on the board."""
+        return np.flatnonzero(self.alive)
+
+    def owned_by(self, owner: Hashable) -> np.ndarray:
+        """Get the slots of every entity a caster controls.
+
+        Args:
+            owner (Hashable):
+                The caster.
+
+        Returns:
+            np.ndarray: The slots.
+        """
+        code = self._owner_index.get(owner)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self.alive & (self.owner == code))
+
+    def within(self, x: float, y: float, radius: float) -> np.ndarray:
+        """Get the slots of every entity within a radius, such as those caught in an area spell.
+
+        Args:
+            x (float):
+                The centre's x in feet.
+            y (float):
+                The centre's y in feet.
+            radius (float):
+                The radius in feet.
+
+        Returns:
+            np.ndarray: The slots.
+        """
+        distance = (self.x - x) ** 2 + (self.y - y) ** 2
+        return np.flatnonzero(self.alive & (distance <= radius * radius))
+
+    def damage(self, slots: np.ndarray, amounts: np.ndarray | float) -> None:
+        """Deal damage to entities. An entity listed twice takes both hits. Entities at 0 health
+        are removed by the next sweep.
+
+        Args:
+            slots (np.ndarray):
+                The slots. Negative slots are ignored.
+            amounts (np.ndarray | float):
+                Damage per slot, negative to heal.
+        """
+        slots, amounts = self._existing(slots, amounts)
+        np.subtract.at(self.health, slots, amounts)
+        np.minimum(self.health, self.max_health, out=self.health)
+
+    def move(self, slots: np.ndarray, dx: np.ndarray | float, dy: np.ndarray | float) -> None:
+        """Move entities, each no further than its speed.
+
+        Args:
+            slots (np.ndarray):
+                The slots. Negative slots are ignored.
+            dx (np.ndarray | float):
+                The wanted change in x in feet.
+            dy (np.ndarray | float):
+                The wanted change in y in feet.
+        """
+        slots, dx, dy = self._existing(slots, dx, dy)
+        length = np.hypot(dx, dy)
+        speed = self.stats[slots, STAT_COLUMN["speed"]]
+        scale = np.divide(speed, length, out=np.ones_like(length), where=length > speed)
+        self.x[slots] += dx * scale
+        self.y[slots] += dy * scale
+
+    def modify(self, slots: np.ndarray, stat: str, amount: np.ndarray | float) -> None:
+        """Buff (positive) or debuff (negative) a stat of entities.
+
+        Args:
+            slots (np.ndarray):
+                The slots. Negative slots are ignored.
+            stat (str):
+                One of STAT_FIELDS.
+            amount (np.ndarray | float):
+                The change per slot.
+        """
+        slots, amount = self._existing(slots, amount)
+        self.stats[slots, STAT_COLUMN[stat]] += amount
+
+    def upkeep_by_owner(self) -> dict[Hashable, float]:
+        """Get the mana each caster pays per round for their entities."""
+        totals = np.bincount(
+            self.owner[self.alive], weights=self.upkeep[self.alive], minlength=len(self.owners))
+        return {owner: float(total) for owner, total in zip(self.owners, totals) if total}
+
+    def advance(self, current_round: int) -> tuple[np.ndarray, np.ndarray]:
+        """Run the per-round update: apply regeneration, then remove expired and destroyed
+        entities.
+
+        Args:
+            current_round (int):
+                The round starting.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The slots of the entities that expired and of those
+                destroyed.
+        """
+        live = self.alive
+        self.health += np.where(live, self.regeneration, 0)
+        np.minimum(self.health, self.max_health, out=self.health)
+        expired = np.flatnonzero(live & (self.expires <= current_round))
+        self.despawn(expired)
+        destroyed = np.flatnonzero(self.alive & (self.health <= 0))
+        self.despawn(destroyed)
+        return expired, destroyed
+
+    def describe(self, slot: int) -> str:
+        """Describe one entity, such as for the GM's token tooltip.
+
+        Args:
+            slot (int):
+                The slot.
+
+        Returns:
+            str: The description.
+        """
+        template = self.templates[self.kind[slot]]
+        owner = self.owners[self.owner[slot]]
+        expires = "" if self.expires[slot] == NEVER else f", until round {self.expires[slot] - 1}"
+        return (
+            f"{template.name} of {owner} at ({self.x[slot]:g}, {self.y[slot]:g}), "
+            f"{self.health[slot]:g}/{self.max_health[slot]:g} health{expires}")
@@ -0,0 +1,334 @@
+"""
+Opt-in timing and counting for the cast pipeline.
+
+Code on the hot path wraps each stage in a span:
+
+    with span("cost"):
+        ...
+
+While instrumentation is disabled (the default) span returns one shared do-nothing context
+manager, so a span costs a global read and a function call. enable() installs a Recorder that
+counts every span and times them, optionally only one top-level span in every sample_every so a
+busy server pays for the clock on a fraction of casts. Spans nested inside a sampled span are timed
+with it. Recording never touches the values the wrapped code computes.
+
+Stages used by the magic modules:
+- cast: Spell.cast
+- cost: compiling a spell's cost plan
+- validation: SpellValidator.validate
+- apply: Payload.apply
+Callers outside the magic modules, such as area targeting through world/spatial_index.py, can add
+their own stages (for example "targeting") with the same span function.
+
+Each thread records into its own tables, so spans never wait on a lock; the tables are merged
+when the data is read. Sampling runs per thread.
+
+Recorded data can be written to a JSON file or served as Prometheus text exposition.
+"""
+
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from time import perf_counter
+from typing import Any
+
+
+class _NullSpan:
+    """The span handed out while instrumentation is disabled."""
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Tables:
+    """One thread's recorded data."""
+    __slots__ = ("calls", "timed", "seconds", "max_seconds", "counters", "depth", "ticks", "sampled")
+
+    def __init__(self) -> None:
+        self.calls: dict[str, int] = {}
+        self.timed: dict[str, int] = {}
+        self.seconds: dict[str, float] = {}
+        self.max_seconds: dict[str, float] = {}
+        self.counters: dict[str, float] = {}
+        self.depth: int = 0
+        self.ticks: int = 0
+        self.sampled: bool = True
+
+
+class _Span:
+    """One timed or counted run of a stage."""
+    __slots__ = ("tables", "stage", "start")
+
+    def __init__(self, tables: _Tables, stage: str, timed: bool) -> None:
+        self.tables: _Tables = tables
+        self.stage: str = stage
+        self.start: float | None = perf_counter() if timed else None
+
+    def __enter__(self) -> None:
+        self.tables.depth += 1
+
+    def __exit__(self, *exc_info) -> None:
+        tables = self.tables
+        tables.depth -= 1
+        if self.start is not None:
+            elapsed = perf_counter() - self.start
+            stage = self.stage
+            tables.timed[stage] = tables.timed.get(stage, 0) + 1
+            tables.seconds[stage] = tables.seconds.get(stage, 0.0) + elapsed
+            if elapsed > tables.max_seconds.get(stage, 0.0):
+                tables.max_seconds[stage] = elapsed
+
+
+class Recorder:
+    """Per-stage call counts and sampled timings, recorded per thread."""
+    def __init__(self, sample_every: int = 1) -> None:
+        """Initialize a Recorder instance.
+
+        Args:
+            sample_every (int, optional):
+                Time one top-level span in this many per thread. Every span is still counted.
+                Defaults to 1.
+        """
+        self.sample_every: int = max(sample_every, 1)
+        self._local = threading.local()
+        self._threads: list[_Tables] = []
+        self._lock = threading.Lock()
+
+    def _tables(self) -> _Tables:
+        """Get the current thread's tables, creating them on its first span."""
+        tables = getattr(self._local, "tables", None)
+        if tables is None:
+            tables = self._local.tables = _Tables()
+            with self._lock:
+                self._threads.append(tables)
+        return tables
+
+    def span(self, stage: str) -> _Span:
+        """Start a span for a stage. Use span() from this module instead on the hot path.
+
+        Args:
+            stage (str):
+                The stage's name.
+
+        Returns:
+            _Span: The context manager.
+        """
+        tables = getattr(self._local, "tables", None) or self._tables()
+        tables.calls[stage] = tables.calls.get(stage, 0) + 1
+        if tables.depth == 0:
+            tables.sampled = tables.ticks % self.sample_every == 0
+            tables.ticks += 1
+        return _Span(tables, stage, tables.sampled)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        """Add to a free-standing counter, such as fizzled spells.
+
+        Args:
+            name (str):
+                The counter's name.
+            amount (float, optional):
+                The amount to add. Defaults to 1.
+        """
+        counters = self._tables().counters
+        counters[name] = counters.get(name, 0) + amount
+
+    def reset(self) -> None:
+        """Clear everything recorded so far."""
+        with self._lock:
+            for tables in self._threads:
+                for table in (
+                        tables.calls, tables.timed, tables.seconds, tables.max_seconds,
+                        tables.counters):
+                    table.clear()
+
+    def to_dict(self) -> dict[str, Any]:
+        """Summarize the recorded data.
+
+        Returns:
+            dict[str, Any]: Per-stage calls, timed calls, total, mean and maximum seconds, plus the
+                free-standing counters.
+        """
+        calls: dict[str, int] = {}
+        timed: dict[str, int] = {}
+        seconds: dict[str, float] = {}
+        max_seconds: dict[str, float] = {}
+        counters: dict[str, float] = {}
+        with self._lock:
+            threads = list(self._threads)
+        for tables in threads:
+            # Copying a dict is atomic, so the owning thread can keep recording meanwhile.
+            for stage, value in dict(tables.calls).items():
+                calls[stage] = calls.get(stage, 0) + value
+            for stage, value in dict(tables.timed).items():
+                timed[stage] = timed.get(stage, 0) + value
+            for stage, value in dict(tables.seconds).items():
+                seconds[stage] = seconds.get(stage, 0.0) + value
+            for stage, value in dict(tables.max_seconds).items():
+                max_seconds[stage] = max(max_seconds.get(stage, 0.0), value)
+            for name, value in dict(tables.counters).items():
+                counters[name] = counters.get(name, 0) + value
+        stages = {
+            stage: {
+                "calls": stage_calls,
+                "timed": timed.get(stage, 0),
+                "seconds": seconds.get(stage, 0.0),
+                "mean_seconds": seconds[stage] / timed[stage] if timed.get(stage) else 0.0,
+                "max_seconds": max_seconds.get(stage, 0.0),
+            }
+            for stage, stage_calls in calls.items()
+        }
+        return {
+            "sample_every": self.sample_every,
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def write(self, path: str) -> None:
+        """Write the summary to a JSON file.
+
+        Args:
+            path (str):
+                The file to write.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+            file.write("\n")
+
+    def prometheus_text(self, prefix: str = "spell") -> str:
+        """Render the recorded data in the Prometheus text exposition format.
+
+        Args:
+            prefix (str, optional):
+                The metric name prefix. Defaults to "spell".
+
+        Returns:
+            str: The metrics.
+        """
+        summary = self.to_dict()
+        lines = [
+            f"# HELP {prefix}_stage_calls_total Spans entered per stage.",
+            f"# TYPE {prefix}_stage_calls_total counter",
+        ]
+        lines.extend(
+            f'{prefix}_stage_calls_total{{stage="{stage}"}} {values["calls"]}'
+            for stage, values in summary["stages"].items())
+        lines.extend((
+            f"# HELP {prefix}_stage_seconds Time spent in sampled spans per stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ))
+        for stage, values in summary["stages"].items():
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {values["seconds"]!r}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {values["timed"]}')
+        lines.extend((
+            f"# HELP {prefix}_stage_seconds_max Longest sampled span per stage.",
+            f"# TYPE {prefix}_stage_seconds_max gauge",
+        ))
+        lines.extend(
+            f'{prefix}_stage_seconds_max{{stage="{stage}"}} {values["max_seconds"]!r}'
+            for stage, values in summary["stages"].items())
+        for name, value in summary["counters"].items():
+            metric = f"{prefix}_{name.replace(' ', '_').replace('-', '_')}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the metrics as Prometheus text from a background thread.
+
+        Args:
+            port (int, optional):
+                The port to listen on, 0 for any free port. Defaults to 9464.
+            host (str, optional):
+                The address to listen on. Defaults to "127.0.0.1".
+
+        Returns:
+            ThreadingHTTPServer: The server. Call shutdown() on it to stop serving.
+        """
+        recorder = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = recorder.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                return None
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+_recorder: Recorder | None = None
+
+
+def span(stage: str) -> _Span | _NullSpan:
+    """Wrap a stage of the cast pipeline.
+
+    Args:
+        stage (str):
+            The stage's name, such as "cost" or "apply".
+
+    Returns:
+        _Span | _NullSpan: A context manager, which does nothing while instrumentation is disabled.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return recorder.span(stage)
+
+
+def count(name: str, amount: float = 1) -> None:
+    """Add to a free-standing counter if instrumentation is enabled.
+
+    Args:
+        name (str):
+            The counter's name.
+        amount (float, optional):
+            The amount to add. Defaults to 1.
+    """
+    if _recorder is not None:
+        _recorder.count(name, amount)
+
+
+def enable(sample_every: int = 1) -> Recorder:
+    """Start recording with a fresh Recorder.
+
+    Args:
+        sample_every (int, optional):
+            Time one top-level span in this many. Defaults to 1.
+
+    Returns:
+        Recorder: The recorder.
+    """
+    global _recorder
+    _recorder = Recorder(sample_every)
+    return _recorder
+
+
+def disable() -> Recorder | None:
+    """Stop recording.
+
+    Returns:
+        Recorder | None: The recorder that was active, with everything it recorded.
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+def recorder() -> Recorder | None:
+    """Get the active recorder, or None if instrumentation is disabled."""
+    return _recorder
@@ -77,123 +77,318 @@ Target:
     - Line: The spell affects a straight line extending from the activation point.
     - Custom: The spell has a custom target type defined by the caster.
 - Air Burst: The spell targets a point in space and affects an area around that point. This is generally used for 
+
+Delivery methods and target types are immutable component records kept in a ComponentRegistry.
+The built-in records are loaded from the DELIVERY_METHOD_TABLE and TARGET_TABLE data tables below
+and custom ones (such as a caster's Custom target) can be registered at runtime.
 """
 
 
-from enum import Enum
+import json
+from typing import Any, Iterable, Iterator
+
+
+class ComponentRecord:
+    """Base class of immutable, interned component records. A record's costs are plain slots, so
+    pricing reads them directly."""
+    __slots__ = ("component_id", "name", "description")
+
+    # The cost slots of the record, in constructor order.
+    COST_FIELDS: tuple[str, ...] = ()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} records are immutable.")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} records are immutable.")
+
+    def _set(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
 
+    @property
+    def value(self) -> "ComponentRecord":
+        """The record itself, so code written against the old enum members' .value still works."""
+        return self
 
-class DeliveryMethod:
+    def costs(self) -> dict[str, float]:
+        """Get the record's costs by field name."""
+        return {field: getattr(self, field) for field in self.COST_FIELDS}
+
+    def __reduce__(self) -> tuple:
+        # Registered records are re-interned by name on unpickling, registering them in the
+        # receiving process if needed (such as custom components sent to a worker).
+        if self.component_id < 0:
+            return (type(self), (self.name, *self.costs().values(), self.description))
+        return (_intern, (type(self).__name__, self.name, self.costs(), self.description))
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.name} #{self.component_id}>"
+
+
+class DeliveryMethod(ComponentRecord):
     """How a spell travels before being activated. Multiple compatible delivery methods can be
     combined like ranged and touch to create a spell which attatches to a target and activates
     after a duration. Any type of delivery method except for instant release can retain its
     delivery method even after activating provided it retains sufficient power and has some
     mechanism to do so. An example of this would be an enchantment which activates it's effect
     after a duration but generally retains the enchantment for later reactivation."""
+    __slots__ = (
+        "base_power_cost", "base_complexity_cost", "range_power_cost", "duration_complexity_cost",
+        "complexity_cost_mult", "power_cost_mult",
+    )
+
+    COST_FIELDS = (
+        "base_power_cost", "base_complexity_cost", "range_power_cost", "duration_complexity_cost",
+        "complexity_cost_mult", "power_cost_mult",
+    )
+
     def __init__(
             self,
+            name: str,
             base_power_cost: float,
             base_complexity_cost: float,
             range_power_cost: float,
             duration_complexity_cost: float,
             complexity_cost_mult: float,
             power_cost_mult: float,
-            description: str = ""
+            description: str = "",
+            component_id: int = -1
         ) -> None:
         """Initialize a DeliveryMethod instance. All multipliers are applied multiplicatively to
-        the combined base costs of the spell. 
+        the combined base costs of the spell. Use DeliveryMethodTypes.register to create an
+        interned record.
 
         Args:
+            name (str):
+                The delivery method's name, such as "RANGED".
             base_power_cost (float):
                 The initial power cost associated with using this delivery method.
             base_complexity_cost (float):
                 The initial complexity cost associated with using this delivery method.
             range_power_cost (float):
-                The cost per 5ft per round of delivery speed.
+                The power coefficient per 5ft of range, applied as x(1 + range_power_cost x
+                distance) where distance is measured in 5ft squares.
             duration_complexity_cost (float):
-                The cost per round of delivery duration.
-            complexity_cost (float):
+                The complexity multiplier applied per round of delivery duration after the first
+                (per timeframe step for enchantments).
+            complexity_cost_mult (float):
                 The complexity cost multiplier associated with using this delivery method.
-            power_cost (float):
+            power_cost_mult (float):
                 The initial power cost multiplier associated with using this delivery method.
             description (str, optional):
                 A brief description of the delivery method. Defaults to "".
+            component_id (int, optional):
+                The id assigned by the registry, -1 if unregistered. Defaults to -1.
         """
-        self.range_power_cost: float = range_power_cost
-        self.duration_complexity_cost: float = duration_complexity_cost
-        self.complexity_cost_mult: float = complexity_cost_mult
-        self.power_cost_mult: float = power_cost_mult
-        self.description: str = description
+        self._set("component_id", component_id)
+        self._set("name", name)
+        self._set("description", description)
+        self._set("base_power_cost", base_power_cost)
+        self._set("base_complexity_cost", base_complexity_cost)
+        self._set("range_power_cost", range_power_cost)
+        self._set("duration_complexity_cost", duration_complexity_cost)
+        self._set("complexity_cost_mult", complexity_cost_mult)
+        self._set("power_cost_mult", power_cost_mult)
 
 
-class Target:
+class Target(ComponentRecord):
     """Represents a target for a spell, whether it's a single entity, several, or an area."""
+    __slots__ = ("volume_power_cost", "complexity_cost_mult", "power_cost_mult")
+
+    COST_FIELDS = ("volume_power_cost", "complexity_cost_mult", "power_cost_mult")
+
     def __init__(
             self,
+            name: str,
             volume_power_cost: float,
             complexity_cost_mult: float,
             power_cost_mult: float,
-            description: str = ""
+            description: str = "",
+            component_id: int = -1
         ) -> None:
         """Initialize a Target instance. All multipliers are applied multiplicatively to
-        the combined base costs of the spell. 
+        the combined base costs of the spell. Use TargetTypes.register to create an interned
+        record.
 
         Args:
-            volume_cost (float):
-                The cost multiplier per unit of volume for the target.
-            complexity_cost (float):
+            name (str):
+                The target type's name, such as "SPHERE".
+            volume_power_cost (float):
+                The additional power cost per unit (5ft cube) of volume for the target.
+            complexity_cost_mult (float):
                 The complexity cost multiplier associated with targeting this type.
-            power_cost (float):
+            power_cost_mult (float):
                 The initial power cost multiplier associated with targeting this type.
             description (str, optional):
                 A brief description of the target type. Defaults to "".
+            component_id (int, optional):
+                The id assigned by the registry, -1 if unregistered. Defaults to -1.
         """
-        self.volume_power_cost: float = volume_power_cost
-        self.complexity_cost_mult: float = complexity_cost_mult
-        self.power_cost_mult: float = power_cost_mult
-        self.description: str = description
+        self._set("component_id", component_id)
+        self._set("name", name)
+        self._set("description", description)
+        self._set("volume_power_cost", volume_power_cost)
+        self._set("complexity_cost_mult", complexity_cost_mult)
+        self._set("power_cost_mult", power_cost_mult)
+
+
+class ComponentRegistry:
+    """Interns component records of one kind and looks them up by name or integer id. Registered
+    records are also available as attributes, such as DeliveryMethodTypes.RANGED."""
+    def __init__(self, kind: type[ComponentRecord], table: Iterable[dict[str, Any]] = ()) -> None:
+        """Initialize a ComponentRegistry instance.
+
+        Args:
+            kind (type[ComponentRecord]):
+                The record class, such as DeliveryMethod.
+            table (Iterable[dict[str, Any]], optional):
+                Rows to register, each holding a name, every cost field and optionally a
+                description. Defaults to ().
+        """
+        self.kind: type[ComponentRecord] = kind
+        self._by_name: dict[str, ComponentRecord] = {}
+        self._by_id: list[ComponentRecord] = []
+        self.load(table)
+
+    def register(self, name: str, description: str = "", **costs: float) -> ComponentRecord:
+        """Register a component, or get the existing record if an identical one is registered.
+
+        Args:
+            name (str):
+                The component's name.
+            description (str, optional):
+                A brief description. Defaults to "".
+            **costs (float):
+                Every cost field of the record kind.
+
+        Raises:
+            ValueError: If a different component with the same name is already registered.
+
+        Returns:
+            ComponentRecord: The interned record.
+        """
+        existing = self._by_name.get(name)
+        if existing is not None:
+            if existing.costs() != costs:
+                raise ValueError(f"A different {self.kind.__name__} named {name} is already registered.")
+            return existing
+        record = self.kind(name, **costs, description=description, component_id=len(self._by_id))
+        self._by_name[name] = record
+        self._by_id.append(record)
+        return record
+
+    def load(self, table: Iterable[dict[str, Any]]) -> None:
+        """Register every row of a data table.
+
+        Args:
+            table (Iterable[dict[str, Any]]):
+                Rows holding a name, every cost field and optionally a description.
+        """
+        for row in table:
+            self.register(**row)
+
+    def load_json(self, path: str) -> None:
+        """Register every row of a JSON data table, a list of row objects.
+
+        Args:
+            path (str):
+                The JSON file.
+        """
+        with open(path, encoding="utf-8") as file:
+            self.load(json.load(file))
+
+    def __getitem__(self, key: int | str) -> ComponentRecord:
+        """Look a record up by integer id or name.
+
+        Raises:
+            KeyError: If no such record is registered.
+        """
+        try:
+            return self._by_id[key] if isinstance(key, int) else self._by_name[key]
+        except (IndexError, KeyError):
+            raise KeyError(f"Unknown {self.kind.__name__}: {key!r}") from None
+
+    def get(self, key: int | str, default: Any = None) -> Any:
+        """Look a record up by integer id or name, returning a default if it is not registered."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getattr__(self, name: str) -> ComponentRecord:
+        by_name = self.__dict__.get("_by_name")
+        if by_name is None or name not in by_name:
+            raise AttributeError(name)
+        return by_name[name]
+
+    def __contains__(self, key: object) -> bool:
+        if isinstance(key, ComponentRecord):
+            return self._by_name.get(key.name) is key
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[ComponentRecord]:
+        return iter(self._by_id)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __repr__(self) -> str:
+        return f"ComponentRegistry({self.kind.__name__}, {[record.name for record in self]})"
+
+
+DELIVERY_METHOD_TABLE: tuple[dict[str, Any], ...] = (
+    {"name": "INSTANT_RELEASE", "base_power_cost": 0, "base_complexity_cost": 0,
+     "range_power_cost": 0, "duration_complexity_cost": 1,
+     "complexity_cost_mult": 1, "power_cost_mult": 1,
+     "description": "The spell is released instantly upon casting directly in front of you. "
+                    "Effectively no delivery method with a range of 5ft and a duration of 1 round."},
+    {"name": "TOUCH", "base_power_cost": 1, "base_complexity_cost": 1,
+     "range_power_cost": 0, "duration_complexity_cost": 1.25,
+     "complexity_cost_mult": 1.1, "power_cost_mult": 1,
+     "description": "The spell is placed upon touching a target and activates after a given "
+                    "duration."},
+    {"name": "RANGED", "base_power_cost": 5, "base_complexity_cost": 5,
+     "range_power_cost": 0.05, "duration_complexity_cost": 1.5,
+     "complexity_cost_mult": 1, "power_cost_mult": 1,
+     "description": "The spell is launched towards a target within range. Requires line of sight "
+                    "and costs power based on distance per round."},
+    {"name": "SELF", "base_power_cost": 0, "base_complexity_cost": 0,
+     "range_power_cost": 0, "duration_complexity_cost": 1,
+     "complexity_cost_mult": 1, "power_cost_mult": 1,
+     "description": "The spell affects only the caster."},
+    {"name": "ENCHANT", "base_power_cost": 2, "base_complexity_cost": 2,
+     "range_power_cost": 0, "duration_complexity_cost": 1.1,
+     "complexity_cost_mult": 1, "power_cost_mult": 1,
+     "description": "The spell enchants an object or item to activate later."},
+)
+
+TARGET_TABLE: tuple[dict[str, Any], ...] = (
+    {"name": "TARGET", "volume_power_cost": 0, "complexity_cost_mult": 1.5, "power_cost_mult": 1,
+     "description": "The spell targets a specific creature or object."},
+    {"name": "SPHERE", "volume_power_cost": 1, "complexity_cost_mult": 1, "power_cost_mult": 2,
+     "description": "The spell affects a spherical area."},
+    {"name": "CONE", "volume_power_cost": 1, "complexity_cost_mult": 1.25, "power_cost_mult": 1.5,
+     "description": "The spell affects a cone-shaped area in front of the activation point."},
+    {"name": "LINE", "volume_power_cost": 1, "complexity_cost_mult": 1.25, "power_cost_mult": 1.25,
+     "description": "The spell affects a straight line extending from the activation point."},
+)
+
+DeliveryMethodTypes: ComponentRegistry = ComponentRegistry(DeliveryMethod, DELIVERY_METHOD_TABLE)
+TargetTypes: ComponentRegistry = ComponentRegistry(Target, TARGET_TABLE)
+
+_REGISTRIES: dict[str, ComponentRegistry] = {
+    "DeliveryMethod": DeliveryMethodTypes,
+    "Target": TargetTypes,
+}
+
 
+def _intern(kind: str, name: str, costs: dict[str, float], description: str) -> ComponentRecord:
+    """Unpickle a registered record as the matching record of this process's registry."""
+    return _REGISTRIES[kind].register(name, description, **costs)
 
-class DeliveryMethodTypes(str, Enum):
-    """Enumeration for different delivery methods of spells or abilities."""
-    INSTANT_RELEASE = DeliveryMethod(
-        base_power_cost=0, base_complexity_cost=0,
-        range_power_cost=0, duration_complexity_cost=0,
-        complexity_cost_mult=1, power_cost_mult=1,
-        description="The spell is released instantly upon casting directly in front of you. \
-            Effectively no delivery method with a range of 5ft and a duration of 1 round.")
-    TOUCH = DeliveryMethod(
-        base_power_cost=0, base_complexity_cost=1,
-        range_power_cost=0, duration_complexity_cost=8,
-        complexity_cost_mult=1.1, power_cost_mult=1,
-        description="The spell is placed upon touching a target and activates after a given \
-            duration.")
-    RANGED = DeliveryMethod(
-        base_power_cost=5, base_complexity_cost=5,
-        range_power_cost=1, duration_complexity_cost=10,
-        complexity_cost_mult=0, power_cost_mult=0,
-        description="The spell is launched towards a target within range. Requires line of sight \
-            and costs power based on distance per round.")
-    SELF = DeliveryMethod(
-        base_power_cost=0, base_complexity_cost=0,
-        range_power_cost=0, duration_complexity_cost=0,
-        complexity_cost_mult=0, power_cost_mult=0,
-        description="The spell affects only the caster.")
-    ENCHANT = DeliveryMethod(
-        base_power_cost=0, base_complexity_cost=0,
-        range_power_cost=0, duration_complexity_cost=0,
-        complexity_cost_mult=0, power_cost_mult=0,
-        description="The spell enchants an object or item to activate later.")
-
-class TargetTypes(str, Enum):
-    """Enumeration for different target types of spells or abilities."""
-    TARGET = Target(volume_power_cost=0, complexity_cost_mult=1.5, power_cost_mult=1, description="The spell targets a specific creature or object.")
-    SPHERE = Target(volume_power_cost=1, complexity_cost_mult=1, power_cost_mult=2, description="The spell affects a spherical area.")
-    CONE = Target(volume_power_cost=1, complexity_cost_mult=1.25, power_cost_mult=1.5, description="The spell affects a cone-shaped area in front of the activation point.")
-    LINE = Target(volume_power_cost=1, complexity_cost_mult=1.25, power_cost_mult=1.25, description="The spell affects a straight line extending from the activation point.")
 
 class Spell:
-    def __init__(self, name: str, description: str, delivery_method: DeliveryMethodTypes) -> None:
+    def __init__(self, name: str, description: str, delivery_method: DeliveryMethod) -> None:
         self.name: str = name
         self.description: str = description
-        self.delivery_method: DeliveryMethodTypes = delivery_method
+        self.delivery_method: DeliveryMethod = delivery_method
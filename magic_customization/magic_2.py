@@ -259,6 +259,13 @@ Payload Component Categories:
 """
 
 
+import math
+
+from instrumentation import span
+from magic import DeliveryMethod, Target
+from spell_costs import CostPlan, compile_cost_plan
+
+
 
 
 
@@ -279,8 +286,76 @@ Payload Component Categories:
 #     ENVIRONMENTAL = "environmental"
 
 
+class SpellComponent:
+    """A generic spell part such as a trigger, power source or sense, with the same flat and
+    multiplicative costs as the components in magic.py."""
+    def __init__(
+            self,
+            name: str,
+            base_power_cost: float = 0,
+            base_complexity_cost: float = 0,
+            power_cost_mult: float = 1,
+            complexity_cost_mult: float = 1,
+            description: str = "",
+            alignment: str | None = None
+        ) -> None:
+        self.name: str = name
+        self.base_power_cost: float = base_power_cost
+        self.base_complexity_cost: float = base_complexity_cost
+        self.power_cost_mult: float = power_cost_mult
+        self.complexity_cost_mult: float = complexity_cost_mult
+        self.description: str = description
+        # The divine or infernal alignment the component draws on, if any.
+        self.alignment: str | None = alignment
+
+    def __repr__(self) -> str:
+        return f"{self.name} (Power: {self.base_power_cost}, Complexity: {self.base_complexity_cost})"
+
+
+class Propulsion:
+    """How far and how long a spell travels using one of the magic.py delivery methods."""
+    def __init__(self, method: DeliveryMethod, range_ft: float = 0, duration: int = 1) -> None:
+        """Initialize a Propulsion instance.
+
+        Args:
+            method (DeliveryMethod):
+                The delivery method used.
+            range_ft (float, optional):
+                The distance travelled in feet. Defaults to 0.
+            duration (int, optional):
+                The delivery duration in rounds (timeframe steps for enchantments). Defaults to 1.
+        """
+        self.method: DeliveryMethod = method
+        self.range_ft: float = range_ft
+        self.duration: int = duration
+
+
+class Container:
+    """What a spell holds its payload against using one of the magic.py target types."""
+    def __init__(self, shape: Target, volume: float = 0, count: int = 1) -> None:
+        """Initialize a Container instance.
+
+        Args:
+            shape (Target):
+                The target type used.
+            volume (float, optional):
+                The affected volume in 5ft cubes. Defaults to 0.
+            count (int, optional):
+                The number of targeted entities. Defaults to 1.
+        """
+        self.shape: Target = shape
+        self.volume: float = volume
+        self.count: int = count
+
+
 class Spell:
+    # Assigning any of these drops the cached cost plan.
+    COST_ATTRIBUTES = frozenset(
+        ("container", "propulsion", "trigger", "power_source", "senses", "variables", "payload"))
+
     def __init__(self, name, container, propulsion, trigger, power_source, senses, variables, payload):
+        self._cost_plan: CostPlan | None = None
+        self._program = None
         self.name = name
         self.container = container
         self.propulsion = propulsion
@@ -290,26 +365,65 @@ class Spell:
         self.variables = variables
         self.payload = payload
 
+    def __setattr__(self, name, value) -> None:
+        if name in Spell.COST_ATTRIBUTES:
+            object.__setattr__(self, "_cost_plan", None)
+            object.__setattr__(self, "_program", None)
+        object.__setattr__(self, name, value)
+
     def cast(self, *variables):
-        return f"Casting {self.name} and variables {variables}!"
+        with span("cast"):
+            return f"Casting {self.name} and variables {variables}!"
+
+    @property
+    def cost_plan(self) -> CostPlan:
+        """The compiled cost plan, rebuilt only after a component is reassigned. Call
+        invalidate_costs() after mutating a component in place."""
+        if self._cost_plan is None:
+            with span("cost"):
+                self._cost_plan = compile_cost_plan(self)
+        return self._cost_plan
+
+    @property
+    def program(self):
+        """The trigger and payload bytecode (spell_bytecode.CompiledSpell), rebuilt only after a
+        component is reassigned. Call invalidate_costs() after mutating a component in place."""
+        if self._program is None:
+            # Imported here because spell_bytecode builds its trigger components on this module.
+            from spell_bytecode import compile_spell
+            self._program = compile_spell(self)
+        return self._program
+
+    def invalidate_costs(self) -> None:
+        """Drop the cached cost plan and program so they are recompiled on next access."""
+        self._cost_plan = None
+        self._program = None
 
-    # TODO: Calculate complexity based on spell attributes.
     @property
     def complexity(self) -> int:
-        return 0
+        duration = getattr(self.propulsion, "duration", 1)
+        return math.ceil(self.cost_plan.complexity(duration))
 
-    # TODO: Calculate initial mana cost based on spell attributes.
     @property
     def initial_mana_cost(self) -> int:
-        return 0
+        return math.ceil(self.cost_plan.power(
+            getattr(self.propulsion, "range_ft", 0),
+            getattr(self.container, "volume", 0),
+            getattr(self.container, "count", 1),
+        ))
 
 
 class Payload:
-    def __init__(self, effects: list[PayloadItem]):
+    def __init__(self, effects: list["PayloadItem"], sequence: list | None = None):
         self.effects = effects
+        # Controlflow over the effects (spell_bytecode If/Repeat/While/... nodes whose leaves are
+        # items of effects). None applies each effect once, in order.
+        self.sequence = sequence
 
-    def apply(self, target):
-        return f"Applying {self.effects} to {target}."
+    def apply(self, target, effects=None):
+        # effects overrides the items applied, such as with those the sequence emitted.
+        with span("apply"):
+            return f"Applying {self.effects if effects is None else effects} to {target}."
 
 class PayloadItem:
     def __init__(self, effect_type: str, magnitude: int, duration: int) -> None:
@@ -0,0 +1,155 @@
+"""
+Ritual casting optimizer.
+
+Per the magic.py docstring, each ritual step multiplies a spell's complexity by 0.75 and its power
+cost by 1.25, bypasses the caster's Spell Power (per-round output) limit and takes longer to cast,
+following the ladder 1 minute, 10 minutes, 1 hour, 6 hours, 24 hours, 1 week, 1 month, 6 months,
+1 year.
+
+Complexity only falls and power only rises with each step, so the castable steps always form one
+contiguous run starting at the first step whose complexity fits the caster's Spell Complexity
+Limit. That first step is therefore both the fastest and the cheapest way to cast, and it is found
+in closed form with logarithms instead of walking the ladder.
+
+Caster values come from the player stats tree:
+- Spell Complexity Limit: Intelligence > Magical
+- Spell Power: Willpower > Magical
+- Mana Pool: Wisdom > Magical
+"""
+
+
+import math
+from typing import Any
+
+
+RITUAL_COMPLEXITY_FACTOR: float = 0.75
+RITUAL_POWER_FACTOR: float = 1.25
+RITUAL_STEPS: tuple[str, ...] = (
+    "1 minute", "10 minutes", "1 hour", "6 hours", "24 hours",
+    "1 week", "1 month", "6 months", "1 year",
+)
+
+_LOG_COMPLEXITY_FACTOR: float = math.log(RITUAL_COMPLEXITY_FACTOR)
+
+
+class CastingOption:
+    """The cheapest way to cast a spell. Step 0 is a normal cast, steps 1 and up are rituals."""
+    __slots__ = ("step", "complexity", "mana_cost")
+
+    def __init__(self, step: int, complexity: float, mana_cost: float) -> None:
+        """Initialize a CastingOption instance.
+
+        Args:
+            step (int):
+                The ritual step, 0 for a normal cast.
+            complexity (float):
+                The spell's complexity at this step.
+            mana_cost (float):
+                The spell's mana cost at this step.
+        """
+        self.step: int = step
+        self.complexity: float = complexity
+        self.mana_cost: float = mana_cost
+
+    @property
+    def is_ritual(self) -> bool:
+        """Whether the spell must be cast as a ritual."""
+        return self.step > 0
+
+    @property
+    def casting_time(self) -> str:
+        """The time the cast takes."""
+        return RITUAL_STEPS[self.step - 1] if self.step else "1 action"
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.casting_time} (Complexity: {self.complexity:g}, Mana: {self.mana_cost:g})"
+        )
+
+
+def minimum_step(complexity: float, complexity_limit: float) -> int | None:
+    """Find the first ladder step at which a spell's complexity fits within a limit.
+
+    Args:
+        complexity (float):
+            The spell's normal complexity.
+        complexity_limit (float):
+            The caster's Spell Complexity Limit.
+
+    Returns:
+        int | None: The step (0 for a normal cast), or None if no step brings it under the limit.
+    """
+    if complexity <= complexity_limit:
+        return 0
+    if complexity_limit <= 0:
+        return None
+    step = max(math.ceil(math.log(complexity_limit / complexity) / _LOG_COMPLEXITY_FACTOR), 1)
+    # Nudge past floating point error in the logarithm.
+    while step > 1 and complexity * RITUAL_COMPLEXITY_FACTOR ** (step - 1) <= complexity_limit:
+        step -= 1
+    while complexity * RITUAL_COMPLEXITY_FACTOR ** step > complexity_limit:
+        step += 1
+    return step if step <= len(RITUAL_STEPS) else None
+
+
+def cheapest_cast(
+        complexity: float,
+        mana_cost: float,
+        complexity_limit: float,
+        spell_power: float,
+        mana_pool: float
+    ) -> CastingOption | None:
+    """Find the fastest (and, equivalently, cheapest) way a caster can cast a spell.
+
+    Args:
+        complexity (float):
+            The spell's normal complexity.
+        mana_cost (float):
+            The spell's normal mana cost.
+        complexity_limit (float):
+            The caster's Spell Complexity Limit.
+        spell_power (float):
+            The caster's Spell Power, the per-round mana output limit of a normal cast.
+        mana_pool (float):
+            The caster's Mana Pool.
+
+    Returns:
+        CastingOption | None: The best option, or None if the caster cannot cast the spell at all.
+    """
+    step = minimum_step(complexity, complexity_limit)
+    if step is None:
+        return None
+    if step == 0 and mana_cost > spell_power:
+        # Too much output for a normal cast, but a ritual bypasses the power limit.
+        step = 1
+
+    step_mana_cost = mana_cost * RITUAL_POWER_FACTOR ** step
+    if step_mana_cost > mana_pool:
+        # Every later step costs even more.
+        return None
+    return CastingOption(step, complexity * RITUAL_COMPLEXITY_FACTOR ** step, step_mana_cost)
+
+
+def cheapest_spell_cast(
+        spell: Any,
+        complexity_limit: float,
+        spell_power: float,
+        mana_pool: float
+    ) -> CastingOption | None:
+    """Find the fastest and cheapest way a caster can cast a magic_2.Spell.
+
+    Args:
+        spell (Any):
+            A magic_2.Spell.
+        complexity_limit (float):
+            The caster's Spell Complexity Limit.
+        spell_power (float):
+            The caster's Spell Power.
+        mana_pool (float):
+            The caster's Mana Pool.
+
+    Returns:
+        CastingOption | None: The best option, or None if the caster cannot cast the spell at all.
+    """
+    return cheapest_cast(
+        spell.complexity, spell.initial_mana_cost, complexity_limit, spell_power, mana_pool)
@@ -0,0 +1,336 @@
+"""
+Round-based scheduler for active spells.
+
+Timing follows the magic docs:
+- The first round of a spell's flight happens during the round it is cast and later rounds happen
+  at the start of the caster's turn.
+- A spell's delivery arrives on the last round of its travel (its propulsion duration).
+- Its triggers are checked on arrival and, until they fire, at the start of every later round up
+  to its end round. The spell activates when they fire and ends unfired after its end round.
+- After activating, the spell stays active for the longest duration among its payload effects.
+- A spell's mana cost is consumed each round it is active, starting with the casting round.
+
+Triggers and payloads run as the spell's compiled bytecode (magic_2.Spell.program), with every
+due spell's triggers checked in one spell_bytecode.check_triggers batch. Each check senses
+"elapsed", the rounds since casting, plus whatever the caller put in ActiveSpell.senses (such as
+{"signal:detonate": True}); on arrival the spell's arrival_senses ("impact" and plain trigger
+components such as "On Contact") hold as well. A spell whose trigger or payload program fails
+(spell_bytecode.PROGRAM_ERRORS: out of steps, division by zero, a variable or sense of the wrong
+type, ...) fizzles. A payload that reactivates sends the delivery out again.
+
+Activations and expirations are kept in a priority queue keyed by round, so advancing a round only
+touches the spells that activate or expire that round. Mana upkeep is kept as one running drain
+total per caster, so charging it costs one operation per caster rather than one per spell.
+
+Summoned creatures and constructs live in an entity_store.EntityStore. Spawn them with the
+ActiveSpell as their source and they are dispelled with it; their own upkeep is charged with the
+caster's spells, and the store is swept for expired and destroyed entities every round before
+upkeep is charged, so entities that ended are not paid for.
+"""
+
+
+from heapq import heappop, heappush
+from itertools import count
+from typing import Any, Hashable
+
+import instrumentation
+from entity_store import EntityStore
+from magic_2 import Spell
+from spell_bytecode import PROGRAM_ERRORS, Opcodes, check_triggers
+
+
+# Expirations sort before activations within a round so upkeep is not charged for spells that
+# ended in the previous round.
+EXPIRE: int = 0
+ACTIVATE: int = 1
+
+
+class ActiveSpell:
+    """A spell that has been cast and is either travelling or active."""
+    __slots__ = (
+        "spell", "caster", "target", "variables", "mana_per_round", "senses",
+        "cast_round", "activation_round", "end_round", "lasting", "arriving", "active",
+    )
+
+    def __init__(
+            self,
+            spell: Spell,
+            caster: Hashable,
+            target: Any,
+            variables: tuple,
+            cast_round: int
+        ) -> None:
+        """Initialize an ActiveSpell instance.
+
+        Args:
+            spell (Spell):
+                The spell cast.
+            caster (Hashable):
+                The caster paying the spell's upkeep.
+            target (Any):
+                The spell's target.
+            variables (tuple):
+                The runtime variables the spell was cast with.
+            cast_round (int):
+                The round the spell was cast.
+        """
+        effects = getattr(spell.payload, "effects", ())
+        flight = max(getattr(spell.propulsion, "duration", 1), 1)
+        lasting = max((item.duration for item in effects), default=1)
+
+        self.spell: Spell = spell
+        self.caster: Hashable = caster
+        self.target: Any = target
+        self.variables: tuple = variables
+        self.mana_per_round: int = spell.initial_mana_cost
+        # What the caller observed for the spell's triggers, kept until changed.
+        self.senses: dict[str, Any] = {}
+        self.cast_round: int = cast_round
+        # The round the delivery arrives, and the last round if the triggers fire on arrival.
+        self.activation_round: int = cast_round + flight - 1
+        self.lasting: int = max(lasting, 1)
+        self.end_round: int = self.activation_round + self.lasting - 1
+        self.arriving: bool = True
+        self.active: bool = True
+
+    def __repr__(self) -> str:
+        return f"{self.spell.name} (Rounds {self.cast_round}-{self.end_round})"
+
+
+class RoundEngine:
+    """Tracks active spells, caster mana and cooldowns across combat rounds."""
+    def __init__(self) -> None:
+        self.round: int = 0
+        self.mana: dict[Hashable, float] = {}
+        self.log: list[str] = []
+        self._queue: list[tuple[int, int, int, ActiveSpell]] = []
+        self._sequence = count()
+        self._drain: dict[Hashable, float] = {}
+        self._active: dict[Hashable, set[ActiveSpell]] = {}
+        self._cooldowns: dict[tuple[Hashable, str], int] = {}
+        self.entities: EntityStore = EntityStore()
+
+    def add_caster(self, caster: Hashable, mana: float) -> None:
+        """Register a caster and their current mana.
+
+        Args:
+            caster (Hashable):
+                The caster, such as a player.Character.
+            mana (float):
+                The caster's current mana.
+        """
+        self.mana[caster] = mana
+        self._drain.setdefault(caster, 0)
+        self._active.setdefault(caster, set())
+
+    def ready_round(self, caster: Hashable, spell: Spell) -> int:
+        """Get the first round a caster can cast a spell again.
+
+        Args:
+            caster (Hashable):
+                The caster.
+            spell (Spell):
+                The spell.
+
+        Returns:
+            int: The round, which is at most the current round if the spell is ready.
+        """
+        return self._cooldowns.get((caster, spell.name), self.round)
+
+    def cast(
+            self,
+            spell: Spell,
+            caster: Hashable,
+            target: Any,
+            *variables,
+            cooldown: int = 0
+        ) -> ActiveSpell:
+        """Cast a spell this round, paying its first round of mana immediately.
+
+        Args:
+            spell (Spell):
+                The spell to cast.
+            caster (Hashable):
+                The caster, previously registered with add_caster.
+            target (Any):
+                The spell's target.
+            *variables:
+                Runtime variables passed to Spell.cast.
+            cooldown (int, optional):
+                Rounds before the caster can cast this spell again. Defaults to 0.
+
+        Raises:
+            ValueError: If the spell is on cooldown or the caster lacks the mana.
+
+        Returns:
+            ActiveSpell: The scheduled spell.
+        """
+        if self.ready_round(caster, spell) > self.round:
+            raise ValueError(f"{spell.name} is on cooldown until round {self.ready_round(caster, spell)}.")
+        active = ActiveSpell(spell, caster, target, variables, self.round)
+        if self.mana[caster] < active.mana_per_round:
+            raise ValueError(f"Not enough mana to cast {spell.name}.")
+
+        start = len(self.log)
+        self.mana[caster] -= active.mana_per_round
+        self.log.append(spell.cast(*variables))
+        self._drain[caster] += active.mana_per_round
+        self._active[caster].add(active)
+        if active.activation_round == self.round:
+            try:
+                self._activate([active])
+            except Exception:
+                # Failed programs fizzle inside _activate; anything else undoes the cast, so no
+                # spell is left draining mana without being scheduled.
+                self.cancel(active)
+                self.mana[caster] += active.mana_per_round
+                del self.log[start:]
+                raise
+        else:
+            self._schedule(active.activation_round, ACTIVATE, active)
+        self._schedule(active.end_round + 1, EXPIRE, active)
+        if cooldown:
+            self._cooldowns[(caster, spell.name)] = self.round + cooldown
+        return active
+
+    def cancel(self, active: ActiveSpell) -> None:
+        """End a spell early. Its queued events are skipped when they come due.
+
+        Args:
+            active (ActiveSpell):
+                The spell to end.
+        """
+        if active.active:
+            active.active = False
+            self._drain[active.caster] -= active.mana_per_round
+            self._active[active.caster].discard(active)
+            self.entities.despawn_source(active)
+
+    def advance(self) -> list[str]:
+        """Advance to the next round: expire finished spells and entities, charge upkeep and
+        activate spells whose travel ends this round.
+
+        Returns:
+            list[str]: The log entries produced this round.
+        """
+        self.round += 1
+        start = len(self.log)
+
+        while self._queue and self._queue[0][0] <= self.round and self._queue[0][1] == EXPIRE:
+            active = heappop(self._queue)[3]
+            if active.active and active.end_round < self.round:
+                self.cancel(active)
+                self.log.append(f"{active.spell.name} ends.")
+
+        entity_upkeep: dict[Hashable, float] = {}
+        if self.entities.count:
+            expired, destroyed = self.entities.advance(self.round)
+            if len(expired):
+                self.log.append(f"{len(expired)} summoned entities dissipate.")
+            if len(destroyed):
+                self.log.append(f"{len(destroyed)} summoned entities are destroyed.")
+            entity_upkeep = self.entities.upkeep_by_owner()
+
+        for caster, drain in self._drain.items():
+            drain += entity_upkeep.get(caster, 0)
+            if not drain:
+                continue
+            if self.mana[caster] < drain:
+                self._fizzle(caster)
+            else:
+                self.mana[caster] -= drain
+
+        due = []
+        while self._queue and self._queue[0][0] <= self.round:
+            _, kind, _, active = heappop(self._queue)
+            if not active.active:
+                continue
+            if kind == ACTIVATE:
+                due.append(active)
+            elif active.end_round < self.round:
+                self.cancel(active)
+                self.log.append(f"{active.spell.name} ends.")
+        if due:
+            self._activate(due)
+
+        return self.log[start:]
+
+    def active_spells(self, caster: Hashable) -> set[ActiveSpell]:
+        """Get the spells a caster is currently paying for.
+
+        Args:
+            caster (Hashable):
+                The caster.
+
+        Returns:
+            set[ActiveSpell]: The caster's active spells.
+        """
+        return self._active[caster]
+
+    def _schedule(self, due: int, kind: int, active: ActiveSpell) -> None:
+        heappush(self._queue, (due, kind, next(self._sequence), active))
+
+    def _activate(self, due: list[ActiveSpell]) -> None:
+        """Check the triggers of spells whose delivery arrived or that are waiting on a trigger,
+        and run the payloads of those that fire."""
+        checks = []
+        for active in due:
+            compiled = active.spell.program
+            senses = dict(compiled.arrival_senses) if active.arriving else {}
+            senses.update(active.senses)
+            senses["elapsed"] = self.round - active.cast_round
+            active.arriving = False
+            checks.append((compiled, active.variables, senses))
+        fired, failed = check_triggers(checks)
+
+        for position in failed:
+            self._fail(due[position])
+        for position in fired:
+            active = due[position]
+            compiled, variables, senses = checks[position]
+            try:
+                actions = compiled.activate(variables, senses)
+            except PROGRAM_ERRORS:
+                self._fail(active)
+                continue
+            effects = [item for opcode, item in actions if opcode == Opcodes.EFFECT]
+            if active.spell.payload is not None:
+                self.log.append(active.spell.payload.apply(active.target, effects))
+            self._extend(active, self.round + active.lasting - 1)
+            if any(opcode == Opcodes.REACTIVATE for opcode, _ in actions):
+                self.log.append(f"{active.spell.name} reactivates.")
+                active.arriving = True
+                flight = max(getattr(active.spell.propulsion, "duration", 1), 1)
+                # The spell stays active while the new delivery travels.
+                self._extend(active, self.round + flight)
+                self._schedule(self.round + flight, ACTIVATE, active)
+
+        # Spells still waiting on their triggers check them again next round, up to their end
+        # round; after it the queued EXPIRE ends them.
+        settled = set(fired) | set(failed)
+        for position, active in enumerate(due):
+            if position not in settled and self.round < active.end_round:
+                self._schedule(self.round + 1, ACTIVATE, active)
+
+    def _extend(self, active: ActiveSpell, end_round: int) -> None:
+        """Keep a spell active until at least a round, queueing its new expiry."""
+        if end_round > active.end_round:
+            active.end_round = end_round
+            self._schedule(end_round + 1, EXPIRE, active)
+
+    def _fail(self, active: ActiveSpell) -> None:
+        """Drop a spell whose trigger or payload program failed."""
+        self.cancel(active)
+        self.log.append(f"{active.spell.name} fizzles.")
+        instrumentation.count("fizzled")
+
+    def _fizzle(self, caster: Hashable) -> None:
+        """Drop every spell and entity of a caster who can no longer pay their upkeep."""
+        for active in list(self._active[caster]):
+            self.cancel(active)
+            self.log.append(f"{active.spell.name} fizzles.")
+            instrumentation.count("fizzled")
+        owned = self.entities.owned_by(caster)
+        if len(owned):
+            self.entities.despawn(owned)
+            self.log.append(f"{len(owned)} summoned entities of {caster} dissipate.")
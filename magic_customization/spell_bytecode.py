@@ -0,0 +1,634 @@
+"""
+Bytecode for a spell's trigger conditions, variables and payload sequencing.
+
+magic.py describes triggers that are immediate, delayed, impact, conditional or remote, and
+payloads that can branch, repeat and reactivate the delivery method. Enchantments check their
+triggers every round, so walking that object graph each time adds up across hundreds of active
+spells. Instead a spell is compiled once (magic_2.Spell.program) into two small programs:
+- trigger: leaves True when any of the spell's triggers fires.
+- payload: emits the payload effects in order, running any controlflow between them.
+
+Spell logic is built from the nodes below: expressions (Const, Var, Sense, Op, Not), trigger
+components (DelayedTrigger, ImpactTrigger, ConditionalTrigger, RemoteTrigger) and controlflow
+payload items (If, Repeat, While, SetVar, Reactivate). A plain magic_2.SpellComponent used as a
+trigger, such as "On Contact", fires when the sense of the same name is truthy; it and "impact"
+are the spell's arrival_senses, which hold when its delivery reaches the target. Controlflow goes in
+Payload.sequence, with the payload items themselves as its leaves, so Payload.effects stays the
+flat list of effects that costs, validation and the spell library read.
+
+Programs run on a small stack machine. Instructions are (opcode, argument) pairs of ints in one
+flat array. Var reads the runtime variables passed to Spell.cast, in the order of spell.variables;
+Sense reads the values the caller observed this round (a dict such as {"elapsed": 3,
+"impact": True, "target_health": 12}, missing senses reading as 0). Every instruction costs one
+step from the run's budget, and a program that runs out (such as a While whose condition never
+becomes false) raises StepBudgetExceeded instead of hanging the round. Operators raise as they do
+in Python, such as ZeroDivisionError for x / 0 or TypeError for "high" < 3 with a bad variable or
+sense. PROGRAM_ERRORS lists every error a program can raise from its inputs.
+"""
+
+
+from array import array
+from enum import IntEnum
+from typing import Any, Iterable
+
+from magic_2 import SpellComponent
+
+
+DEFAULT_BUDGET: int = 1_000
+
+
+class Opcodes(IntEnum):
+    """The instructions of the spell stack machine."""
+    HALT = 0
+    CONST = 1                   # Push constants[argument].
+    LOAD_VAR = 2                # Push variables[argument].
+    STORE_VAR = 3               # Pop into variables[argument].
+    LOAD_SENSE = 4              # Push senses[sense_names[argument]], 0 if missing.
+    BINARY = 5                  # Pop right, pop left, push BINARY_OPERATORS[argument](left, right).
+    NOT = 6
+    POP = 7
+    JUMP = 8                    # Continue at instruction argument.
+    JUMP_IF_FALSE = 9           # Pop; jump if falsy.
+    JUMP_IF_FALSE_OR_POP = 10   # Jump keeping the top if falsy, else pop it. Short-circuits "and".
+    JUMP_IF_TRUE_OR_POP = 11    # Jump keeping the top if truthy, else pop it. Short-circuits "or".
+    EFFECT = 12                 # Emit constants[argument], a payload item.
+    REACTIVATE = 13             # Emit a request to run the delivery method again.
+
+
+BINARY_SYMBOLS: tuple[str, ...] = ("+", "-", "*", "/", "<", "<=", "==", "!=", ">=", ">")
+BINARY_OPERATORS: tuple = (
+    lambda left, right: left + right,
+    lambda left, right: left - right,
+    lambda left, right: left * right,
+    lambda left, right: left / right,
+    lambda left, right: left < right,
+    lambda left, right: left <= right,
+    lambda left, right: left == right,
+    lambda left, right: left != right,
+    lambda left, right: left >= right,
+    lambda left, right: left > right,
+)
+
+
+class StepBudgetExceeded(RuntimeError):
+    """Raised when a program runs out of steps, usually a runaway loop."""
+
+
+# What running a program can raise: its budget running out, or an operator given values it cannot
+# combine (division by zero, overflow, mismatched types).
+PROGRAM_ERRORS: tuple[type[Exception], ...] = (StepBudgetExceeded, ArithmeticError, TypeError)
+
+
+# Expressions.
+
+class Const:
+    """A constant value."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value: Any = value
+
+
+class Var:
+    """A runtime variable, one of spell.variables, or a local set with SetVar."""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+
+
+class Sense:
+    """A value observed when the program runs, such as "elapsed" or "target_health"."""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+
+
+class Op:
+    """A binary operation: arithmetic, a comparison, "and" or "or"."""
+    __slots__ = ("symbol", "left", "right")
+
+    def __init__(self, symbol: str, left: Any, right: Any) -> None:
+        """Initialize an Op instance.
+
+        Args:
+            symbol (str):
+                One of BINARY_SYMBOLS, "and" or "or".
+            left (Any):
+                The left operand, an expression node or a plain constant.
+            right (Any):
+                The right operand, an expression node or a plain constant.
+
+        Raises:
+            ValueError: If the symbol is unknown.
+        """
+        if symbol not in BINARY_SYMBOLS and symbol not in ("and", "or"):
+            raise ValueError(f"Unknown operator: {symbol}")
+        self.symbol: str = symbol
+        self.left: Any = left
+        self.right: Any = right
+
+
+class Not:
+    """Logical negation."""
+    __slots__ = ("operand",)
+
+    def __init__(self, operand: Any) -> None:
+        self.operand: Any = operand
+
+
+# Triggers. These are spell components, so they carry costs like any other trigger.
+
+class DelayedTrigger(SpellComponent):
+    """Fires once a number of rounds have passed since casting (the "elapsed" sense)."""
+    def __init__(self, rounds: int, **costs: Any) -> None:
+        super().__init__(f"Delayed ({rounds} rounds)", **costs)
+        self.rounds: int = rounds
+
+
+class ImpactTrigger(SpellComponent):
+    """Fires when the spell hits something (the "impact" sense)."""
+    def __init__(self, **costs: Any) -> None:
+        super().__init__("Impact", **costs)
+
+
+class ConditionalTrigger(SpellComponent):
+    """Fires when a condition holds."""
+    def __init__(self, condition: Any, name: str = "Conditional", **costs: Any) -> None:
+        super().__init__(name, **costs)
+        self.condition: Any = condition
+
+
+class RemoteTrigger(SpellComponent):
+    """Fires when the caster sends a signal from afar (the "signal:<name>" sense)."""
+    def __init__(self, signal: str, **costs: Any) -> None:
+        super().__init__(f"Remote ({signal})", **costs)
+        self.signal: str = signal
+
+
+# Controlflow payload items.
+
+class If:
+    """Runs one of two payload sequences depending on a condition."""
+    __slots__ = ("condition", "then", "otherwise")
+
+    def __init__(self, condition: Any, then: Iterable[Any], otherwise: Iterable[Any] = ()) -> None:
+        self.condition: Any = condition
+        self.then: tuple = tuple(then)
+        self.otherwise: tuple = tuple(otherwise)
+
+
+class Repeat:
+    """Runs a payload sequence a number of times."""
+    __slots__ = ("times", "body")
+
+    def __init__(self, times: Any, body: Iterable[Any]) -> None:
+        self.times: Any = times
+        self.body: tuple = tuple(body)
+
+
+class While:
+    """Runs a payload sequence as long as a condition holds, within the step budget."""
+    __slots__ = ("condition", "body")
+
+    def __init__(self, condition: Any, body: Iterable[Any]) -> None:
+        self.condition: Any = condition
+        self.body: tuple = tuple(body)
+
+
+class SetVar:
+    """Sets a variable, such as a counter used by a later condition."""
+    __slots__ = ("name", "value")
+
+    def __init__(self, name: str, value: Any) -> None:
+        self.name: str = name
+        self.value: Any = value
+
+
+class Reactivate:
+    """Runs the spell's delivery method again, such as a bolt that bounces to a new target."""
+    __slots__ = ()
+
+
+class Program:
+    """A compiled program."""
+    __slots__ = ("code", "constants", "sense_names", "variable_names")
+
+    def __init__(
+            self,
+            code: array,
+            constants: tuple,
+            sense_names: tuple[str, ...],
+            variable_names: tuple[str, ...]
+        ) -> None:
+        """Initialize a Program instance.
+
+        Args:
+            code (array):
+                The instructions as flat (opcode, argument) pairs.
+            constants (tuple):
+                Constants and payload items referenced by CONST and EFFECT.
+            sense_names (tuple[str, ...]):
+                The senses referenced by LOAD_SENSE.
+            variable_names (tuple[str, ...]):
+                The variable slots, the spell's variables first and then locals.
+        """
+        self.code: array = code
+        self.constants: tuple = constants
+        self.sense_names: tuple[str, ...] = sense_names
+        self.variable_names: tuple[str, ...] = variable_names
+
+    def __len__(self) -> int:
+        return len(self.code) // 2
+
+    def disassemble(self) -> str:
+        """List the instructions, one per line, for debugging spell logic."""
+        lines = []
+        for index in range(0, len(self.code), 2):
+            opcode, argument = Opcodes(self.code[index]), self.code[index + 1]
+            if opcode in (Opcodes.CONST, Opcodes.EFFECT):
+                detail = repr(self.constants[argument])
+            elif opcode in (Opcodes.LOAD_VAR, Opcodes.STORE_VAR):
+                detail = self.variable_names[argument]
+            elif opcode == Opcodes.LOAD_SENSE:
+                detail = self.sense_names[argument]
+            elif opcode == Opcodes.BINARY:
+                detail = BINARY_SYMBOLS[argument]
+            elif opcode in (Opcodes.JUMP, Opcodes.JUMP_IF_FALSE, Opcodes.JUMP_IF_FALSE_OR_POP,
+                            Opcodes.JUMP_IF_TRUE_OR_POP):
+                detail = f"-> {argument}"
+            else:
+                detail = ""
+            lines.append(f"{index // 2:4d} {opcode.name:<20} {detail}".rstrip())
+        return "\n".join(lines)
+
+
+class _Compiler:
+    """Lowers spell logic nodes into one Program."""
+    def __init__(self, variable_names: Iterable[str]) -> None:
+        self.code: array = array("i")
+        self.constants: list = []
+        self._constant_index: dict[Any, int] = {}
+        self.sense_names: list[str] = []
+        self.variable_names: list[str] = list(dict.fromkeys(variable_names))
+
+    def program(self) -> Program:
+        self.emit(Opcodes.HALT)
+        return Program(
+            self.code, tuple(self.constants), tuple(self.sense_names), tuple(self.variable_names))
+
+    def emit(self, opcode: Opcodes, argument: int = 0) -> int:
+        """Append an instruction and return its index."""
+        self.code.extend((opcode, argument))
+        return len(self.code) // 2 - 1
+
+    def patch(self, instruction: int, target: int | None = None) -> None:
+        """Point a jump at a target instruction, by default the next one emitted."""
+        self.code[instruction * 2 + 1] = len(self.code) // 2 if target is None else target
+
+    def _slot(self, names: list, value: Any) -> int:
+        try:
+            return names.index(value)
+        except ValueError:
+            names.append(value)
+            return len(names) - 1
+
+    def constant(self, value: Any) -> int:
+        # Plain values are shared by value; anything else, such as payload items, by identity.
+        if value is None or isinstance(value, (bool, int, float, str)):
+            key = (type(value), value)
+        else:
+            key = id(value)
+        index = self._constant_index.get(key)
+        if index is None:
+            index = self._constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def expression(self, node: Any) -> None:
+        """Compile an expression leaving its value on the stack."""
+        if isinstance(node, Const):
+            self.emit(Opcodes.CONST, self.constant(node.value))
+        elif isinstance(node, Var):
+            self.emit(Opcodes.LOAD_VAR, self._slot(self.variable_names, node.name))
+        elif isinstance(node, Sense):
+            self.emit(Opcodes.LOAD_SENSE, self._slot(self.sense_names, node.name))
+        elif isinstance(node, Not):
+            self.expression(node.operand)
+            self.emit(Opcodes.NOT)
+        elif isinstance(node, Op):
+            self.expression(node.left)
+            if node.symbol in ("and", "or"):
+                if node.symbol == "and":
+                    jump = self.emit(Opcodes.JUMP_IF_FALSE_OR_POP)
+                else:
+                    jump = self.emit(Opcodes.JUMP_IF_TRUE_OR_POP)
+                self.expression(node.right)
+                self.patch(jump)
+            else:
+                self.expression(node.right)
+                self.emit(Opcodes.BINARY, BINARY_SYMBOLS.index(node.symbol))
+        else:
+            self.emit(Opcodes.CONST, self.constant(node))
+
+    def trigger(self, component: Any) -> None:
+        """Compile one trigger component leaving whether it fires on the stack."""
+        if isinstance(component, DelayedTrigger):
+            self.expression(Op(">=", Sense("elapsed"), component.rounds))
+        elif isinstance(component, ImpactTrigger):
+            self.expression(Sense("impact"))
+        elif isinstance(component, ConditionalTrigger):
+            self.expression(component.condition)
+        elif isinstance(component, RemoteTrigger):
+            self.expression(Sense(f"signal:{component.signal}"))
+        else:
+            self.expression(Sense(getattr(component, "name", str(component))))
+
+    def triggers(self, components: list) -> None:
+        """Compile a spell's triggers, leaving True if any fires. No triggers means immediate."""
+        if not components:
+            self.expression(Const(True))
+            return
+        jumps = []
+        for number, component in enumerate(components):
+            self.trigger(component)
+            if number < len(components) - 1:
+                jumps.append(self.emit(Opcodes.JUMP_IF_TRUE_OR_POP))
+        for jump in jumps:
+            self.patch(jump)
+
+    def payload(self, items: Iterable[Any]) -> None:
+        """Compile a payload sequence."""
+        for item in items:
+            if isinstance(item, If):
+                self.expression(item.condition)
+                skip_then = self.emit(Opcodes.JUMP_IF_FALSE)
+                self.payload(item.then)
+                if item.otherwise:
+                    skip_otherwise = self.emit(Opcodes.JUMP)
+                    self.patch(skip_then)
+                    self.payload(item.otherwise)
+                    self.patch(skip_otherwise)
+                else:
+                    self.patch(skip_then)
+            elif isinstance(item, Repeat):
+                counter = self._slot(self.variable_names, f"$repeat{len(self.code)}")
+                self.expression(item.times)
+                self.emit(Opcodes.STORE_VAR, counter)
+                start = self.emit(Opcodes.LOAD_VAR, counter)
+                self.emit(Opcodes.CONST, self.constant(0))
+                self.emit(Opcodes.BINARY, BINARY_SYMBOLS.index(">"))
+                done = self.emit(Opcodes.JUMP_IF_FALSE)
+                self.payload(item.body)
+                self.emit(Opcodes.LOAD_VAR, counter)
+                self.emit(Opcodes.CONST, self.constant(1))
+                self.emit(Opcodes.BINARY, BINARY_SYMBOLS.index("-"))
+                self.emit(Opcodes.STORE_VAR, counter)
+                self.emit(Opcodes.JUMP, start)
+                self.patch(done)
+            elif isinstance(item, While):
+                start = len(self.code) // 2
+                self.expression(item.condition)
+                done = self.emit(Opcodes.JUMP_IF_FALSE)
+                self.payload(item.body)
+                self.emit(Opcodes.JUMP, start)
+                self.patch(done)
+            elif isinstance(item, SetVar):
+                self.expression(item.value)
+                self.emit(Opcodes.STORE_VAR, self._slot(self.variable_names, item.name))
+            elif isinstance(item, Reactivate):
+                self.emit(Opcodes.REACTIVATE)
+            else:
+                self.emit(Opcodes.EFFECT, self.constant(item))
+
+
+class CompiledSpell:
+    """A spell's trigger and payload programs."""
+    __slots__ = ("trigger", "payload", "variable_names", "arrival_senses")
+
+    def __init__(
+            self,
+            trigger: Program,
+            payload: Program,
+            variable_names: tuple[str, ...],
+            arrival_senses: dict[str, bool]
+        ) -> None:
+        """Initialize a CompiledSpell instance.
+
+        Args:
+            trigger (Program):
+                The trigger program.
+            payload (Program):
+                The payload program.
+            variable_names (tuple[str, ...]):
+                The spell's runtime variables, in cast order.
+            arrival_senses (dict[str, bool]):
+                The senses that hold when the spell's delivery reaches its target: "impact" and
+                the name of every plain trigger component, such as "On Contact".
+        """
+        self.trigger: Program = trigger
+        self.payload: Program = payload
+        self.variable_names: tuple[str, ...] = variable_names
+        self.arrival_senses: dict[str, bool] = arrival_senses
+
+    def fires(
+            self,
+            variables: tuple = (),
+            senses: dict[str, Any] | None = None,
+            budget: int = DEFAULT_BUDGET
+        ) -> bool:
+        """Check whether the spell's trigger fires.
+
+        Args:
+            variables (tuple, optional):
+                The runtime variables the spell was cast with. Defaults to ().
+            senses (dict[str, Any] | None, optional):
+                The values observed this round. Defaults to None.
+            budget (int, optional):
+                The most instructions to run. Defaults to DEFAULT_BUDGET.
+
+        Raises:
+            StepBudgetExceeded: If the budget runs out.
+            ArithmeticError, TypeError: If an operator fails, such as on division by zero.
+
+        Returns:
+            bool: Whether the payload should activate.
+        """
+        return bool(run(self.trigger, variables, senses, budget)[0])
+
+    def activate(
+            self,
+            variables: tuple = (),
+            senses: dict[str, Any] | None = None,
+            budget: int = DEFAULT_BUDGET
+        ) -> list[tuple[Opcodes, Any]]:
+        """Run the payload program.
+
+        Args:
+            variables (tuple, optional):
+                The runtime variables the spell was cast with. Defaults to ().
+            senses (dict[str, Any] | None, optional):
+                The values observed this round. Defaults to None.
+            budget (int, optional):
+                The most instructions to run. Defaults to DEFAULT_BUDGET.
+
+        Raises:
+            StepBudgetExceeded: If the budget runs out.
+            ArithmeticError, TypeError: If an operator fails, such as on division by zero.
+
+        Returns:
+            list[tuple[Opcodes, Any]]: The emitted (EFFECT, payload item) and (REACTIVATE, None)
+                actions in order.
+        """
+        return run(self.payload, variables, senses, budget)[1]
+
+
+def compile_spell(spell: Any) -> CompiledSpell:
+    """Compile a spell's triggers, variables and payload.
+
+    Args:
+        spell (Any):
+            A magic_2.Spell.
+
+    Returns:
+        CompiledSpell: The programs.
+    """
+    variable_names = tuple(getattr(spell, "variables", None) or ())
+    trigger = getattr(spell, "trigger", None)
+    if trigger is None:
+        trigger = []
+    elif not isinstance(trigger, (list, tuple)):
+        trigger = [trigger]
+    payload = getattr(spell, "payload", None)
+    items = getattr(payload, "sequence", None)
+    if items is None:
+        items = getattr(payload, "effects", payload) or ()
+
+    arrival_senses = {"impact": True}
+    for component in trigger:
+        if not isinstance(
+                component, (DelayedTrigger, ImpactTrigger, ConditionalTrigger, RemoteTrigger)):
+            arrival_senses[getattr(component, "name", str(component))] = True
+
+    compiler = _Compiler(variable_names)
+    compiler.triggers(list(trigger))
+    trigger_program = compiler.program()
+    compiler = _Compiler(variable_names)
+    compiler.payload(items)
+    return CompiledSpell(trigger_program, compiler.program(), variable_names, arrival_senses)
+
+
+def run(
+        program: Program,
+        variables: tuple = (),
+        senses: dict[str, Any] | None = None,
+        budget: int = DEFAULT_BUDGET
+    ) -> tuple[Any, list[tuple[Opcodes, Any]]]:
+    """Run a program.
+
+    Args:
+        program (Program):
+            The program.
+        variables (tuple, optional):
+            Values for the program's leading variable slots, missing ones starting at 0.
+            Defaults to ().
+        senses (dict[str, Any] | None, optional):
+            The values observed this round, missing senses reading as 0. Defaults to None.
+        budget (int, optional):
+            The most instructions to run. Defaults to DEFAULT_BUDGET.
+
+    Raises:
+        StepBudgetExceeded: If the budget runs out.
+        ArithmeticError, TypeError: If an operator fails, such as on division by zero.
+
+    Returns:
+        tuple[Any, list[tuple[Opcodes, Any]]]: The value left on top of the stack (None if
+            empty) and the emitted actions.
+    """
+    code = program.code
+    constants = program.constants
+    slots = list(variables[:len(program.variable_names)])
+    slots.extend([0] * (len(program.variable_names) - len(slots)))
+    sensed = [
+        0 if senses is None else senses.get(name, 0) for name in program.sense_names]
+    operators = BINARY_OPERATORS
+    stack: list = []
+    push = stack.append
+    pop = stack.pop
+    emitted: list[tuple[Opcodes, Any]] = []
+    pc = 0
+    steps = 0
+
+    while True:
+        steps += 1
+        if steps > budget:
+            raise StepBudgetExceeded(f"Program exceeded its budget of {budget} steps.")
+        opcode = code[pc]
+        argument = code[pc + 1]
+        pc += 2
+        if opcode == 1:  # CONST
+            push(constants[argument])
+        elif opcode == 2:  # LOAD_VAR
+            push(slots[argument])
+        elif opcode == 4:  # LOAD_SENSE
+            push(sensed[argument])
+        elif opcode == 5:  # BINARY
+            right = pop()
+            stack[-1] = operators[argument](stack[-1], right)
+        elif opcode == 9:  # JUMP_IF_FALSE
+            if not pop():
+                pc = argument * 2
+        elif opcode == 0:  # HALT
+            return (stack[-1] if stack else None), emitted
+        elif opcode == 3:  # STORE_VAR
+            slots[argument] = pop()
+        elif opcode == 8:  # JUMP
+            pc = argument * 2
+        elif opcode == 12:  # EFFECT
+            emitted.append((Opcodes.EFFECT, constants[argument]))
+        elif opcode == 10:  # JUMP_IF_FALSE_OR_POP
+            if stack[-1]:
+                pop()
+            else:
+                pc = argument * 2
+        elif opcode == 11:  # JUMP_IF_TRUE_OR_POP
+            if stack[-1]:
+                pc = argument * 2
+            else:
+                pop()
+        elif opcode == 6:  # NOT
+            stack[-1] = not stack[-1]
+        elif opcode == 7:  # POP
+            pop()
+        elif opcode == 13:  # REACTIVATE
+            emitted.append((Opcodes.REACTIVATE, None))
+        else:
+            raise ValueError(f"Unknown opcode: {opcode}")
+
+
+def check_triggers(
+        enchantments: Iterable[tuple[CompiledSpell, tuple, dict[str, Any]]],
+        budget: int = DEFAULT_BUDGET
+    ) -> tuple[list[int], list[int]]:
+    """Check the triggers of many active spells, such as every enchantment at the start of a round.
+
+    Args:
+        enchantments (Iterable[tuple[CompiledSpell, tuple, dict[str, Any]]]):
+            Each spell's programs, cast variables and senses this round.
+        budget (int, optional):
+            The most instructions each trigger may run. Defaults to DEFAULT_BUDGET.
+
+    Returns:
+        tuple[list[int], list[int]]: The positions of the spells whose triggers fired and of
+            those whose triggers failed (raised one of PROGRAM_ERRORS), which should fizzle.
+    """
+    fired = []
+    failed = []
+    for position, (compiled, variables, senses) in enumerate(enchantments):
+        try:
+            if run(compiled.trigger, variables, senses, budget)[0]:
+                fired.append(position)
+        except PROGRAM_ERRORS:
+            failed.append(position)
+    return fired, failed
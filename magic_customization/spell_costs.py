@@ -0,0 +1,219 @@
+"""
+Cost engine for magic_2 spells.
+
+A spell's components are flattened once into a CostPlan holding the summed base costs, the
+combined cost multipliers and the delivery/target scaling coefficients described in the
+magic.py docstring. Plans are cached per spell shape, so re-pricing a spell is a handful of
+float operations instead of a walk over every component.
+
+Pricing rules:
+- Base costs of every component are summed.
+- Base cost multipliers of every component are multiplied together and applied to the sums.
+- Volume adds volume_power_cost power per 5ft cube of the target area before multipliers.
+- Range multiplies power by (1 + range_power_cost x distance) with distance in 5ft squares.
+- Duration multiplies complexity by duration_complexity_cost ^ (rounds after the first).
+- Targeting multiple entities multiplies power by 2 ^ (the number of targets over 1).
+- Each payload effect adds its magnitude in power and 1 complexity.
+- Each runtime variable adds 1 complexity.
+"""
+
+
+from functools import lru_cache
+from typing import Any, Iterable
+
+
+# (base power, base complexity, power multiplier, complexity multiplier)
+NEUTRAL_TERMS: tuple[float, float, float, float] = (0.0, 0.0, 1.0, 1.0)
+
+PAYLOAD_EFFECT_COMPLEXITY: float = 1.0
+VARIABLE_COMPLEXITY: float = 1.0
+
+
+class CostPlan:
+    """The compiled, immutable cost constants of a spell shape. Evaluating a plan only needs
+    the spell's range, duration, volume and target count."""
+    __slots__ = (
+        "base_power", "base_complexity", "power_mult", "complexity_mult",
+        "range_power_cost", "duration_complexity_cost", "volume_power_cost",
+    )
+
+    def __init__(
+            self,
+            base_power: float,
+            base_complexity: float,
+            power_mult: float,
+            complexity_mult: float,
+            range_power_cost: float,
+            duration_complexity_cost: float,
+            volume_power_cost: float
+        ) -> None:
+        """Initialize a CostPlan instance.
+
+        Args:
+            base_power (float):
+                The summed base power cost of every component.
+            base_complexity (float):
+                The summed base complexity cost of every component.
+            power_mult (float):
+                The product of every component's power cost multiplier.
+            complexity_mult (float):
+                The product of every component's complexity cost multiplier.
+            range_power_cost (float):
+                The delivery method's power coefficient per 5ft of range.
+            duration_complexity_cost (float):
+                The delivery method's complexity multiplier per round after the first.
+            volume_power_cost (float):
+                The target's additional power cost per unit of volume.
+        """
+        self.base_power: float = base_power
+        self.base_complexity: float = base_complexity
+        self.power_mult: float = power_mult
+        self.complexity_mult: float = complexity_mult
+        self.range_power_cost: float = range_power_cost
+        self.duration_complexity_cost: float = duration_complexity_cost
+        self.volume_power_cost: float = volume_power_cost
+
+    def power(self, range_ft: float = 0, volume: float = 0, targets: int = 1) -> float:
+        """Calculate the power (mana) cost of one round of the spell.
+
+        Args:
+            range_ft (float, optional):
+                The distance the spell travels in feet. Defaults to 0.
+            volume (float, optional):
+                The affected volume in 5ft cubes. Defaults to 0.
+            targets (int, optional):
+                The number of targeted entities. Defaults to 1.
+
+        Returns:
+            float: The power cost.
+        """
+        return (
+            (self.base_power + self.volume_power_cost * volume)
+            * self.power_mult
+            * (1 + self.range_power_cost * range_ft / 5)
+            * 2 ** (max(targets, 1) - 1)
+        )
+
+    def complexity(self, duration: int = 1) -> float:
+        """Calculate the complexity of the spell.
+
+        Args:
+            duration (int, optional):
+                The delivery duration in rounds (timeframe steps for enchantments). Defaults to 1.
+
+        Returns:
+            float: The complexity.
+        """
+        return (
+            self.base_complexity
+            * self.complexity_mult
+            * self.duration_complexity_cost ** (max(duration, 1) - 1)
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"CostPlan(power={self.base_power}x{self.power_mult}, "
+            f"complexity={self.base_complexity}x{self.complexity_mult})"
+        )
+
+
+def component_terms(component: Any) -> tuple[float, float, float, float]:
+    """Read the flat and multiplicative costs of a single component. Components without a cost
+    attribute fall back to the neutral value for it.
+
+    Args:
+        component (Any):
+            A spell component such as a SpellComponent, DeliveryMethod or Target.
+
+    Returns:
+        tuple[float, float, float, float]:
+            The base power, base complexity, power multiplier and complexity multiplier.
+    """
+    if component is None:
+        return NEUTRAL_TERMS
+    return (
+        getattr(component, "base_power_cost", 0.0),
+        getattr(component, "base_complexity_cost", 0.0),
+        getattr(component, "power_cost_mult", 1.0),
+        getattr(component, "complexity_cost_mult", 1.0),
+    )
+
+
+def _as_list(parts: Any) -> Iterable[Any]:
+    """Normalize a spell slot that may hold nothing, one component or several."""
+    if parts is None:
+        return ()
+    if isinstance(parts, (list, tuple)):
+        return parts
+    return (parts,)
+
+
+def spell_shape(spell: Any) -> tuple:
+    """Build the hashable shape key of a spell. Two spells with the same shape share a plan.
+
+    Args:
+        spell (Any):
+            A magic_2.Spell.
+
+    Returns:
+        tuple: The shape key.
+    """
+    delivery = getattr(spell.propulsion, "method", None)
+    target = getattr(spell.container, "shape", None)
+
+    parts = [component_terms(delivery), component_terms(target)]
+    for slot in (spell.trigger, spell.power_source, spell.senses):
+        parts.extend(component_terms(part) for part in _as_list(slot))
+
+    effects = getattr(spell.payload, "effects", spell.payload)
+    payload_power = sum(item.magnitude for item in _as_list(effects))
+    payload_complexity = PAYLOAD_EFFECT_COMPLEXITY * len(_as_list(effects))
+    variable_complexity = VARIABLE_COMPLEXITY * len(_as_list(spell.variables))
+    parts.append((payload_power, payload_complexity + variable_complexity, 1.0, 1.0))
+
+    return (
+        tuple(parts),
+        getattr(delivery, "range_power_cost", 0.0),
+        getattr(delivery, "duration_complexity_cost", 1.0),
+        getattr(target, "volume_power_cost", 0.0),
+    )
+
+
+@lru_cache(maxsize=4096)
+def compile_shape(shape: tuple) -> CostPlan:
+    """Compile a shape key into a CostPlan. Results are cached per shape.
+
+    Args:
+        shape (tuple):
+            A shape key from spell_shape.
+
+    Returns:
+        CostPlan: The compiled plan.
+    """
+    parts, range_power_cost, duration_complexity_cost, volume_power_cost = shape
+    base_power = 0.0
+    base_complexity = 0.0
+    power_mult = 1.0
+    complexity_mult = 1.0
+    for power, complexity, power_factor, complexity_factor in parts:
+        base_power += power
+        base_complexity += complexity
+        power_mult *= power_factor
+        complexity_mult *= complexity_factor
+    return CostPlan(
+        base_power, base_complexity, power_mult, complexity_mult,
+        range_power_cost, duration_complexity_cost, volume_power_cost,
+    )
+
+
+def compile_cost_plan(spell: Any) -> CostPlan:
+    """Compile (or fetch the cached) CostPlan for a spell.
+
+    Args:
+        spell (Any):
+            A magic_2.Spell.
+
+    Returns:
+        CostPlan: The compiled plan.
+    """
+    return compile_shape(spell_shape(spell))
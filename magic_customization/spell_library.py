@@ -0,0 +1,663 @@
+"""
+On-disk spell library format.
+
+A library file holds one compact binary record per magic_2.Spell plus sorted indexes on name,
+payload category (with complexity), complexity and mana cost. Opening a library only reads its
+header; indexes are binary searched straight out of a memory map and only the records a lookup
+returns are decoded.
+
+Layout (little endian):
+    Header:  magic b"SPLB", u16 version, u16 reserved, u32 spell count
+    Section table: (u64 offset, u64 length) for the key blob, the component table and each index,
+        in SECTIONS order
+    Records: one per spell, see _encode_spell. Trigger components from spell_bytecode and the
+        payload's controlflow sequence are stored with them, see _encode_node.
+    Key blob: the UTF-8 strings the indexes sort by
+    Component table: every delivery method and target shape the spells use that is not built into
+        magic.py, see _encode_records. They are registered when the library is opened, so spells
+        using components registered at runtime load in a fresh process.
+    Indexes: fixed-size INDEX_ENTRY entries (key offset, key length, value, record offset), sorted
+        by (key, value)
+
+- name index: key = spell name, value = 0
+- category index: key = payload effect type, value = complexity, one entry per distinct category
+- complexity index: no key, value = complexity
+- mana index: no key, value = initial mana cost
+"""
+
+
+import mmap
+import struct
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator
+
+from magic import (
+    DELIVERY_METHOD_TABLE, TARGET_TABLE, ComponentRecord, ComponentRegistry, DeliveryMethodTypes,
+    TargetTypes)
+from magic_2 import Container, Payload, PayloadItem, Propulsion, Spell, SpellComponent
+from spell_bytecode import (
+    ConditionalTrigger, Const, DelayedTrigger, If, ImpactTrigger, Not, Op, Reactivate,
+    RemoteTrigger, Repeat, Sense, SetVar, Var, While)
+
+
+MAGIC: bytes = b"SPLB"
+VERSION: int = 4
+SECTIONS: tuple[str, ...] = ("keys", "components", "name", "category", "complexity", "mana")
+INDEXES: tuple[str, ...] = SECTIONS[2:]
+
+HEADER = struct.Struct("<4sHHI")
+SECTION = struct.Struct("<QQ")
+INDEX_ENTRY = struct.Struct("<IIdQ")
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I32 = struct.Struct("<i")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+# How spell slots that may hold nothing, one component or several are tagged.
+_NONE, _SINGLE, _LIST = 0, 1, 2
+
+# How components are tagged: plain SpellComponents and the spell_bytecode triggers.
+_COMPONENT_TAGS: dict[type, int] = {
+    SpellComponent: 0, DelayedTrigger: 1, ImpactTrigger: 2, ConditionalTrigger: 3, RemoteTrigger: 4}
+
+# How expression and controlflow nodes are tagged. Plain constants used as operands are VALUE,
+# payload items of the spell's effects are ITEM (by position) and any other payload item INLINE.
+(_VALUE, _CONST, _VAR, _SENSE, _OP, _NOT, _ITEM, _INLINE, _IF, _REPEAT, _WHILE, _SET_VAR,
+ _REACTIVATE) = range(13)
+# How constant values are tagged.
+_BOOL, _INT, _FLOAT, _TEXT = range(4)
+
+_REGISTRIES: dict[str, ComponentRegistry] = {
+    registry.kind.__name__: registry for registry in (DeliveryMethodTypes, TargetTypes)}
+_BUILTIN: dict[str, frozenset[str]] = {
+    "DeliveryMethod": frozenset(row["name"] for row in DELIVERY_METHOD_TABLE),
+    "Target": frozenset(row["name"] for row in TARGET_TABLE),
+}
+
+
+class _Writer:
+    """Appends primitive values to a byte buffer."""
+    def __init__(self) -> None:
+        self.buffer: bytearray = bytearray()
+
+    def u8(self, value: int) -> None:
+        self.buffer += _U8.pack(value)
+
+    def u16(self, value: int) -> None:
+        self.buffer += _U16.pack(value)
+
+    def u32(self, value: int) -> None:
+        self.buffer += _U32.pack(value)
+
+    def i32(self, value: int) -> None:
+        self.buffer += _I32.pack(value)
+
+    def i64(self, value: int) -> None:
+        self.buffer += _I64.pack(value)
+
+    def f64(self, value: float) -> None:
+        self.buffer += _F64.pack(value)
+
+    def text(self, value: str) -> None:
+        data = value.encode("utf-8")
+        self.u16(len(data))
+        self.buffer += data
+
+
+class _Reader:
+    """Reads primitive values from a buffer, starting at an offset."""
+    def __init__(self, buffer: Any, offset: int) -> None:
+        self.buffer: Any = buffer
+        self.offset: int = offset
+
+    def _read(self, packer: struct.Struct) -> Any:
+        value = packer.unpack_from(self.buffer, self.offset)[0]
+        self.offset += packer.size
+        return value
+
+    def u8(self) -> int:
+        return self._read(_U8)
+
+    def u16(self) -> int:
+        return self._read(_U16)
+
+    def u32(self) -> int:
+        return self._read(_U32)
+
+    def i32(self) -> int:
+        return self._read(_I32)
+
+    def i64(self) -> int:
+        return self._read(_I64)
+
+    def f64(self) -> float:
+        return self._read(_F64)
+
+    def text(self) -> str:
+        length = self.u16()
+        value = bytes(self.buffer[self.offset:self.offset + length]).decode("utf-8")
+        self.offset += length
+        return value
+
+
+def _encode_value(writer: _Writer, value: Any) -> None:
+    if isinstance(value, bool):
+        writer.u8(_BOOL)
+        writer.u8(value)
+    elif isinstance(value, int):
+        writer.u8(_INT)
+        writer.i64(value)
+    elif isinstance(value, float):
+        writer.u8(_FLOAT)
+        writer.f64(value)
+    elif isinstance(value, str):
+        writer.u8(_TEXT)
+        writer.text(value)
+    else:
+        raise ValueError(f"Cannot store the constant {value!r}.")
+
+
+def _decode_value(reader: _Reader) -> Any:
+    tag = reader.u8()
+    if tag == _BOOL:
+        return bool(reader.u8())
+    if tag == _INT:
+        return reader.i64()
+    if tag == _FLOAT:
+        return reader.f64()
+    return reader.text()
+
+
+def _whole(value: float, what: str) -> int:
+    """Get a value stored as an integer field, refusing to round it."""
+    if value != int(value):
+        raise ValueError(f"Cannot store the fractional {what} {value!r}.")
+    return int(value)
+
+
+def _encode_item(writer: _Writer, item: PayloadItem) -> None:
+    writer.text(item.effect_type)
+    writer.i32(_whole(item.magnitude, f"magnitude of {item.effect_type}"))
+    writer.i32(_whole(item.duration, f"duration of {item.effect_type}"))
+
+
+def _decode_item(reader: _Reader) -> PayloadItem:
+    return PayloadItem(reader.text(), reader.i32(), reader.i32())
+
+
+def _encode_nodes(writer: _Writer, nodes: Any, effects: list) -> None:
+    writer.u16(len(nodes))
+    for node in nodes:
+        _encode_node(writer, node, effects)
+
+
+def _decode_nodes(reader: _Reader, effects: list) -> list:
+    return [_decode_node(reader, effects) for _ in range(reader.u16())]
+
+
+def _encode_node(writer: _Writer, node: Any, effects: list) -> None:
+    """Encode an expression or controlflow node, its children first-to-last after its tag.
+
+    Raises:
+        ValueError: If the node or one of its constants cannot be stored.
+    """
+    if isinstance(node, Const):
+        writer.u8(_CONST)
+        _encode_value(writer, node.value)
+    elif isinstance(node, (Var, Sense)):
+        writer.u8(_VAR if isinstance(node, Var) else _SENSE)
+        writer.text(node.name)
+    elif isinstance(node, Op):
+        writer.u8(_OP)
+        writer.text(node.symbol)
+        _encode_node(writer, node.left, effects)
+        _encode_node(writer, node.right, effects)
+    elif isinstance(node, Not):
+        writer.u8(_NOT)
+        _encode_node(writer, node.operand, effects)
+    elif isinstance(node, PayloadItem):
+        position = next((number for number, item in enumerate(effects) if item is node), None)
+        if position is None:
+            writer.u8(_INLINE)
+            _encode_item(writer, node)
+        else:
+            writer.u8(_ITEM)
+            writer.u16(position)
+    elif isinstance(node, If):
+        writer.u8(_IF)
+        _encode_node(writer, node.condition, effects)
+        _encode_nodes(writer, node.then, effects)
+        _encode_nodes(writer, node.otherwise, effects)
+    elif isinstance(node, (Repeat, While)):
+        writer.u8(_REPEAT if isinstance(node, Repeat) else _WHILE)
+        _encode_node(writer, node.times if isinstance(node, Repeat) else node.condition, effects)
+        _encode_nodes(writer, node.body, effects)
+    elif isinstance(node, SetVar):
+        writer.u8(_SET_VAR)
+        writer.text(node.name)
+        _encode_node(writer, node.value, effects)
+    elif isinstance(node, Reactivate):
+        writer.u8(_REACTIVATE)
+    else:
+        writer.u8(_VALUE)
+        _encode_value(writer, node)
+
+
+def _decode_node(reader: _Reader, effects: list) -> Any:
+    tag = reader.u8()
+    if tag == _VALUE:
+        return _decode_value(reader)
+    if tag == _CONST:
+        return Const(_decode_value(reader))
+    if tag == _VAR:
+        return Var(reader.text())
+    if tag == _SENSE:
+        return Sense(reader.text())
+    if tag == _OP:
+        symbol = reader.text()
+        left = _decode_node(reader, effects)
+        return Op(symbol, left, _decode_node(reader, effects))
+    if tag == _NOT:
+        return Not(_decode_node(reader, effects))
+    if tag == _ITEM:
+        return effects[reader.u16()]
+    if tag == _INLINE:
+        return _decode_item(reader)
+    if tag == _IF:
+        condition = _decode_node(reader, effects)
+        then = _decode_nodes(reader, effects)
+        return If(condition, then, _decode_nodes(reader, effects))
+    if tag in (_REPEAT, _WHILE):
+        head = _decode_node(reader, effects)
+        return (Repeat if tag == _REPEAT else While)(head, _decode_nodes(reader, effects))
+    if tag == _SET_VAR:
+        name = reader.text()
+        return SetVar(name, _decode_node(reader, effects))
+    return Reactivate()
+
+
+def _encode_components(writer: _Writer, slot: Any) -> None:
+    if slot is None:
+        writer.u8(_NONE)
+        return
+    parts = slot if isinstance(slot, (list, tuple)) else [slot]
+    writer.u8(_LIST if isinstance(slot, (list, tuple)) else _SINGLE)
+    writer.u16(len(parts))
+    for part in parts:
+        tag = _COMPONENT_TAGS.get(type(part))
+        if tag is None:
+            raise ValueError(f"Cannot store the {type(part).__name__} component {part.name}.")
+        writer.u8(tag)
+        writer.text(part.name)
+        writer.f64(part.base_power_cost)
+        writer.f64(part.base_complexity_cost)
+        writer.f64(part.power_cost_mult)
+        writer.f64(part.complexity_cost_mult)
+        writer.text(part.description)
+        writer.text(part.alignment or "")
+        if isinstance(part, DelayedTrigger):
+            writer.i64(part.rounds)
+        elif isinstance(part, ConditionalTrigger):
+            _encode_node(writer, part.condition, [])
+        elif isinstance(part, RemoteTrigger):
+            writer.text(part.signal)
+
+
+def _decode_components(reader: _Reader) -> Any:
+    tag = reader.u8()
+    if tag == _NONE:
+        return None
+    parts = []
+    for _ in range(reader.u16()):
+        kind = reader.u8()
+        name = reader.text()
+        costs = {
+            "base_power_cost": reader.f64(),
+            "base_complexity_cost": reader.f64(),
+            "power_cost_mult": reader.f64(),
+            "complexity_cost_mult": reader.f64(),
+            "description": reader.text(),
+            "alignment": reader.text() or None,
+        }
+        if kind == _COMPONENT_TAGS[DelayedTrigger]:
+            part = DelayedTrigger(reader.i64(), **costs)
+        elif kind == _COMPONENT_TAGS[ImpactTrigger]:
+            part = ImpactTrigger(**costs)
+        elif kind == _COMPONENT_TAGS[ConditionalTrigger]:
+            part = ConditionalTrigger(_decode_node(reader, []), **costs)
+        elif kind == _COMPONENT_TAGS[RemoteTrigger]:
+            part = RemoteTrigger(reader.text(), **costs)
+        else:
+            part = SpellComponent(name, **costs)
+        part.name = name
+        parts.append(part)
+    return parts if tag == _LIST else parts[0]
+
+
+def _is_builtin(record: ComponentRecord) -> bool:
+    kind = type(record).__name__
+    return record.name in _BUILTIN[kind] and _REGISTRIES[kind].get(record.name) is record
+
+
+def _encode_records(records: Iterable[ComponentRecord]) -> bytes:
+    """Encode the component table: each record's kind, name, description and cost fields."""
+    writer = _Writer()
+    records = list(records)
+    writer.u16(len(records))
+    for record in records:
+        writer.text(type(record).__name__)
+        writer.text(record.name)
+        writer.text(record.description)
+        for value in record.costs().values():
+            writer.f64(value)
+    return bytes(writer.buffer)
+
+
+def _register_records(buffer: Any, offset: int) -> None:
+    """Register every record of the component table starting at an offset."""
+    reader = _Reader(buffer, offset)
+    for _ in range(reader.u16()):
+        registry = _REGISTRIES[reader.text()]
+        name = reader.text()
+        description = reader.text()
+        costs = {field: reader.f64() for field in registry.kind.COST_FIELDS}
+        registry.register(name, description, **costs)
+
+
+def _encode_spell(spell: Spell) -> bytes:
+    """Encode a spell into its binary record.
+
+    Raises:
+        ValueError: If the spell holds something the format cannot store exactly.
+    """
+    writer = _Writer()
+    writer.text(spell.name)
+
+    if spell.container is None:
+        writer.u8(_NONE)
+    else:
+        writer.u8(_SINGLE)
+        writer.text(spell.container.shape.name)
+        writer.f64(spell.container.volume)
+        writer.u32(_whole(spell.container.count, "target count"))
+
+    if spell.propulsion is None:
+        writer.u8(_NONE)
+    else:
+        writer.u8(_SINGLE)
+        writer.text(spell.propulsion.method.name)
+        writer.f64(spell.propulsion.range_ft)
+        writer.u32(_whole(spell.propulsion.duration, "delivery duration"))
+
+    for slot in (spell.trigger, spell.power_source, spell.senses):
+        _encode_components(writer, slot)
+
+    variables = spell.variables or []
+    writer.u16(len(variables))
+    for variable in variables:
+        writer.text(str(variable))
+
+    effects = spell.payload.effects if spell.payload is not None else []
+    writer.u8(_NONE if spell.payload is None else _SINGLE)
+    writer.u16(len(effects))
+    for item in effects:
+        _encode_item(writer, item)
+    sequence = getattr(spell.payload, "sequence", None)
+    if sequence is None:
+        writer.u8(_NONE)
+    else:
+        writer.u8(_LIST)
+        _encode_nodes(writer, sequence, effects)
+    return bytes(writer.buffer)
+
+
+def _decode_spell(buffer: Any, offset: int) -> Spell:
+    """Decode the spell record starting at an offset."""
+    reader = _Reader(buffer, offset)
+    name = reader.text()
+    container = None
+    if reader.u8():
+        container = Container(TargetTypes[reader.text()], reader.f64(), reader.u32())
+    propulsion = None
+    if reader.u8():
+        propulsion = Propulsion(DeliveryMethodTypes[reader.text()], reader.f64(), reader.u32())
+    trigger = _decode_components(reader)
+    power_source = _decode_components(reader)
+    senses = _decode_components(reader)
+    variables = [reader.text() for _ in range(reader.u16())]
+    has_payload = reader.u8()
+    effects = [_decode_item(reader) for _ in range(reader.u16())]
+    sequence = _decode_nodes(reader, effects) if reader.u8() else None
+    payload = Payload(effects, sequence) if has_payload else None
+    return Spell(name, container, propulsion, trigger, power_source, senses, variables, payload)
+
+
+def write_library(path: str, spells: Iterable[Spell]) -> int:
+    """Write spells to a library file, replacing it.
+
+    Args:
+        path (str):
+            The library file.
+        spells (Iterable[Spell]):
+            The spells to store.
+
+    Raises:
+        ValueError:
+            If a spell holds something the format cannot store exactly, such as a custom
+            component class or a fractional payload magnitude. The file is left untouched.
+
+    Returns:
+        int: The number of spells written.
+    """
+    spells = list(spells)
+    records = bytearray()
+    keys = bytearray()
+    key_offsets: dict[bytes, tuple[int, int]] = {}
+
+    def key(text: str) -> tuple[int, int]:
+        data = text.encode("utf-8")
+        if data not in key_offsets:
+            key_offsets[data] = (len(keys), len(data))
+            keys.extend(data)
+        return key_offsets[data]
+
+    start = HEADER.size + SECTION.size * len(SECTIONS)
+    indexes: dict[str, list[tuple[bytes, float, int, int, int]]] = {name: [] for name in INDEXES}
+    custom: dict[tuple[str, str], ComponentRecord] = {}
+    for spell in spells:
+        for record in (
+                getattr(spell.container, "shape", None), getattr(spell.propulsion, "method", None)):
+            if record is not None and not _is_builtin(record):
+                custom.setdefault((type(record).__name__, record.name), record)
+        offset = start + len(records)
+        records += _encode_spell(spell)
+        complexity = float(spell.complexity)
+        mana = float(spell.initial_mana_cost)
+        name_bytes = spell.name.encode("utf-8")
+        indexes["name"].append((name_bytes, 0.0, offset, *key(spell.name)))
+        effects = spell.payload.effects if spell.payload is not None else []
+        for category in sorted({item.effect_type for item in effects}):
+            indexes["category"].append(
+                (category.encode("utf-8"), complexity, offset, *key(category)))
+        indexes["complexity"].append((b"", complexity, offset, 0, 0))
+        indexes["mana"].append((b"", mana, offset, 0, 0))
+
+    sections = [bytes(keys), _encode_records(custom.values())]
+    for name in INDEXES:
+        entries = sorted(indexes[name], key=lambda entry: (entry[0], entry[1], entry[2]))
+        sections.append(b"".join(
+            INDEX_ENTRY.pack(key_offset, key_length, value, offset)
+            for _, value, offset, key_offset, key_length in entries))
+
+    table = bytearray()
+    position = start + len(records)
+    for section in sections:
+        table += SECTION.pack(position, len(section))
+        position += len(section)
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(spells)))
+        file.write(table)
+        file.write(records)
+        for section in sections:
+            file.write(section)
+    return len(spells)
+
+
+class _Index:
+    """A sorted index section read in place from the memory map."""
+    def __init__(self, buffer: mmap.mmap, keys_offset: int, offset: int, length: int) -> None:
+        self.buffer: mmap.mmap = buffer
+        self.keys_offset: int = keys_offset
+        self.offset: int = offset
+        self.count: int = length // INDEX_ENTRY.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def entry(self, position: int) -> tuple[int, int, float, int]:
+        return INDEX_ENTRY.unpack_from(self.buffer, self.offset + position * INDEX_ENTRY.size)
+
+    def key(self, position: int) -> tuple[bytes, float]:
+        key_offset, key_length, value, _ = self.entry(position)
+        start = self.keys_offset + key_offset
+        return self.buffer[start:start + key_length], value
+
+    def __getitem__(self, position: int) -> tuple[bytes, float]:
+        # Lets bisect search the index without reading it all.
+        return self.key(position)
+
+    def span(self, low: tuple[bytes, float], high: tuple[bytes, float]) -> range:
+        """Get the positions of every entry with low <= (key, value) <= high."""
+        return range(bisect_left(self, low), bisect_right(self, high))
+
+    def record_offsets(self, positions: range) -> Iterator[int]:
+        for position in positions:
+            yield self.entry(position)[3]
+
+
+class SpellLibrary:
+    """A read-only, memory-mapped spell library file."""
+    def __init__(self, path: str) -> None:
+        """Open a library file. Only the header is read.
+
+        Args:
+            path (str):
+                The library file.
+
+        Raises:
+            ValueError:
+                If the file is not a spell library, has an unsupported version or uses a custom
+                component that conflicts with one registered in this process.
+        """
+        self.path: str = path
+        self._file = open(path, "rb")
+        self._map: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a spell library.")
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported spell library version {version}.")
+        sections = {
+            name: SECTION.unpack_from(self._map, HEADER.size + SECTION.size * position)
+            for position, name in enumerate(SECTIONS)
+        }
+        _register_records(self._map, sections["components"][0])
+        keys_offset = sections["keys"][0]
+        self._indexes: dict[str, _Index] = {
+            name: _Index(self._map, keys_offset, *sections[name]) for name in INDEXES}
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "SpellLibrary":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map and file."""
+        self._map.close()
+        self._file.close()
+
+    def _load(self, offsets: Iterable[int]) -> Iterator[Spell]:
+        for offset in offsets:
+            yield _decode_spell(self._map, offset)
+
+    def get(self, name: str) -> Spell | None:
+        """Load a spell by name.
+
+        Args:
+            name (str):
+                The spell's name.
+
+        Returns:
+            Spell | None: The first spell with the name, or None if there is none.
+        """
+        key = name.encode("utf-8")
+        index = self._indexes["name"]
+        positions = index.span((key, 0.0), (key, 0.0))
+        return next(self._load(index.record_offsets(positions[:1])), None)
+
+    def by_category(
+            self,
+            category: str,
+            min_complexity: float = float("-inf"),
+            max_complexity: float = float("inf")
+        ) -> Iterator[Spell]:
+        """Load every spell with a payload category in a complexity range, such as all Cold
+        spells with complexity at most 20.
+
+        Args:
+            category (str):
+                The payload effect type.
+            min_complexity (float, optional):
+                The lowest complexity included. Defaults to no limit.
+            max_complexity (float, optional):
+                The highest complexity included. Defaults to no limit.
+
+        Yields:
+            Spell: The matching spells, by ascending complexity.
+        """
+        key = category.encode("utf-8")
+        index = self._indexes["category"]
+        positions = index.span((key, min_complexity), (key, max_complexity))
+        return self._load(index.record_offsets(positions))
+
+    def by_complexity(self, low: float, high: float) -> Iterator[Spell]:
+        """Load every spell with a complexity in a range.
+
+        Args:
+            low (float):
+                The lowest complexity included.
+            high (float):
+                The highest complexity included.
+
+        Yields:
+            Spell: The matching spells, by ascending complexity.
+        """
+        index = self._indexes["complexity"]
+        return self._load(index.record_offsets(index.span((b"", low), (b"", high))))
+
+    def by_mana_cost(self, low: float, high: float) -> Iterator[Spell]:
+        """Load every spell with an initial mana cost in a range.
+
+        Args:
+            low (float):
+                The lowest mana cost included.
+            high (float):
+                The highest mana cost included.
+
+        Yields:
+            Spell: The matching spells, by ascending mana cost.
+        """
+        index = self._indexes["mana"]
+        return self._load(index.record_offsets(index.span((b"", low), (b"", high))))
+
+    def __iter__(self) -> Iterator[Spell]:
+        index = self._indexes["name"]
+        return self._load(index.record_offsets(range(len(index))))
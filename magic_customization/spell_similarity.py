@@ -0,0 +1,317 @@
+"""
+Structural hashing and near-duplicate detection for magic_2 spells.
+
+A spell's canonical form describes its structure without caring about its name, the order of its
+payload effects or components, or the names of its runtime variables. Payload magnitudes and
+ranges can be bucketed so that spells differing by a point or two hash the same.
+
+- canonical_hash finds exact duplicates (and, with magnitude_bucket=1, spells identical enough to
+  share cost and validation results through ResultCache).
+- SimilarityIndex finds near-duplicates across a whole library with MinHash signatures and
+  locality sensitive hashing, so only spells sharing a signature band are ever compared and the
+  search stays near-linear in the library size.
+"""
+
+
+from hashlib import blake2b
+from typing import Any, Callable, Hashable, Iterable
+
+import numpy as np
+
+
+# MinHash permutations are (a * hash + b) mod a 31-bit prime over 32-bit feature hashes, which
+# keeps every product inside uint64.
+_PRIME: int = (1 << 31) - 1
+
+
+def _bucket(value: float, size: float) -> float:
+    value = float(value)
+    return value if size <= 1 else (value // size) * size
+
+
+def _parts(slot: Any) -> tuple:
+    if slot is None:
+        return ()
+    return tuple(slot) if isinstance(slot, (list, tuple)) else (slot,)
+
+
+def _node_form(node: Any, magnitude_bucket: float) -> Any:
+    """Describe a payload item or a spell_bytecode expression or controlflow node."""
+    if isinstance(node, (list, tuple)):
+        return tuple(_node_form(part, magnitude_bucket) for part in node)
+    if isinstance(node, bool) or node is None or isinstance(node, str):
+        return node
+    if isinstance(node, (int, float)):
+        return float(node)
+    if hasattr(node, "effect_type"):
+        return (
+            node.effect_type, _bucket(node.magnitude, magnitude_bucket), float(node.duration))
+    # Bytecode nodes keep all their state in slots.
+    return (type(node).__name__,) + tuple(
+        _node_form(getattr(node, slot), magnitude_bucket) for slot in type(node).__slots__)
+
+
+def _component_form(component: Any) -> tuple:
+    return (
+        getattr(component, "name", type(component).__name__),
+        float(getattr(component, "base_power_cost", 0)),
+        float(getattr(component, "base_complexity_cost", 0)),
+        float(getattr(component, "power_cost_mult", 1)),
+        float(getattr(component, "complexity_cost_mult", 1)),
+        getattr(component, "alignment", None) or "",
+        # A ConditionalTrigger's condition, as text so forms of mixed components still sort.
+        repr(_node_form(getattr(component, "condition", None), 1)),
+    )
+
+
+def canonical_form(spell: Any, magnitude_bucket: float = 1) -> tuple:
+    """Build an order-insensitive description of a spell's structure. Only the payload's
+    controlflow sequence keeps its order.
+
+    Args:
+        spell (Any):
+            A magic_2.Spell.
+        magnitude_bucket (float, optional):
+            Bucket size for payload magnitudes, ranges and volumes. 1 keeps exact values. Defaults
+            to 1.
+
+    Returns:
+        tuple:
+            The canonical form. Every number is a float, so int and float copies of a spell share
+            a form and a hash.
+    """
+    container = spell.container
+    propulsion = spell.propulsion
+    effects = getattr(spell.payload, "effects", ())
+    sequence = getattr(spell.payload, "sequence", None)
+    return (
+        None if container is None else (
+            container.shape.name, _bucket(container.volume, magnitude_bucket),
+            float(container.count)),
+        None if propulsion is None else (
+            propulsion.method.name, _bucket(propulsion.range_ft, magnitude_bucket),
+            float(propulsion.duration)),
+        tuple(sorted(_component_form(part) for part in _parts(spell.trigger))),
+        tuple(sorted(_component_form(part) for part in _parts(spell.power_source))),
+        tuple(sorted(_component_form(part) for part in _parts(spell.senses))),
+        len(_parts(spell.variables)),
+        tuple(sorted(
+            (item.effect_type, _bucket(item.magnitude, magnitude_bucket), float(item.duration))
+            for item in effects)),
+        # Controlflow runs in order, so the sequence is not sorted.
+        None if sequence is None else _node_form(sequence, magnitude_bucket),
+    )
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def canonical_hash(spell: Any, magnitude_bucket: float = 1) -> int:
+    """Hash a spell's canonical form. Stable across runs and processes.
+
+    Args:
+        spell (Any):
+            A magic_2.Spell.
+        magnitude_bucket (float, optional):
+            Bucket size for payload magnitudes, ranges and volumes. Defaults to 1.
+
+    Returns:
+        int: A 64-bit hash.
+    """
+    return _digest(repr(canonical_form(spell, magnitude_bucket)))
+
+
+def spell_features(spell: Any, magnitude_bucket: float = 1) -> frozenset[str]:
+    """Break a spell's canonical form into features for similarity comparisons.
+
+    Args:
+        spell (Any):
+            A magic_2.Spell.
+        magnitude_bucket (float, optional):
+            Bucket size for payload magnitudes, ranges and volumes. Defaults to 1.
+
+    Returns:
+        frozenset[str]: The features.
+    """
+    container, propulsion, trigger, power_source, senses, variables, effects, sequence = (
+        canonical_form(spell, magnitude_bucket))
+    features = {
+        f"container:{container}", f"propulsion:{propulsion}", f"variables:{variables}",
+        f"sequence:{sequence}",
+    }
+    for slot, parts in (("trigger", trigger), ("power", power_source), ("senses", senses)):
+        features.update(f"{slot}:{part}" for part in parts)
+    # Repeated identical effects count separately.
+    seen: dict[tuple, int] = {}
+    for effect in effects:
+        seen[effect] = seen.get(effect, 0) + 1
+        features.add(f"payload:{effect}#{seen[effect]}")
+        features.add(f"category:{effect[0]}")
+    return frozenset(features)
+
+
+def jaccard(first: frozenset, second: frozenset) -> float:
+    """The share of features two feature sets have in common."""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+class SimilarityIndex:
+    """Finds duplicate and near-duplicate spells across a library."""
+    def __init__(
+            self,
+            magnitude_bucket: float = 5,
+            bands: int = 16,
+            rows: int = 8,
+            seed: int = 0
+        ) -> None:
+        """Initialize a SimilarityIndex instance.
+
+        Args:
+            magnitude_bucket (float, optional):
+                Bucket size for payload magnitudes, ranges and volumes. Defaults to 5.
+            bands (int, optional):
+                LSH bands. More bands find less similar pairs. Defaults to 16.
+            rows (int, optional):
+                MinHash rows per band. More rows find only more similar pairs. Defaults to 8.
+            seed (int, optional):
+                Seed for the MinHash permutations. Defaults to 0.
+        """
+        self.magnitude_bucket: float = magnitude_bucket
+        self.bands: int = bands
+        self.rows: int = rows
+        permutations = bands * rows
+        self._a: np.ndarray = np.array(
+            [_digest(f"{seed}:a:{number}") % (_PRIME - 1) + 1 for number in range(permutations)],
+            dtype=np.uint64)[:, None]
+        self._b: np.ndarray = np.array(
+            [_digest(f"{seed}:b:{number}") % _PRIME for number in range(permutations)],
+            dtype=np.uint64)[:, None]
+        self.features: dict[Hashable, frozenset[str]] = {}
+        self.hashes: dict[Hashable, int] = {}
+        self._by_hash: dict[int, list[Hashable]] = {}
+        self._buckets: list[dict[tuple[int, ...], list[Hashable]]] = [{} for _ in range(bands)]
+
+    def _signature(self, features: frozenset[str]) -> list[int]:
+        hashed = np.array(
+            [_digest(feature) & 0xFFFFFFFF for feature in features] or [0], dtype=np.uint64)
+        return ((self._a * hashed + self._b) % _PRIME).min(axis=1).tolist()
+
+    def add(self, key: Hashable, spell: Any) -> None:
+        """Add a spell to the index.
+
+        Args:
+            key (Hashable):
+                The spell's id in the library.
+            spell (Any):
+                A magic_2.Spell.
+        """
+        features = spell_features(spell, self.magnitude_bucket)
+        spell_hash = canonical_hash(spell, self.magnitude_bucket)
+        self.features[key] = features
+        self.hashes[key] = spell_hash
+        if spell_hash in self._by_hash:
+            # Exact duplicates are only banded once, through the first spell of their group.
+            self._by_hash[spell_hash].append(key)
+            return
+        self._by_hash[spell_hash] = [key]
+        signature = self._signature(features)
+        for band in range(self.bands):
+            rows = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            self._buckets[band].setdefault(rows, []).append(key)
+
+    def add_all(self, spells: Iterable[tuple[Hashable, Any]]) -> None:
+        """Add many (key, spell) pairs to the index."""
+        for key, spell in spells:
+            self.add(key, spell)
+
+    def duplicates(self) -> list[list[Hashable]]:
+        """Group spells with identical canonical forms.
+
+        Returns:
+            list[list[Hashable]]: Every group of two or more duplicate keys.
+        """
+        return [keys for keys in self._by_hash.values() if len(keys) > 1]
+
+    def near_duplicates(self, threshold: float = 0.8) -> list[tuple[Hashable, Hashable, float]]:
+        """Find pairs of different spells whose features overlap by at least a threshold. Each
+        group of exact duplicates is represented by its first spell.
+
+        Only pairs that share an LSH band are compared, so a pair below roughly
+        (1 / bands) ^ (1 / rows) similarity may be missed.
+
+        Args:
+            threshold (float, optional):
+                The minimum Jaccard similarity. Defaults to 0.8.
+
+        Returns:
+            list[tuple[Hashable, Hashable, float]]: The pairs and their similarity.
+        """
+        checked: set[tuple[Hashable, Hashable]] = set()
+        pairs = []
+        for buckets in self._buckets:
+            for keys in buckets.values():
+                for position, first in enumerate(keys):
+                    for second in keys[position + 1:]:
+                        if (first, second) in checked:
+                            continue
+                        checked.add((first, second))
+                        similarity = jaccard(self.features[first], self.features[second])
+                        if similarity >= threshold:
+                            pairs.append((first, second, similarity))
+        return pairs
+
+    def similar(self, spell: Any, threshold: float = 0.8) -> list[tuple[Hashable, float]]:
+        """Find indexed spells similar to a spell, such as one being drafted in the builder.
+
+        Args:
+            spell (Any):
+                A magic_2.Spell.
+            threshold (float, optional):
+                The minimum Jaccard similarity. Defaults to 0.8.
+
+        Returns:
+            list[tuple[Hashable, float]]: The matching keys and their similarity, most similar first.
+        """
+        features = spell_features(spell, self.magnitude_bucket)
+        signature = self._signature(features)
+        candidates: set[Hashable] = set()
+        for band in range(self.bands):
+            rows = tuple(signature[band * self.rows:(band + 1) * self.rows])
+            for key in self._buckets[band].get(rows, ()):
+                candidates.update(self._by_hash[self.hashes[key]])
+        matches = [(key, jaccard(features, self.features[key])) for key in candidates]
+        return sorted(
+            (match for match in matches if match[1] >= threshold), key=lambda match: -match[1])
+
+
+class ResultCache:
+    """Shares expensive per-spell results (costs, validation, ...) between structurally identical
+    spells."""
+    def __init__(self) -> None:
+        self._results: dict[tuple[str, int], Any] = {}
+
+    def get(self, spell: Any, kind: str, compute: Callable[[Any], Any]) -> Any:
+        """Get a result for a spell, computing it only for the first spell of each structure.
+
+        Args:
+            spell (Any):
+                A magic_2.Spell.
+            kind (str):
+                What the result is, such as "cost" or "validation".
+            compute (Callable[[Any], Any]):
+                Computes the result from the spell.
+
+        Returns:
+            Any: The result.
+        """
+        key = (kind, canonical_hash(spell))
+        if key not in self._results:
+            self._results[key] = compute(spell)
+        return self._results[key]
+
+    def clear(self) -> None:
+        """Forget every result, such as after a rules patch."""
+        self._results.clear()
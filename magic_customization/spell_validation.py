@@ -0,0 +1,381 @@
+"""
+Spell legality checks for magic_2 spells against the caster who would cast them.
+
+The limits come from the magic.py docstrings and the player stats tree:
+- Each delivery method has a maximum range and duration. Ranged spells reach up to 100ft per caster
+  level, Touch and Enchant reach 5ft and Instant Release is limited to 5ft and 1 round. Enchant's
+  duration is technically indefinite.
+- Clerics and warlocks cannot use components opposed to their patron's alignment.
+- A spell's complexity must fit the caster's Spell Complexity Limit, or it must be cast as a ritual.
+- The spells a caster has memorized must fit their Spell Memory Capacity in total.
+
+Every part of a spell (propulsion, container, each trigger, power source and sense component and
+each payload effect) is checked on its own and the verdict is cached by the part's values and the
+parts of the profile it depends on, so revalidating after an edit in the spell builder only checks
+the changed part. validate_library revalidates a whole library across a process pool, such as after
+a rules patch.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+import math
+from typing import Any, Hashable, Iterable, Sequence
+
+from instrumentation import span
+from rituals import minimum_step
+from spell_costs import component_terms
+
+
+# Delivery method name -> (maximum range in ft, extra range in ft per caster level, maximum
+# duration in rounds, or timeframe steps for Enchant).
+DELIVERY_LIMITS: dict[str, tuple[float, float, float]] = {
+    "INSTANT_RELEASE": (5, 0, 1),
+    "TOUCH": (5, 0, 10),
+    "RANGED": (0, 100, 10),
+    "SELF": (0, 0, 10),
+    "ENCHANT": (5, 0, math.inf),
+}
+
+# Caster classes whose components must not oppose their patron's alignment.
+PATRON_CLASSES: frozenset[str] = frozenset(("cleric", "warlock"))
+
+ALIGNMENT_OPPOSITES: dict[str, str] = {
+    "good": "evil",
+    "evil": "good",
+    "lawful": "chaotic",
+    "chaotic": "lawful",
+}
+
+
+class Violation:
+    """One rule a spell breaks."""
+    __slots__ = ("part", "message")
+
+    def __init__(self, part: str, message: str) -> None:
+        """Initialize a Violation instance.
+
+        Args:
+            part (str):
+                The part of the spell at fault, such as "propulsion" or "trigger[1]".
+            message (str):
+                What is wrong.
+        """
+        self.part: str = part
+        self.message: str = message
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, Violation)
+            and self.part == other.part and self.message == other.message
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.part, self.message))
+
+    def __repr__(self) -> str:
+        return f"{self.part}: {self.message}"
+
+
+class CasterProfile:
+    """What a caster is allowed to cast."""
+    __slots__ = (
+        "level", "caster_class", "patron_alignment", "complexity_limit", "memory_capacity")
+
+    def __init__(
+            self,
+            level: int,
+            complexity_limit: float,
+            memory_capacity: float,
+            caster_class: str = "",
+            patron_alignment: str | None = None
+        ) -> None:
+        """Initialize a CasterProfile instance.
+
+        Args:
+            level (int):
+                The caster's level.
+            complexity_limit (float):
+                The caster's Spell Complexity Limit.
+            memory_capacity (float):
+                The caster's Spell Memory Capacity.
+            caster_class (str, optional):
+                The caster's class, such as "wizard" or "cleric". Defaults to "".
+            patron_alignment (str | None, optional):
+                The alignment of a cleric's deity or a warlock's patron, such as "Lawful Good".
+                Defaults to None.
+        """
+        self.level: int = level
+        self.complexity_limit: float = complexity_limit
+        self.memory_capacity: float = memory_capacity
+        self.caster_class: str = caster_class
+        self.patron_alignment: str | None = patron_alignment
+
+    @classmethod
+    def from_character(
+            cls,
+            character: Any,
+            level: int,
+            caster_class: str = "",
+            patron_alignment: str | None = None
+        ) -> "CasterProfile":
+        """Build a profile from a player.Character's magical stats.
+
+        Args:
+            character (Any):
+                A player.Character.
+            level (int):
+                The character's level.
+            caster_class (str, optional):
+                The character's class. Defaults to "".
+            patron_alignment (str | None, optional):
+                The alignment of the character's deity or patron. Defaults to None.
+
+        Returns:
+            CasterProfile: The profile.
+        """
+        return cls(
+            level,
+            character["Intelligence.Magical.Spell Complexity Limit"],
+            character["Intelligence.Magical.Spell Memory Capacity"],
+            caster_class,
+            patron_alignment,
+        )
+
+    @property
+    def barred_alignments(self) -> frozenset[str]:
+        """The component alignments this caster cannot use."""
+        if self.caster_class.lower() not in PATRON_CLASSES or not self.patron_alignment:
+            return frozenset()
+        return frozenset(
+            ALIGNMENT_OPPOSITES[word]
+            for word in self.patron_alignment.lower().split() if word in ALIGNMENT_OPPOSITES)
+
+
+def _parts(slot: Any) -> tuple:
+    if slot is None:
+        return ()
+    return tuple(slot) if isinstance(slot, (list, tuple)) else (slot,)
+
+
+def check_propulsion(propulsion: Any, level: int) -> tuple[Violation, ...]:
+    """Check a propulsion's range and duration against its delivery method's limits.
+
+    Args:
+        propulsion (Any):
+            A magic_2.Propulsion.
+        level (int):
+            The caster's level.
+
+    Returns:
+        tuple[Violation, ...]: The violations.
+    """
+    name = propulsion.method.name
+    limits = DELIVERY_LIMITS.get(name)
+    if limits is None:
+        return ()
+    base_range, range_per_level, max_duration = limits
+    max_range = base_range + range_per_level * level
+    violations = []
+    if propulsion.range_ft < 0:
+        violations.append(Violation("propulsion", "Range cannot be negative"))
+    elif propulsion.range_ft > max_range:
+        violations.append(Violation(
+            "propulsion", f"{name} reaches at most {max_range:g}ft, not {propulsion.range_ft:g}ft"))
+    if propulsion.duration < 1:
+        violations.append(Violation("propulsion", "Duration must be at least 1"))
+    elif propulsion.duration > max_duration:
+        violations.append(Violation(
+            "propulsion", f"{name} lasts at most {max_duration:g} rounds, not {propulsion.duration}"))
+    return tuple(violations)
+
+
+def check_container(container: Any) -> tuple[Violation, ...]:
+    """Check a container's volume and target count.
+
+    Args:
+        container (Any):
+            A magic_2.Container.
+
+    Returns:
+        tuple[Violation, ...]: The violations.
+    """
+    violations = []
+    if container.volume < 0:
+        violations.append(Violation("container", "Volume cannot be negative"))
+    if container.count < 1:
+        violations.append(Violation("container", "A spell needs at least 1 target"))
+    return tuple(violations)
+
+
+def check_component(part: str, component: Any, barred: frozenset[str]) -> tuple[Violation, ...]:
+    """Check one trigger, power source or sense component.
+
+    Args:
+        part (str):
+            Where the component sits in the spell, such as "trigger[0]".
+        component (Any):
+            A magic_2.SpellComponent.
+        barred (frozenset[str]):
+            The lowercase alignments the caster cannot use.
+
+    Returns:
+        tuple[Violation, ...]: The violations.
+    """
+    alignment = getattr(component, "alignment", None)
+    if not alignment or not barred:
+        return ()
+    opposed = barred.intersection(alignment.lower().split())
+    if not opposed:
+        return ()
+    name = getattr(component, "name", type(component).__name__)
+    return (Violation(part, f"{name} draws on {alignment}, opposed to the caster's patron"),)
+
+
+def check_effect(part: str, effect: Any) -> tuple[Violation, ...]:
+    """Check one payload effect.
+
+    Args:
+        part (str):
+            Where the effect sits in the spell, such as "payload[0]".
+        effect (Any):
+            A magic_2.PayloadItem.
+
+    Returns:
+        tuple[Violation, ...]: The violations.
+    """
+    violations = []
+    if effect.magnitude < 0:
+        violations.append(Violation(part, f"{effect.effect_type} magnitude cannot be negative"))
+    if effect.duration < 1:
+        violations.append(Violation(part, f"{effect.effect_type} must last at least 1 round"))
+    return tuple(violations)
+
+
+class SpellValidator:
+    """Checks spells against caster profiles, caching the verdict for every spell part."""
+    def __init__(self) -> None:
+        self._verdicts: dict[Hashable, tuple[Violation, ...]] = {}
+
+    def _cached(self, key: Hashable, check, *args) -> tuple[Violation, ...]:
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            verdict = self._verdicts[key] = check(*args)
+        return verdict
+
+    def validate(self, spell: Any, profile: CasterProfile) -> list[Violation]:
+        """Check a spell against a caster.
+
+        Args:
+            spell (Any):
+                A magic_2.Spell.
+            profile (CasterProfile):
+                The caster.
+
+        Returns:
+            list[Violation]: Every violation, empty if the caster can cast the spell.
+        """
+        with span("validation"):
+            return self._validate(spell, profile)
+
+    def _validate(self, spell: Any, profile: CasterProfile) -> list[Violation]:
+        violations: list[Violation] = []
+        propulsion = spell.propulsion
+        if propulsion is not None:
+            key = ("propulsion", propulsion.method.name, propulsion.range_ft,
+                   propulsion.duration, profile.level)
+            violations.extend(self._cached(key, check_propulsion, propulsion, profile.level))
+        container = spell.container
+        if container is not None:
+            key = ("container", container.volume, container.count)
+            violations.extend(self._cached(key, check_container, container))
+
+        barred = profile.barred_alignments
+        for slot in ("trigger", "power_source", "senses"):
+            for position, component in enumerate(_parts(getattr(spell, slot))):
+                part = f"{slot}[{position}]"
+                key = (part, getattr(component, "name", None), getattr(component, "alignment", None),
+                       component_terms(component), barred)
+                violations.extend(self._cached(key, check_component, part, component, barred))
+
+        for position, effect in enumerate(getattr(spell.payload, "effects", ())):
+            part = f"payload[{position}]"
+            key = (part, effect.effect_type, effect.magnitude, effect.duration)
+            violations.extend(self._cached(key, check_effect, part, effect))
+
+        complexity = spell.complexity
+        if complexity > profile.complexity_limit:
+            step = minimum_step(complexity, profile.complexity_limit)
+            hint = "no ritual brings it in reach" if step is None else "it must be cast as a ritual"
+            violations.append(Violation(
+                "spell",
+                f"Complexity {complexity} exceeds the caster's limit of "
+                f"{profile.complexity_limit:g}; {hint}"))
+        return violations
+
+    def validate_memorized(self, spells: Iterable[Any], profile: CasterProfile) -> list[Violation]:
+        """Check a caster's memorized spells together, including their Spell Memory Capacity.
+
+        Args:
+            spells (Iterable[Any]):
+                The memorized magic_2.Spells.
+            profile (CasterProfile):
+                The caster.
+
+        Returns:
+            list[Violation]: Every violation, each prefixed with its spell's name.
+        """
+        violations = []
+        total = 0
+        for spell in spells:
+            total += spell.complexity
+            violations.extend(
+                Violation(f"{spell.name}.{violation.part}", violation.message)
+                for violation in self.validate(spell, profile))
+        if total > profile.memory_capacity:
+            violations.append(Violation(
+                "memory",
+                f"Memorized complexity {total} exceeds the caster's Spell Memory Capacity of "
+                f"{profile.memory_capacity:g}"))
+        return violations
+
+    def clear(self) -> None:
+        """Forget every cached verdict, such as after a rules patch."""
+        self._verdicts.clear()
+
+
+def _validate_block(spells: Sequence[Any], profile: CasterProfile) -> list[list[Violation]]:
+    """Validate a block of spells in a worker process with its own verdict cache."""
+    validator = SpellValidator()
+    return [validator.validate(spell, profile) for spell in spells]
+
+
+def validate_library(
+        spells: Sequence[Any],
+        profile: CasterProfile,
+        workers: int | None = None,
+        block_size: int = 1024
+    ) -> list[list[Violation]]:
+    """Validate every spell in a library against a caster across a process pool.
+
+    Args:
+        spells (Sequence[Any]):
+            The magic_2.Spells.
+        profile (CasterProfile):
+            The caster.
+        workers (int | None, optional):
+            Worker processes, 1 to run in this process, None for one per core. Defaults to None.
+        block_size (int, optional):
+            Spells sent to a worker at a time. Defaults to 1024.
+
+    Returns:
+        list[list[Violation]]: The violations of each spell, in order.
+    """
+    if workers == 1 or len(spells) <= block_size:
+        return _validate_block(spells, profile)
+
+    blocks = [spells[start:start + block_size] for start in range(0, len(spells), block_size)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for block in pool.map(_validate_block, blocks, [profile] * len(blocks)):
+            results.extend(block)
+    return results
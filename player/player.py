@@ -115,4 +115,231 @@ Stats/skills:
             - Herbalism
             - Trapping
             - Ropework (using ropes for climbing, binding, and other tasks. Agility can alternatively be used for more physical ropework tasks)
-"""
\ No newline at end of file
+"""
+
+from array import array
+import sys
+from typing import Callable
+
+
+def _parse_stat_tree(tree: str) -> tuple[str, ...]:
+    """Turn the indented stat tree above into dotted stat paths, parents before children.
+
+    Args:
+        tree (str):
+            The indented "- Name (description)" tree.
+
+    Returns:
+        tuple[str, ...]: Every stat path, such as "Agility.Melee Attack.Swords".
+    """
+    paths: list[str] = []
+    stack: list[str] = []
+    for line in tree.splitlines():
+        stripped = line.strip()
+        if not stripped.startswith("- "):
+            continue
+        depth = (len(line) - len(line.lstrip()) - 4) // 4
+        name = stripped[2:].split(" (", 1)[0].strip()
+        del stack[depth:]
+        stack.append(name)
+        paths.append(sys.intern(".".join(stack)))
+    return tuple(paths)
+
+
+STAT_PATHS: tuple[str, ...] = _parse_stat_tree(__doc__)
+STAT_INDEX: dict[str, int] = {path: index for index, path in enumerate(STAT_PATHS)}
+STAT_COUNT: int = len(STAT_PATHS)
+
+
+def stat_index(path: str) -> int:
+    """Get the interned slot index of a stat path. Hot code should look this up once and use
+    Character.value(index) directly.
+
+    Args:
+        path (str):
+            A dotted stat path, such as "Strength.Endurance.Carrying Capacity".
+
+    Returns:
+        int: The slot index.
+    """
+    try:
+        return STAT_INDEX[path]
+    except KeyError:
+        raise KeyError(f"Unknown stat: {path!r}") from None
+
+
+class DerivedStat:
+    """A stat whose value is calculated from other stats, on top of its own allocated points and
+    modifiers."""
+    __slots__ = ("inputs", "formula")
+
+    def __init__(self, inputs: tuple[str, ...], formula: Callable[..., float]) -> None:
+        """Initialize a DerivedStat instance.
+
+        Args:
+            inputs (tuple[str, ...]):
+                The stat paths the formula reads, in argument order.
+            formula (Callable[..., float]):
+                Calculates the derived part of the stat from the input values.
+        """
+        self.inputs: tuple[int, ...] = tuple(stat_index(path) for path in inputs)
+        self.formula: Callable[..., float] = formula
+
+
+DERIVED_STATS: dict[str, DerivedStat] = {
+    "Strength.Endurance.Stamina Pool": DerivedStat(
+        ("Strength.Endurance",), lambda endurance: 10 + 5 * endurance),
+    "Strength.Endurance.Health Regeneration": DerivedStat(
+        ("Strength.Endurance",), lambda endurance: endurance / 2),
+    "Strength.Endurance.Carrying Capacity": DerivedStat(
+        ("Strength", "Strength.Endurance"),
+        lambda strength, endurance: 50 + 10 * strength + 5 * endurance),
+    "Willpower.Vitality": DerivedStat(
+        ("Willpower",), lambda willpower: 10 + 5 * willpower),
+    "Intelligence.Magical.Spell Complexity Limit": DerivedStat(
+        ("Intelligence.Magical",), lambda magical: 5 + 2 * magical),
+    "Intelligence.Magical.Mana Efficiency": DerivedStat(
+        ("Intelligence.Magical",), lambda magical: magical),
+    "Wisdom.Magical.Mana Pool": DerivedStat(
+        ("Wisdom.Magical",), lambda magical: 10 + 10 * magical),
+}
+
+# Slot index -> rule, or None for plain stats.
+_DERIVED_BY_INDEX: tuple[DerivedStat | None, ...] = tuple(
+    DERIVED_STATS.get(path) for path in STAT_PATHS)
+
+
+def _build_dependents() -> tuple[tuple[int, ...], ...]:
+    """Work out, for every stat slot, every derived slot that (transitively) reads it."""
+    direct: list[set[int]] = [set() for _ in STAT_PATHS]
+    for index, rule in enumerate(_DERIVED_BY_INDEX):
+        if rule is not None:
+            for source in rule.inputs:
+                direct[source].add(index)
+
+    dependents: list[tuple[int, ...]] = []
+    for index in range(STAT_COUNT):
+        seen: set[int] = set()
+        pending = list(direct[index])
+        while pending:
+            current = pending.pop()
+            if current not in seen:
+                seen.add(current)
+                pending.extend(direct[current])
+        dependents.append(tuple(sorted(seen)))
+    return tuple(dependents)
+
+
+# Slot index -> every derived slot to mark dirty when it changes.
+STAT_DEPENDENTS: tuple[tuple[int, ...], ...] = _build_dependents()
+
+
+class Character:
+    """A creature's stats stored as flat arrays of floats, indexed by interned stat path.
+
+    Each stat has allocated points (base) and a running total of buff/debuff modifiers. Plain
+    stats are updated eagerly. Derived stats are only marked dirty when something they read
+    changes and are recalculated the next time they are read, so a buff touching one attribute
+    never recalculates the rest of the sheet.
+    """
+    __slots__ = ("name", "base", "modifiers", "values", "dirty")
+
+    def __init__(self, name: str, stats: dict[str, float] | None = None) -> None:
+        """Initialize a Character instance. Stats not given start with 0 allocated points.
+
+        Args:
+            name (str):
+                The character's name.
+            stats (dict[str, float] | None, optional):
+                Initial allocated points keyed by dotted stat path. Defaults to None.
+        """
+        self.name: str = name
+        self.base: array = array("d", bytes(8 * STAT_COUNT))
+        self.modifiers: array = array("d", bytes(8 * STAT_COUNT))
+        self.values: array = array("d", bytes(8 * STAT_COUNT))
+        self.dirty: bytearray = bytearray(
+            0 if rule is None else 1 for rule in _DERIVED_BY_INDEX)
+        if stats:
+            for path, value in stats.items():
+                self.set_base(stat_index(path), value)
+
+    def __getitem__(self, path: str) -> float:
+        return self.value(STAT_INDEX[path])
+
+    def __setitem__(self, path: str, value: float) -> None:
+        self.set_base(STAT_INDEX[path], value)
+
+    def value(self, index: int) -> float:
+        """Get the effective value of a stat slot, recalculating it first if it is dirty.
+
+        Args:
+            index (int):
+                The stat slot index.
+
+        Returns:
+            float: The effective value.
+        """
+        if self.dirty[index]:
+            rule = _DERIVED_BY_INDEX[index]
+            self.values[index] = (
+                rule.formula(*[self.value(source) for source in rule.inputs])
+                + self.base[index] + self.modifiers[index]
+            )
+            self.dirty[index] = 0
+        return self.values[index]
+
+    def set_base(self, index: int, points: float) -> None:
+        """Set the allocated points of a stat slot.
+
+        Args:
+            index (int):
+                The stat slot index.
+            points (float):
+                The allocated points.
+        """
+        self.base[index] = points
+        self._changed(index)
+
+    def modify(self, path: str, amount: float) -> None:
+        """Apply a buff (positive) or debuff (negative) to a stat. Remove it by applying the
+        opposite amount.
+
+        Args:
+            path (str):
+                A dotted stat path.
+            amount (float):
+                The change to the stat.
+        """
+        index = stat_index(path)
+        self.modifiers[index] += amount
+        self._changed(index)
+
+    def _changed(self, index: int) -> None:
+        """Refresh a plain stat slot and mark everything derived from it as dirty."""
+        if _DERIVED_BY_INDEX[index] is None:
+            self.values[index] = self.base[index] + self.modifiers[index]
+        else:
+            self.dirty[index] = 1
+        for dependent in STAT_DEPENDENTS[index]:
+            self.dirty[dependent] = 1
+
+    def copy(self, name: str | None = None) -> "Character":
+        """Create an independent copy of this character, such as a new NPC from a template.
+
+        Args:
+            name (str | None, optional):
+                The copy's name. Defaults to this character's name.
+
+        Returns:
+            Character: The copy.
+        """
+        clone = Character.__new__(Character)
+        clone.name = self.name if name is None else name
+        clone.base = array("d", self.base)
+        clone.modifiers = array("d", self.modifiers)
+        clone.values = array("d", self.values)
+        clone.dirty = bytearray(self.dirty)
+        return clone
+
+    def __repr__(self) -> str:
+        return f"Character({self.name!r})"
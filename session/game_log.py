@@ -0,0 +1,369 @@
+"""
+Event-sourced persistence for a game session, backing the VTT's create/load/connect menus.
+
+Every change to the game state (a spell cast or ending, a stat change, a token move, a payload
+effect, the start of a round) is an event appended to an append-only log, so saving is one small
+write instead of rewriting the whole session. Every snapshot_every events a compact snapshot of the
+full state is written next to the log. Loading a session reads the newest snapshot and replays only
+the events after it.
+
+Events record outcomes (rolled damage, the tile moved to, the new stat value) rather than inputs
+to random rules, so replaying the same events always rebuilds the same state. state_at rebuilds the
+state as of any event for settling rules disputes.
+
+Map tiles are stored separately by world/world_map.py; only token positions are kept here.
+
+On disk a session is a directory:
+    events.log                      records of (u32 length, u32 crc32, UTF-8 JSON event)
+    snapshots/<sequence>.json       the state after event <sequence> and the log offset after it
+
+A record cut short by a crash is detected by its length or checksum and dropped on open.
+"""
+
+
+import json
+import os
+import struct
+from typing import Any, Callable, Iterator
+from zlib import crc32
+
+
+RECORD_HEADER: struct.Struct = struct.Struct("<II")
+
+
+class Event:
+    """One change to the game state."""
+    __slots__ = ("sequence", "kind", "data")
+
+    def __init__(self, sequence: int, kind: str, data: dict[str, Any]) -> None:
+        """Initialize an Event instance.
+
+        Args:
+            sequence (int):
+                The event's position in the log, starting at 1.
+            kind (str):
+                What happened, a key of EVENT_APPLIERS.
+            data (dict[str, Any]):
+                The event's JSON-compatible details.
+        """
+        self.sequence: int = sequence
+        self.kind: str = kind
+        self.data: dict[str, Any] = data
+
+    def encode(self) -> bytes:
+        """Encode the event as a log record."""
+        body = json.dumps(
+            {"sequence": self.sequence, "kind": self.kind, "data": self.data},
+            sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return RECORD_HEADER.pack(len(body), crc32(body)) + body
+
+    def __repr__(self) -> str:
+        return f"#{self.sequence} {self.kind} {self.data}"
+
+
+class GameState:
+    """The state rebuilt from the event log."""
+    __slots__ = ("round", "tokens", "stats", "active_spells", "effects")
+
+    def __init__(self) -> None:
+        self.round: int = 0
+        # Token id -> [x, y].
+        self.tokens: dict[str, list[int]] = {}
+        # Character name -> stat path -> base value.
+        self.stats: dict[str, dict[str, float]] = {}
+        # Cast id -> the cast event's data.
+        self.active_spells: dict[str, dict[str, Any]] = {}
+        # Target -> the payload effects on it, each with the round it ends after.
+        self.effects: dict[str, list[dict[str, Any]]] = {}
+
+    def apply(self, event: Event) -> None:
+        """Apply an event to the state.
+
+        Args:
+            event (Event):
+                The event.
+
+        Raises:
+            ValueError: If the event's kind is unknown.
+        """
+        applier = EVENT_APPLIERS.get(event.kind)
+        if applier is None:
+            raise ValueError(f"Unknown event kind: {event.kind}")
+        applier(self, event.data)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Get the state as JSON-compatible data."""
+        return {
+            "round": self.round,
+            "tokens": self.tokens,
+            "stats": self.stats,
+            "active_spells": self.active_spells,
+            "effects": self.effects,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "GameState":
+        """Rebuild a state from to_dict data.
+
+        Args:
+            data (dict[str, Any]):
+                The data.
+
+        Returns:
+            GameState: The state.
+        """
+        state = cls()
+        state.round = data["round"]
+        state.tokens = data["tokens"]
+        state.stats = data["stats"]
+        state.active_spells = data["active_spells"]
+        state.effects = data["effects"]
+        return state
+
+
+def _apply_round(state: GameState, data: dict[str, Any]) -> None:
+    state.round = data["round"]
+    for target in list(state.effects):
+        remaining = [effect for effect in state.effects[target] if effect["until"] >= state.round]
+        if remaining:
+            state.effects[target] = remaining
+        else:
+            del state.effects[target]
+
+
+def _apply_move(state: GameState, data: dict[str, Any]) -> None:
+    if data.get("to") is None:
+        state.tokens.pop(data["token"], None)
+    else:
+        state.tokens[data["token"]] = list(data["to"])
+
+
+def _apply_stat(state: GameState, data: dict[str, Any]) -> None:
+    state.stats.setdefault(data["character"], {})[data["stat"]] = data["value"]
+
+
+def _apply_cast(state: GameState, data: dict[str, Any]) -> None:
+    state.active_spells[data["id"]] = data
+
+
+def _apply_spell_end(state: GameState, data: dict[str, Any]) -> None:
+    state.active_spells.pop(data["id"], None)
+
+
+def _apply_effect(state: GameState, data: dict[str, Any]) -> None:
+    state.effects.setdefault(data["target"], []).append({
+        "effect": data["effect"],
+        "magnitude": data["magnitude"],
+        "until": state.round + data.get("duration", 1) - 1,
+    })
+
+
+# Event kind -> function applying its data to a GameState. Register new kinds here.
+#   round:     {"round"}                                     a new round starts, ending effects
+#   move:      {"token", "to": [x, y] or None to remove}
+#   stat:      {"character", "stat", "value"}                a player.Character base stat
+#   cast:      {"id", "caster", "spell", "target", ...}      a spell becomes active
+#   spell_end: {"id"}                                        an active spell ends or fizzles
+#   effect:    {"target", "effect", "magnitude", "duration"} a payload effect lands
+EVENT_APPLIERS: dict[str, Callable[[GameState, dict[str, Any]], None]] = {
+    "round": _apply_round,
+    "move": _apply_move,
+    "stat": _apply_stat,
+    "cast": _apply_cast,
+    "spell_end": _apply_spell_end,
+    "effect": _apply_effect,
+}
+
+
+def _read_events(path: str, offset: int = 0) -> Iterator[tuple[Event, int]]:
+    """Read the events of a log file from an offset, stopping at the first damaged record.
+
+    Yields:
+        tuple[Event, int]: Each event and the offset just after it.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while True:
+            header = file.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            length, checksum = RECORD_HEADER.unpack(header)
+            body = file.read(length)
+            if len(body) < length or crc32(body) != checksum:
+                return
+            record = json.loads(body)
+            offset += RECORD_HEADER.size + length
+            yield Event(record["sequence"], record["kind"], record["data"]), offset
+
+
+class GameLog:
+    """An open game session: its current state and its event log."""
+    LOG_FILE: str = "events.log"
+    SNAPSHOT_DIRECTORY: str = "snapshots"
+
+    def __init__(
+            self,
+            directory: str,
+            snapshot_every: int = 1000,
+            keep_snapshots: int = 3,
+            durable: bool = False
+        ) -> None:
+        """Open or create a session, loading the newest snapshot and replaying the events after it.
+
+        Args:
+            directory (str):
+                Where the session is stored.
+            snapshot_every (int, optional):
+                Events between snapshots. Defaults to 1000.
+            keep_snapshots (int, optional):
+                Snapshots kept on disk, at least 1; older ones are deleted. Defaults to 3.
+            durable (bool, optional):
+                Whether to fsync after every event rather than leaving it to the OS. Defaults to
+                False.
+
+        Raises:
+            ValueError: If keep_snapshots is less than 1.
+        """
+        if keep_snapshots < 1:
+            raise ValueError(f"keep_snapshots must be at least 1, got {keep_snapshots}.")
+        self.directory: str = directory
+        self.snapshot_every: int = snapshot_every
+        self.keep_snapshots: int = keep_snapshots
+        self.durable: bool = durable
+        os.makedirs(os.path.join(directory, GameLog.SNAPSHOT_DIRECTORY), exist_ok=True)
+        self._log_path: str = os.path.join(directory, GameLog.LOG_FILE)
+
+        self.state, self.sequence, offset = self._load_snapshot()
+        self._since_snapshot: int = 0
+        for event, offset in _read_events(self._log_path, offset):
+            self.state.apply(event)
+            self.sequence = event.sequence
+            self._since_snapshot += 1
+
+        self._file = open(self._log_path, "ab")
+        # Drop a record cut short by a crash so new events follow the last good one.
+        self._file.truncate(offset)
+        self._file.seek(offset)
+
+    def _snapshots(self) -> list[int]:
+        """Get the sequence numbers of the snapshots on disk, oldest first."""
+        return sorted(
+            int(name.split(".")[0])
+            for name in os.listdir(os.path.join(self.directory, GameLog.SNAPSHOT_DIRECTORY))
+            if name.endswith(".json"))
+
+    def _snapshot_path(self, sequence: int) -> str:
+        return os.path.join(self.directory, GameLog.SNAPSHOT_DIRECTORY, f"{sequence:012d}.json")
+
+    def _load_snapshot(self, at_or_before: int | None = None) -> tuple[GameState, int, int]:
+        """Load the newest snapshot, optionally no newer than a sequence number.
+
+        Returns:
+            tuple[GameState, int, int]: The state, its sequence number and the log offset after it.
+        """
+        candidates = [
+            sequence for sequence in self._snapshots()
+            if at_or_before is None or sequence <= at_or_before
+        ]
+        if not candidates:
+            return GameState(), 0, 0
+        with open(self._snapshot_path(candidates[-1]), encoding="utf-8") as file:
+            snapshot = json.load(file)
+        return GameState.from_dict(snapshot["state"]), snapshot["sequence"], snapshot["offset"]
+
+    def append(self, kind: str, **data: Any) -> Event:
+        """Record an event and apply it to the current state.
+
+        Args:
+            kind (str):
+                The event's kind, a key of EVENT_APPLIERS.
+            **data (Any):
+                The event's JSON-compatible details.
+
+        Raises:
+            ValueError: If the event's kind is unknown.
+
+        Returns:
+            Event: The recorded event.
+        """
+        if kind not in EVENT_APPLIERS:
+            raise ValueError(f"Unknown event kind: {kind}")
+        event = Event(self.sequence + 1, kind, data)
+        # Encoding first round-trips the data through JSON, so the live state matches a replay.
+        record = event.encode()
+        event.data = json.loads(record[RECORD_HEADER.size:])["data"]
+        self.state.apply(event)
+        self._file.write(record)
+        if self.durable:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.sequence = event.sequence
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return event
+
+    def snapshot(self) -> None:
+        """Write a snapshot of the current state and delete the oldest ones beyond keep_snapshots."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        path = self._snapshot_path(self.sequence)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({
+                "sequence": self.sequence,
+                "offset": self._file.tell(),
+                "state": self.state.to_dict(),
+            }, file, sort_keys=True, separators=(",", ":"))
+        os.replace(path + ".tmp", path)
+        self._since_snapshot = 0
+        for sequence in self._snapshots()[:-self.keep_snapshots]:
+            os.remove(self._snapshot_path(sequence))
+
+    def events(self, start: int = 1) -> Iterator[Event]:
+        """Read the logged events from a sequence number on.
+
+        Args:
+            start (int, optional):
+                The first event to read. Defaults to 1.
+
+        Yields:
+            Event: Each event in order.
+        """
+        self._file.flush()
+        _, _, offset = self._load_snapshot(start - 1)
+        for event, _ in _read_events(self._log_path, offset):
+            if event.sequence >= start:
+                yield event
+
+    def state_at(self, sequence: int) -> GameState:
+        """Rebuild the state as it was right after an event, starting from the newest snapshot at
+        or before it.
+
+        Args:
+            sequence (int):
+                The event, 0 for the empty starting state.
+
+        Returns:
+            GameState: The state.
+        """
+        self._file.flush()
+        state, _, offset = self._load_snapshot(sequence)
+        for event, _ in _read_events(self._log_path, offset):
+            if event.sequence > sequence:
+                break
+            state.apply(event)
+        return state
+
+    def close(self) -> None:
+        """Flush and close the log."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def __enter__(self) -> "GameLog":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
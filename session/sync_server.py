@@ -0,0 +1,532 @@
+"""
+Authoritative state sync for networked tables.
+
+The server holds the table's state as entities (tokens, active spells, map edits, ...) grouped by
+layer, each entity being a flat dict of fields. Clients connect as the GM or as a player, receive
+one full snapshot and then, every tick, only the fields that changed since the previous tick. A
+client is the GM only if its HELLO carries the server's GM secret; any other client is a player,
+whatever role it asks for.
+
+Filtering follows the layer settings of the VTT's table_top.gd (any object with the attributes of
+world_map.LayerSettings):
+- Players only receive entities on layers that are visible_to_players. When a layer is hidden from
+  or revealed to players, they receive deletes for, or the full contents of, that layer.
+- Players can only change entities on layers where players_can_interact. Other updates are dropped.
+- The GM receives and can change everything.
+
+Each tick's changes are encoded once per audience (GM and players) and the same bytes are written
+to every client of that audience, so a tick costs one encode per audience rather than one per
+client, and its size depends on what changed rather than on the size of the map.
+
+Wire format: every message is a frame of HEADER (u32 body length, u8 message kind, u8 flags,
+u32 tick) followed by a compact JSON object body, zlib-compressed when FLAG_COMPRESSED is set.
+Bodies are at most MAX_FRAME_LENGTH bytes, both on the wire and decompressed; the server closes
+connections sending larger or malformed frames, including UPDATE bodies of the wrong shape. Bodies:
+    HELLO (client):    {"role": "gm" | "player", "name": str, "secret": str (GM only)}
+    SNAPSHOT, DELTA:   {"layers": {layer: settings}, "set": {layer: {entity: {field: value}}},
+                        "delete": {layer: [entity, ...]}}, deletes applied before sets
+    UPDATE (client):   {"set": ..., "delete": ...} as above
+"""
+
+
+import asyncio
+import hmac
+import json
+import struct
+from typing import Any
+import zlib
+
+
+HEADER: struct.Struct = struct.Struct("<IBBI")
+
+HELLO: int = 0
+SNAPSHOT: int = 1
+DELTA: int = 2
+UPDATE: int = 3
+
+FLAG_COMPRESSED: int = 1
+
+MAX_FRAME_LENGTH: int = 16 * 1024 * 1024
+
+GM: str = "gm"
+PLAYER: str = "player"
+
+
+class FrameError(ValueError):
+    """A frame is too long or its body is not valid (compressed) JSON."""
+
+
+def decode_body(flags: int, data: bytes, max_length: int = MAX_FRAME_LENGTH) -> dict[str, Any]:
+    """Decode a frame's body.
+
+    Args:
+        flags (int):
+            The frame's flags.
+        data (bytes):
+            The body as sent.
+        max_length (int, optional):
+            The longest body allowed once decompressed. Defaults to MAX_FRAME_LENGTH.
+
+    Raises:
+        FrameError: If the body is too long once decompressed or is not a JSON object.
+
+    Returns:
+        dict[str, Any]: The body.
+    """
+    if flags & FLAG_COMPRESSED:
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(data, max_length)
+        except zlib.error as error:
+            raise FrameError(f"Malformed compressed frame body: {error}") from error
+        if decompressor.unconsumed_tail:
+            raise FrameError(f"Frame body is longer than {max_length} bytes decompressed.")
+    try:
+        body = json.loads(data)
+    except ValueError as error:
+        raise FrameError(f"Malformed frame body: {error}") from error
+    if not isinstance(body, dict):
+        raise FrameError("Frame body is not a JSON object.")
+    return body
+
+
+def encode_frame(kind: int, tick: int, body: dict[str, Any], compress_threshold: int = 256) -> bytes:
+    """Encode a message.
+
+    Args:
+        kind (int):
+            The message kind, such as DELTA.
+        tick (int):
+            The server tick the message belongs to.
+        body (dict[str, Any]):
+            The JSON-compatible body.
+        compress_threshold (int, optional):
+            Bodies at least this many bytes long are compressed. Defaults to 256.
+
+    Returns:
+        bytes: The frame.
+    """
+    data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    flags = 0
+    if len(data) >= compress_threshold:
+        data = zlib.compress(data, 1)
+        flags |= FLAG_COMPRESSED
+    return HEADER.pack(len(data), kind, flags, tick) + data
+
+
+async def read_frame(
+        reader: asyncio.StreamReader,
+        max_length: int = MAX_FRAME_LENGTH
+    ) -> tuple[int, int, dict[str, Any]]:
+    """Read one message.
+
+    Args:
+        reader (asyncio.StreamReader):
+            The connection.
+        max_length (int, optional):
+            The longest body allowed, on the wire and decompressed. Defaults to MAX_FRAME_LENGTH.
+
+    Raises:
+        asyncio.IncompleteReadError: If the connection closes mid-frame or before one.
+        FrameError: If the frame is too long or its body is malformed.
+
+    Returns:
+        tuple[int, int, dict[str, Any]]: The message kind, tick and body.
+    """
+    length, kind, flags, tick = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > max_length:
+        raise FrameError(f"Frame body of {length} bytes is longer than {max_length} bytes.")
+    data = await reader.readexactly(length)
+    return kind, tick, decode_body(flags, data, max_length)
+
+
+def _empty_delta() -> dict[str, Any]:
+    return {"layers": {}, "set": {}, "delete": {}}
+
+
+class _Client:
+    """One connected client."""
+    __slots__ = ("name", "role", "writer")
+
+    def __init__(self, name: str, role: str, writer: asyncio.StreamWriter) -> None:
+        self.name: str = name
+        self.role: str = role
+        self.writer: asyncio.StreamWriter = writer
+
+
+class SyncServer:
+    """Keeps the authoritative table state and streams per-tick deltas to clients."""
+    def __init__(
+            self,
+            tick_rate: float = 20,
+            compress_threshold: int = 256,
+            gm_secret: str | None = None
+        ) -> None:
+        """Initialize a SyncServer instance.
+
+        Args:
+            tick_rate (float, optional):
+                Ticks per second while serving. Defaults to 20.
+            compress_threshold (int, optional):
+                Message bodies at least this many bytes long are compressed. Defaults to 256.
+            gm_secret (str | None, optional):
+                The secret a client must send to connect as the GM, None to only allow players.
+                Defaults to None.
+        """
+        self.tick_rate: float = tick_rate
+        self.compress_threshold: int = compress_threshold
+        self.gm_secret: str | None = gm_secret
+        self.tick: int = 0
+        self.layers: dict[str, Any] = {}
+        self.entities: dict[str, dict[str, dict[str, Any]]] = {}
+        self.clients: list[_Client] = []
+        self.rejected_updates: int = 0
+        # Changes since the last tick: layer -> entity -> changed field names, deleted entities
+        # and layers whose settings changed (with whether players could see them before).
+        self._changed: dict[str, dict[str, set[str]]] = {}
+        self._deleted: dict[str, set[str]] = {}
+        self._layer_changes: dict[str, bool] = {}
+        self._server: asyncio.Server | None = None
+        self._ticker: asyncio.Task | None = None
+        self._handlers: set[asyncio.Task] = set()
+
+    def set_layer(self, name: str, settings: Any) -> None:
+        """Add a layer or change its settings.
+
+        Args:
+            name (str):
+                The layer's name.
+            settings (Any):
+                A world_map.LayerSettings or any object with its attributes and to_dict.
+        """
+        if name not in self._layer_changes:
+            previous = self.layers.get(name)
+            self._layer_changes[name] = previous is not None and previous.visible_to_players
+        self.layers[name] = settings
+        self.entities.setdefault(name, {})
+
+    def set(self, layer: str, entity: str, /, **fields: Any) -> None:
+        """Create an entity or change some of its fields.
+
+        Args:
+            layer (str):
+                The entity's layer.
+            entity (str):
+                The entity's id.
+            **fields (Any):
+                The JSON-compatible fields to set, which may themselves be named layer or entity.
+
+        Raises:
+            KeyError: If the layer does not exist.
+        """
+        self._set(layer, entity, fields)
+
+    def _set(self, layer: str, entity: str, fields: dict[str, Any]) -> None:
+        if layer not in self.layers:
+            raise KeyError(f"Unknown layer: {layer}")
+        self.entities[layer].setdefault(entity, {}).update(fields)
+        self._changed.setdefault(layer, {}).setdefault(entity, set()).update(fields)
+
+    def delete(self, layer: str, entity: str) -> None:
+        """Remove an entity.
+
+        Args:
+            layer (str):
+                The entity's layer.
+            entity (str):
+                The entity's id.
+        """
+        if self.entities.get(layer, {}).pop(entity, None) is None:
+            return
+        self._changed.get(layer, {}).pop(entity, None)
+        self._deleted.setdefault(layer, set()).add(entity)
+
+    def _visible(self, layer: str, role: str) -> bool:
+        return role == GM or self.layers[layer].visible_to_players
+
+    def snapshot(self, role: str) -> dict[str, Any]:
+        """Build the full state an audience can see.
+
+        Args:
+            role (str):
+                GM or PLAYER.
+
+        Returns:
+            dict[str, Any]: The SNAPSHOT body.
+        """
+        return {
+            "layers": {name: settings.to_dict() for name, settings in self.layers.items()},
+            "set": {
+                layer: entities for layer, entities in self.entities.items()
+                if self._visible(layer, role) and entities
+            },
+            "delete": {},
+        }
+
+    def _deltas(self) -> dict[str, dict[str, Any]]:
+        """Build this tick's DELTA body for each audience and clear the pending changes."""
+        deltas = {GM: _empty_delta(), PLAYER: _empty_delta()}
+        for layer, entities in self._changed.items():
+            fields = {
+                entity: {field: self.entities[layer][entity][field] for field in changed}
+                for entity, changed in entities.items()
+            }
+            deltas[GM]["set"][layer] = fields
+            if self.layers[layer].visible_to_players:
+                deltas[PLAYER]["set"][layer] = fields
+        for layer, entities in self._deleted.items():
+            if entities:
+                deltas[GM]["delete"][layer] = sorted(entities)
+                if self.layers[layer].visible_to_players:
+                    deltas[PLAYER]["delete"][layer] = sorted(entities)
+
+        for layer, was_visible in self._layer_changes.items():
+            settings = self.layers[layer].to_dict()
+            deltas[GM]["layers"][layer] = settings
+            deltas[PLAYER]["layers"][layer] = settings
+            visible = self.layers[layer].visible_to_players
+            if visible and not was_visible:
+                # Revealed: players get the whole layer, not just this tick's changes.
+                deltas[PLAYER]["set"][layer] = self.entities[layer]
+            elif was_visible and not visible:
+                deltas[PLAYER]["set"].pop(layer, None)
+                deltas[PLAYER]["delete"][layer] = sorted(
+                    set(self.entities[layer]) | self._deleted.get(layer, set()))
+
+        self._changed = {}
+        self._deleted = {}
+        self._layer_changes = {}
+        return {
+            role: delta for role, delta in deltas.items()
+            if delta["layers"] or delta["set"] or delta["delete"]
+        }
+
+    async def flush(self) -> None:
+        """Advance one tick and send its changes to every client."""
+        self.tick += 1
+        deltas = self._deltas()
+        if not deltas:
+            return
+        frames = {
+            role: encode_frame(DELTA, self.tick, delta, self.compress_threshold)
+            for role, delta in deltas.items()
+        }
+        writers = []
+        for client in self.clients:
+            frame = frames.get(client.role)
+            if frame is not None:
+                client.writer.write(frame)
+                writers.append(client)
+        results = await asyncio.gather(
+            *(client.writer.drain() for client in writers), return_exceptions=True)
+        for client, result in zip(writers, results):
+            if isinstance(result, Exception):
+                self._disconnect(client)
+
+    def apply_update(self, role: str, body: dict[str, Any]) -> None:
+        """Apply a client's UPDATE, dropping changes to layers the client cannot interact with.
+
+        The whole body is checked before anything is applied, so a malformed one changes nothing.
+
+        Args:
+            role (str):
+                The client's role.
+            body (dict[str, Any]):
+                The UPDATE body.
+
+        Raises:
+            FrameError: If the body is not shaped like an UPDATE.
+        """
+        sets = body.get("set", {})
+        deletes = body.get("delete", {})
+        if not (isinstance(sets, dict) and all(
+                isinstance(entities, dict)
+                and all(isinstance(fields, dict) for fields in entities.values())
+                for entities in sets.values())):
+            raise FrameError("UPDATE set must map layers to entities to fields.")
+        if not (isinstance(deletes, dict) and all(
+                isinstance(entities, list) and all(isinstance(entity, str) for entity in entities)
+                for entities in deletes.values())):
+            raise FrameError("UPDATE delete must map layers to lists of entities.")
+
+        for layer, entities in sets.items():
+            if not self._may_edit(layer, role):
+                self.rejected_updates += len(entities)
+                continue
+            for entity, fields in entities.items():
+                self._set(layer, entity, fields)
+        for layer, entities in deletes.items():
+            if not self._may_edit(layer, role):
+                self.rejected_updates += len(entities)
+                continue
+            for entity in entities:
+                self.delete(layer, entity)
+
+    def _role(self, hello: dict[str, Any]) -> str:
+        """Get the role granted by a HELLO: GM with the right secret, PLAYER otherwise."""
+        secret = hello.get("secret")
+        if hello.get("role") != GM or self.gm_secret is None or not isinstance(secret, str):
+            return PLAYER
+        return GM if hmac.compare_digest(secret.encode(), self.gm_secret.encode()) else PLAYER
+
+    def _may_edit(self, layer: str, role: str) -> bool:
+        settings = self.layers.get(layer)
+        if settings is None:
+            return False
+        return role == GM or (settings.visible_to_players and settings.players_can_interact)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client = None
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            kind, _, hello = await read_frame(reader)
+            if kind != HELLO:
+                return
+            client = _Client(hello.get("name", ""), self._role(hello), writer)
+            # Joining before the drain: deltas flushed meanwhile are queued behind the snapshot.
+            writer.write(encode_frame(
+                SNAPSHOT, self.tick, self.snapshot(client.role), self.compress_threshold))
+            self.clients.append(client)
+            await writer.drain()
+            while True:
+                kind, _, body = await read_frame(reader)
+                if kind == UPDATE:
+                    self.apply_update(client.role, body)
+        except (asyncio.IncompleteReadError, ConnectionError, FrameError):
+            pass
+        finally:
+            self._handlers.discard(handler)
+            if client is not None:
+                self._disconnect(client)
+            else:
+                writer.close()
+
+    def _disconnect(self, client: _Client) -> None:
+        if client in self.clients:
+            self.clients.remove(client)
+        client.writer.close()
+
+    async def _run_ticks(self) -> None:
+        while True:
+            await asyncio.sleep(1 / self.tick_rate)
+            await self.flush()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Start accepting clients and sending ticks.
+
+        Args:
+            host (str, optional):
+                The address to listen on. Defaults to "127.0.0.1".
+            port (int, optional):
+                The port to listen on, 0 for any free port. Defaults to 0.
+
+        Returns:
+            int: The port listened on.
+        """
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._ticker = asyncio.create_task(self._run_ticks())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """Stop ticking, disconnect every client and stop listening."""
+        if self._ticker is not None:
+            self._ticker.cancel()
+        for client in list(self.clients):
+            self._disconnect(client)
+        if self._handlers:
+            # Closed connections end their handlers at the next read.
+            await asyncio.wait(self._handlers, timeout=1)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+class SyncClient:
+    """A client mirroring the state the server lets it see, for tools and loopback testing."""
+    def __init__(self, name: str, role: str = PLAYER, secret: str | None = None) -> None:
+        """Initialize a SyncClient instance.
+
+        Args:
+            name (str):
+                The client's name.
+            role (str, optional):
+                GM or PLAYER. Defaults to PLAYER.
+            secret (str | None, optional):
+                The server's GM secret, needed to connect as the GM. Defaults to None.
+        """
+        self.name: str = name
+        self.role: str = role
+        self.secret: str | None = secret
+        self.tick: int = 0
+        self.layers: dict[str, dict[str, Any]] = {}
+        self.entities: dict[str, dict[str, dict[str, Any]]] = {}
+        self.bytes_received: int = 0
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def connect(self, host: str, port: int) -> None:
+        """Connect and apply the server's snapshot.
+
+        Args:
+            host (str):
+                The server's address.
+            port (int):
+                The server's port.
+        """
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        hello = {"role": self.role, "name": self.name}
+        if self.secret is not None:
+            hello["secret"] = self.secret
+        self._writer.write(encode_frame(HELLO, 0, hello))
+        await self._writer.drain()
+        await self.receive()
+
+    async def receive(self) -> int:
+        """Wait for the next message from the server and apply it.
+
+        Raises:
+            FrameError: If the message is malformed.
+
+        Returns:
+            int: The message's tick.
+        """
+        length, kind, flags, tick = HEADER.unpack(await self._reader.readexactly(HEADER.size))
+        data = await self._reader.readexactly(length)
+        self.bytes_received += HEADER.size + length
+        body = decode_body(flags, data)
+        if kind == SNAPSHOT:
+            self.entities = {}
+        self.layers.update(body["layers"])
+        # Deletes come first: an entity deleted and recreated in one tick is in both.
+        for layer, entities in body["delete"].items():
+            mirror = self.entities.get(layer, {})
+            for entity in entities:
+                mirror.pop(entity, None)
+        for layer, entities in body["set"].items():
+            mirror = self.entities.setdefault(layer, {})
+            for entity, fields in entities.items():
+                mirror.setdefault(entity, {}).update(fields)
+        self.tick = tick
+        return tick
+
+    async def send(
+            self,
+            changes: dict[str, dict[str, dict[str, Any]]],
+            deletes: dict[str, list[str]] | None = None
+        ) -> None:
+        """Send changes to the server. Changes the client may not make are dropped by the server.
+
+        Args:
+            changes (dict[str, dict[str, dict[str, Any]]]):
+                Layer -> entity -> fields to set.
+            deletes (dict[str, list[str]] | None, optional):
+                Layer -> entities to delete. Defaults to None.
+        """
+        self._writer.write(encode_frame(UPDATE, self.tick, {"set": changes, "delete": deletes or {}}))
+        await self._writer.drain()
+
+    async def close(self) -> None:
+        """Disconnect."""
+        self._writer.close()
+        await self._writer.wait_closed()
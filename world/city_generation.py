@@ -0,0 +1,520 @@
+"""
+Seeded procedural cities, generated on demand when the party wanders off the prepared map.
+
+A city is laid out in two steps:
+1. The plan: the avenues crossing the city and the centres of its districts. The plan is small
+   and always generated in full from the seed and the region parameters.
+2. The blocks between avenues. Each block's lots, buildings, shops and residents are generated
+   from a random stream of their own, keyed by the seed and the block's position, so a block comes
+   out the same however the city is split up.
+
+Blocks are grouped into chunks of CHUNK_SIZE x CHUNK_SIZE tiles (the chunks of world_map) by the
+chunk holding their top-left corner. Chunks can be generated one at a time as the party explores
+(CityGenerator.around) or many at once across a process pool (CityGenerator.generate), and the
+same seed gives the same city whatever the worker count.
+
+Buildings and NPCs are NumPy record arrays. Names, shop kinds and occupations are stored as
+indexes into the tables below.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+from enum import IntEnum
+from typing import Iterable
+
+import numpy as np
+
+from world_map import CHUNK_SIZE, Layer, TileFlags
+
+
+STREET_WIDTH: int = 2
+AVENUE_SPACING: tuple[int, int] = (12, 21)
+LOT_WIDTH: tuple[int, int] = (3, 7)
+
+# spawn_key prefixes keeping the plan's and each block's random streams apart.
+_PLAN_STREAM: int = 0
+_BLOCK_STREAM: int = 1
+
+
+class DistrictTypes(IntEnum):
+    """The kinds of district a city is split into."""
+    MARKET = 0
+    RESIDENTIAL = 1
+    NOBLE = 2
+    CRAFTSMEN = 3
+    DOCKS = 4
+    TEMPLE = 5
+    SLUMS = 6
+
+
+class BuildingKinds(IntEnum):
+    """The kinds of building placed on lots."""
+    HOUSE = 0
+    SHOP = 1
+    TAVERN = 2
+    TEMPLE = 3
+    WORKSHOP = 4
+    WAREHOUSE = 5
+    MANOR = 6
+    SHACK = 7
+
+
+# District -> weight of each BuildingKinds member, in order.
+DISTRICT_BUILDINGS: dict[DistrictTypes, tuple[float, ...]] = {
+    DistrictTypes.MARKET: (2, 8, 3, 0.2, 1, 2, 0, 0),
+    DistrictTypes.RESIDENTIAL: (10, 1, 1, 0.2, 0.5, 0, 0.2, 0.5),
+    DistrictTypes.NOBLE: (2, 1, 0.5, 0.3, 0, 0, 6, 0),
+    DistrictTypes.CRAFTSMEN: (3, 2, 1, 0.1, 6, 1, 0, 0.5),
+    DistrictTypes.DOCKS: (2, 1, 2, 0.1, 1, 6, 0, 2),
+    DistrictTypes.TEMPLE: (3, 1, 0.5, 4, 0, 0, 0.5, 0),
+    DistrictTypes.SLUMS: (3, 0.5, 1, 0.1, 0.5, 0.5, 0, 8),
+}
+
+# Building -> (fewest, most) residents or workers.
+BUILDING_OCCUPANTS: dict[BuildingKinds, tuple[int, int]] = {
+    BuildingKinds.HOUSE: (1, 6),
+    BuildingKinds.SHOP: (1, 3),
+    BuildingKinds.TAVERN: (2, 6),
+    BuildingKinds.TEMPLE: (1, 5),
+    BuildingKinds.WORKSHOP: (1, 4),
+    BuildingKinds.WAREHOUSE: (0, 2),
+    BuildingKinds.MANOR: (3, 10),
+    BuildingKinds.SHACK: (1, 4),
+}
+
+SHOP_KINDS: tuple[str, ...] = (
+    "General Store", "Blacksmith", "Weaponsmith", "Armorer", "Alchemist", "Tailor", "Bakery",
+    "Butcher", "Bookshop", "Jeweler", "Fletcher", "Herbalist", "Enchanter", "Stablemaster",
+)
+
+OCCUPATIONS: tuple[str, ...] = (
+    "Shopkeeper", "Innkeeper", "Priest", "Craftsman", "Laborer", "Noble", "Servant", "Guard",
+    "Dockhand", "Beggar", "Merchant", "Farmer", "Scholar", "Child",
+)
+
+# Building -> (occupation of its first occupant, occupations of the others).
+BUILDING_OCCUPATIONS: dict[BuildingKinds, tuple[int, tuple[int, ...]]] = {
+    BuildingKinds.HOUSE: (4, (4, 3, 7, 10, 11, 12, 13)),
+    BuildingKinds.SHOP: (0, (0, 4, 13)),
+    BuildingKinds.TAVERN: (1, (6, 4, 13)),
+    BuildingKinds.TEMPLE: (2, (2, 6)),
+    BuildingKinds.WORKSHOP: (3, (3, 4)),
+    BuildingKinds.WAREHOUSE: (7, (4, 8)),
+    BuildingKinds.MANOR: (5, (5, 6, 7, 13)),
+    BuildingKinds.SHACK: (9, (4, 8, 9, 13)),
+}
+
+FIRST_NAMES: tuple[str, ...] = (
+    "Aldric", "Bryn", "Cora", "Dain", "Elsa", "Finn", "Greta", "Hale", "Ilsa", "Joren", "Kara",
+    "Lief", "Mara", "Nils", "Orla", "Pell", "Quinn", "Rhea", "Soren", "Tova", "Ulf", "Vera",
+    "Wren", "Yara", "Anton", "Brida", "Cedric", "Dora", "Edwin", "Fiora", "Gideon", "Hilde",
+)
+
+FAMILY_NAMES: tuple[str, ...] = (
+    "Ashford", "Blackwood", "Brightwater", "Coldbrook", "Dunmore", "Fairweather", "Greenhill",
+    "Hawthorne", "Ironside", "Kettleby", "Longstride", "Marsh", "Oakheart", "Proudfoot", "Redfern",
+    "Stonebridge", "Thatcher", "Underbough", "Westmere", "Whitlock", "Woodward", "Yarrow",
+)
+
+BUILDING_DTYPE: np.dtype = np.dtype([
+    ("id", np.int64), ("x", np.int32), ("y", np.int32), ("width", np.uint8),
+    ("height", np.uint8), ("district", np.uint8), ("kind", np.uint8), ("shop", np.int8),
+])
+NPC_DTYPE: np.dtype = np.dtype([
+    ("building", np.int64), ("first_name", np.uint16), ("family_name", np.uint16),
+    ("occupation", np.uint8), ("age", np.uint8),
+])
+
+
+class RegionParameters:
+    """What the region around a city asks of it."""
+    __slots__ = ("width", "height", "district_count", "density", "wealth", "coastal")
+
+    def __init__(
+            self,
+            width: int,
+            height: int,
+            district_count: int = 6,
+            density: float = 0.85,
+            wealth: float = 0.5,
+            coastal: bool = False
+        ) -> None:
+        """Initialize a RegionParameters instance.
+
+        Args:
+            width (int):
+                The city's width in tiles.
+            height (int):
+                The city's height in tiles.
+            district_count (int, optional):
+                The number of districts. Defaults to 6.
+            density (float, optional):
+                The share of lots that are built on, from 0 to 1. Defaults to 0.85.
+            wealth (float, optional):
+                How rich the city is, from 0 to 1. Rich cities have more noble districts, poor
+                ones more slums. Defaults to 0.5.
+            coastal (bool, optional):
+                Whether the city can have docks. Defaults to False.
+        """
+        self.width: int = width
+        self.height: int = height
+        self.district_count: int = district_count
+        self.density: float = density
+        self.wealth: float = wealth
+        self.coastal: bool = coastal
+
+
+class CityPlan:
+    """The avenues and districts of a city, which every block is generated against."""
+    __slots__ = ("seed", "region", "avenues_x", "avenues_y", "district_centers", "district_types")
+
+    def __init__(self, seed: int, region: RegionParameters) -> None:
+        """Generate the plan of a city.
+
+        Args:
+            seed (int):
+                The city's seed.
+            region (RegionParameters):
+                The region's parameters.
+        """
+        self.seed: int = seed
+        self.region: RegionParameters = region
+        generator = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(_PLAN_STREAM,)))
+        self.avenues_x: np.ndarray = self._avenues(generator, region.width)
+        self.avenues_y: np.ndarray = self._avenues(generator, region.height)
+
+        count = max(region.district_count, 1)
+        self.district_centers: np.ndarray = generator.random((count, 2)) * (region.width, region.height)
+        weights = np.array([
+            3,
+            6,
+            4 * region.wealth,
+            3,
+            3 if region.coastal else 0,
+            1,
+            4 * (1 - region.wealth),
+        ], dtype=np.float64)
+        types = generator.choice(len(DistrictTypes), size=count, p=weights / weights.sum())
+        # Every city has a market, in the district nearest its centre.
+        middle = np.argmin(np.hypot(*(self.district_centers - (region.width / 2, region.height / 2)).T))
+        types[middle] = DistrictTypes.MARKET
+        self.district_types: np.ndarray = types.astype(np.uint8)
+
+    @staticmethod
+    def _avenues(generator: np.random.Generator, length: int) -> np.ndarray:
+        """Place avenues from 0 across a length, AVENUE_SPACING apart."""
+        positions = [0]
+        while True:
+            position = positions[-1] + int(generator.integers(*AVENUE_SPACING))
+            if position >= length:
+                break
+            positions.append(position)
+        positions.append(length)
+        return np.array(positions, dtype=np.int32)
+
+    def district_at(self, x: float, y: float) -> DistrictTypes:
+        """Get the district a point belongs to, that of the nearest district centre.
+
+        Args:
+            x (float):
+                The point's column.
+            y (float):
+                The point's row.
+
+        Returns:
+            DistrictTypes: The district.
+        """
+        nearest = np.argmin(np.hypot(*(self.district_centers - (x, y)).T))
+        return DistrictTypes(int(self.district_types[nearest]))
+
+    def blocks_in_chunk(self, chunk_x: int, chunk_y: int) -> list[tuple[int, int]]:
+        """Get the blocks a chunk owns, those whose top-left corner lies inside it.
+
+        Args:
+            chunk_x (int):
+                The chunk's column.
+            chunk_y (int):
+                The chunk's row.
+
+        Returns:
+            list[tuple[int, int]]: The blocks as (column, row) indexes between avenues.
+        """
+        def owned(avenues: np.ndarray, chunk: int) -> range:
+            # Block i starts at avenues[i] + STREET_WIDTH.
+            starts = avenues[:-1] + STREET_WIDTH
+            return range(
+                int(np.searchsorted(starts, chunk * CHUNK_SIZE)),
+                int(np.searchsorted(starts, (chunk + 1) * CHUNK_SIZE)))
+
+        return [
+            (column, row)
+            for row in owned(self.avenues_y, chunk_y)
+            for column in owned(self.avenues_x, chunk_x)
+        ]
+
+    @property
+    def chunk_count(self) -> tuple[int, int]:
+        """The number of chunk columns and rows the city covers."""
+        return (-(-self.region.width // CHUNK_SIZE), -(-self.region.height // CHUNK_SIZE))
+
+
+class CityChunk:
+    """The buildings and residents of the blocks one chunk owns."""
+    __slots__ = ("chunk_x", "chunk_y", "buildings", "npcs")
+
+    def __init__(self, chunk_x: int, chunk_y: int, buildings: np.ndarray, npcs: np.ndarray) -> None:
+        """Initialize a CityChunk instance.
+
+        Args:
+            chunk_x (int):
+                The chunk's column.
+            chunk_y (int):
+                The chunk's row.
+            buildings (np.ndarray):
+                BUILDING_DTYPE records.
+            npcs (np.ndarray):
+                NPC_DTYPE records.
+        """
+        self.chunk_x: int = chunk_x
+        self.chunk_y: int = chunk_y
+        self.buildings: np.ndarray = buildings
+        self.npcs: np.ndarray = npcs
+
+
+def _generate_block(plan: CityPlan, column: int, row: int) -> tuple[list[tuple], list[tuple]]:
+    """Generate the buildings and residents of one block from its own random stream."""
+    region = plan.region
+    left = int(plan.avenues_x[column]) + STREET_WIDTH
+    right = int(plan.avenues_x[column + 1])
+    top = int(plan.avenues_y[row]) + STREET_WIDTH
+    bottom = int(plan.avenues_y[row + 1])
+    if right - left < LOT_WIDTH[0] or bottom - top < 2:
+        return [], []
+
+    generator = np.random.default_rng(
+        np.random.SeedSequence(plan.seed, spawn_key=(_BLOCK_STREAM, column, row)))
+    district = plan.district_at((left + right) / 2, (top + bottom) / 2)
+    kind_weights = np.array(DISTRICT_BUILDINGS[district])
+    kind_weights /= kind_weights.sum()
+    block_id = (row * len(plan.avenues_x) + column) * 256
+
+    # One row of lots facing each of the block's long streets, or one row if it is shallow.
+    depth = bottom - top
+    rows = ((top, depth // 2), (top + depth // 2, depth - depth // 2)) if depth >= 6 else ((top, depth),)
+    buildings = []
+    npcs = []
+    for lot_top, lot_depth in rows:
+        x = left
+        while right - x >= LOT_WIDTH[0]:
+            width = min(int(generator.integers(*LOT_WIDTH)), right - x)
+            if right - x - width < LOT_WIDTH[0]:
+                # Fold a sliver left at the end of the row into the last lot.
+                width = right - x
+            if generator.random() < region.density:
+                kind = BuildingKinds(int(generator.choice(len(BuildingKinds), p=kind_weights)))
+                shop = int(generator.integers(len(SHOP_KINDS))) if kind == BuildingKinds.SHOP else -1
+                building_id = block_id + len(buildings)
+                buildings.append((
+                    building_id, x, lot_top, min(width, 255), min(lot_depth, 255), district, kind,
+                    shop))
+
+                fewest, most = BUILDING_OCCUPANTS[kind]
+                occupants = int(generator.integers(fewest, most + 1))
+                family = int(generator.integers(len(FAMILY_NAMES)))
+                first_occupation, others = BUILDING_OCCUPATIONS[kind]
+                for number in range(occupants):
+                    occupation = first_occupation if number == 0 else others[
+                        int(generator.integers(len(others)))]
+                    age = int(generator.integers(6, 14)) if occupation == 13 else int(
+                        generator.integers(16, 80))
+                    if kind != BuildingKinds.HOUSE and number:
+                        # Only households share a family name.
+                        family = int(generator.integers(len(FAMILY_NAMES)))
+                    npcs.append((
+                        building_id, int(generator.integers(len(FIRST_NAMES))), family,
+                        occupation, age))
+            x += width
+    return buildings, npcs
+
+
+def generate_chunk(plan: CityPlan, chunk_x: int, chunk_y: int) -> CityChunk:
+    """Generate the blocks a chunk owns.
+
+    Args:
+        plan (CityPlan):
+            The city's plan.
+        chunk_x (int):
+            The chunk's column.
+        chunk_y (int):
+            The chunk's row.
+
+    Returns:
+        CityChunk: The chunk.
+    """
+    buildings = []
+    npcs = []
+    for column, row in plan.blocks_in_chunk(chunk_x, chunk_y):
+        block_buildings, block_npcs = _generate_block(plan, column, row)
+        buildings.extend(block_buildings)
+        npcs.extend(block_npcs)
+    return CityChunk(
+        chunk_x, chunk_y,
+        np.array(buildings, dtype=BUILDING_DTYPE), np.array(npcs, dtype=NPC_DTYPE))
+
+
+class CityGenerator:
+    """Generates and caches the chunks of one city."""
+    def __init__(self, seed: int, region: RegionParameters) -> None:
+        """Initialize a CityGenerator instance.
+
+        Args:
+            seed (int):
+                The city's seed.
+            region (RegionParameters):
+                The region's parameters.
+        """
+        self.plan: CityPlan = CityPlan(seed, region)
+        self.chunks: dict[tuple[int, int], CityChunk] = {}
+
+    def chunk(self, chunk_x: int, chunk_y: int) -> CityChunk:
+        """Get a chunk, generating it on first access.
+
+        Args:
+            chunk_x (int):
+                The chunk's column.
+            chunk_y (int):
+                The chunk's row.
+
+        Returns:
+            CityChunk: The chunk.
+        """
+        chunk = self.chunks.get((chunk_x, chunk_y))
+        if chunk is None:
+            chunk = self.chunks[(chunk_x, chunk_y)] = generate_chunk(self.plan, chunk_x, chunk_y)
+        return chunk
+
+    def around(self, x: int, y: int, radius: int) -> list[CityChunk]:
+        """Get every chunk within a radius of a tile, such as around the party.
+
+        Args:
+            x (int):
+                The tile's column.
+            y (int):
+                The tile's row.
+            radius (int):
+                The radius in tiles.
+
+        Returns:
+            list[CityChunk]: The chunks.
+        """
+        columns, rows = self.plan.chunk_count
+        return [
+            self.chunk(chunk_x, chunk_y)
+            for chunk_y in range(max((y - radius) // CHUNK_SIZE, 0), min((y + radius) // CHUNK_SIZE + 1, rows))
+            for chunk_x in range(max((x - radius) // CHUNK_SIZE, 0), min((x + radius) // CHUNK_SIZE + 1, columns))
+        ]
+
+    def generate(
+            self,
+            chunks: Iterable[tuple[int, int]] | None = None,
+            workers: int | None = None
+        ) -> list[CityChunk]:
+        """Generate many chunks at once across a process pool.
+
+        Args:
+            chunks (Iterable[tuple[int, int]] | None, optional):
+                The chunks as (column, row), None for the whole city. Defaults to None.
+            workers (int | None, optional):
+                Worker processes, 1 to run in this process, None for one per core. Defaults to None.
+
+        Returns:
+            list[CityChunk]: The chunks, in the order requested.
+        """
+        if chunks is None:
+            columns, rows = self.plan.chunk_count
+            chunks = [(chunk_x, chunk_y) for chunk_y in range(rows) for chunk_x in range(columns)]
+        chunks = list(chunks)
+        missing = [coordinates for coordinates in chunks if coordinates not in self.chunks]
+        if workers == 1 or len(missing) <= 1:
+            for chunk_x, chunk_y in missing:
+                self.chunk(chunk_x, chunk_y)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                generated = pool.map(
+                    generate_chunk, [self.plan] * len(missing),
+                    [chunk_x for chunk_x, _ in missing], [chunk_y for _, chunk_y in missing],
+                    chunksize=max(len(missing) // 64, 1))
+                for coordinates, chunk in zip(missing, generated):
+                    self.chunks[coordinates] = chunk
+        return [self.chunks[coordinates] for coordinates in chunks]
+
+    def buildings(self) -> np.ndarray:
+        """Get every generated building, ordered by id."""
+        if not self.chunks:
+            return np.zeros(0, dtype=BUILDING_DTYPE)
+        buildings = np.concatenate([chunk.buildings for chunk in self.chunks.values()])
+        return buildings[np.argsort(buildings["id"], kind="stable")]
+
+    def npcs(self) -> np.ndarray:
+        """Get every generated NPC, ordered by building."""
+        if not self.chunks:
+            return np.zeros(0, dtype=NPC_DTYPE)
+        npcs = np.concatenate([chunk.npcs for chunk in self.chunks.values()])
+        return npcs[np.argsort(npcs["building"], kind="stable")]
+
+
+def npc_name(npc: np.void) -> str:
+    """Get an NPC's full name.
+
+    Args:
+        npc (np.void):
+            An NPC_DTYPE record.
+
+    Returns:
+        str: The name.
+    """
+    return f"{FIRST_NAMES[npc['first_name']]} {FAMILY_NAMES[npc['family_name']]}"
+
+
+def describe_building(building: np.void) -> str:
+    """Describe a building for the GM.
+
+    Args:
+        building (np.void):
+            A BUILDING_DTYPE record.
+
+    Returns:
+        str: The description.
+    """
+    kind = BuildingKinds(int(building["kind"]))
+    label = SHOP_KINDS[building["shop"]] if kind == BuildingKinds.SHOP else kind.name.title()
+    district = DistrictTypes(int(building["district"])).name.title()
+    return f"{label} in the {district} district at ({building['x']}, {building['y']})"
+
+
+def stamp(layer: Layer, chunk: CityChunk, element: int = 1) -> None:
+    """Draw a chunk's buildings onto a map layer as tiles blocking movement and sight.
+
+    Args:
+        layer (Layer):
+            The layer, usually one with interacts_with_pathing set.
+        chunk (CityChunk):
+            The chunk.
+        element (int, optional):
+            The element id to give building tiles. Defaults to 1.
+    """
+    buildings = chunk.buildings
+    if not len(buildings):
+        return
+    left = int(buildings["x"].min())
+    top = int(buildings["y"].min())
+    right = int((buildings["x"] + buildings["width"]).max())
+    bottom = int((buildings["y"] + buildings["height"]).max())
+    tiles = layer.read(left, top, right - left, bottom - top)
+    blocking = np.uint8(TileFlags.BLOCKS_MOVEMENT | TileFlags.BLOCKS_SIGHT)
+    for building in buildings:
+        x, y = building["x"] - left, building["y"] - top
+        area = tiles[y:y + building["height"], x:x + building["width"]]
+        area["element"] = element
+        area["flags"] |= blocking
+    layer.write(left, top, tiles)
@@ -0,0 +1,448 @@
+"""
+Regional market simulation: supply, demand, prices and trade across every settlement at once.
+
+Every quantity is a NumPy array of goods x settlements, and one call to Economy.step advances all
+markets by one in-game day:
+1. Production (scaled by active events) is added to each market's stock.
+2. Goods flow along trade routes from markets with plenty to markets with little, toward the
+   shipment that gives both the same clearing price, as long as the gap beats the route's
+   transport cost. Flows are limited by the route's capacity and the stock at the source. Trade
+   comes before local sales so exports compete with local buyers for the day's supply.
+3. Demand falls as the price rises above the good's base price, following the good's elasticity.
+   What can be sold is sold, and the rest of the demand goes unmet.
+4. Prices drift toward the level where demand meets the supply left after trade.
+5. Stock spoils at each good's spoilage rate.
+
+Fast-forwarding (Economy.fast_forward) repeats the daily step; each day is a fixed number of array
+operations however many markets there are, so a year across a continent takes well under a
+second. All randomness (daily noise in production and demand) comes from the seed, so the same
+seed and the same calls give the same prices.
+"""
+
+
+from typing import Iterable
+
+import numpy as np
+
+
+DAYS_PER_MONTH: int = 30
+# Fraction of the gap between the current and the clearing price closed each day.
+PRICE_ADJUSTMENT: float = 0.25
+# Fraction of the shipment that would even out two markets' clearing prices carried each day.
+TRADE_RESPONSE: float = 1.0
+# Prices never leave [base / PRICE_LIMIT, base * PRICE_LIMIT].
+PRICE_LIMIT: float = 20.0
+
+
+class Good:
+    """A tradable good."""
+    __slots__ = ("name", "base_price", "elasticity", "spoilage")
+
+    def __init__(
+            self,
+            name: str,
+            base_price: float,
+            elasticity: float = 1.0,
+            spoilage: float = 0.0
+        ) -> None:
+        """Initialize a Good instance.
+
+        Args:
+            name (str):
+                The good's name.
+            base_price (float):
+                The price in gold per unit when supply meets normal demand.
+            elasticity (float, optional):
+                How strongly demand falls as the price rises. Staples such as grain are below 1,
+                luxuries above. Defaults to 1.0.
+            spoilage (float, optional):
+                Fraction of stock lost each day. Defaults to 0.0.
+        """
+        self.name: str = name
+        self.base_price: float = base_price
+        self.elasticity: float = elasticity
+        self.spoilage: float = spoilage
+
+
+DEFAULT_GOODS: tuple[Good, ...] = (
+    Good("Grain", 0.05, 0.3, 0.005),
+    Good("Meat", 0.3, 0.6, 0.05),
+    Good("Fish", 0.2, 0.6, 0.08),
+    Good("Ale", 0.04, 0.8, 0.01),
+    Good("Cloth", 0.5, 1.0),
+    Good("Timber", 0.1, 0.7),
+    Good("Iron", 1.0, 0.9),
+    Good("Tools", 2.0, 1.0),
+    Good("Weapons", 10.0, 1.3),
+    Good("Spices", 5.0, 1.6, 0.002),
+    Good("Reagents", 8.0, 1.4, 0.01),
+    Good("Jewelry", 50.0, 2.0),
+)
+
+
+class MarketEvent:
+    """A temporary change to production and demand, such as a drought, a war or a festival."""
+    __slots__ = ("name", "goods", "settlements", "production", "demand", "ends")
+
+    def __init__(
+            self,
+            name: str,
+            goods: np.ndarray,
+            settlements: np.ndarray,
+            production: float,
+            demand: float,
+            ends: int
+        ) -> None:
+        """Initialize a MarketEvent instance.
+
+        Args:
+            name (str):
+                The event's name.
+            goods (np.ndarray):
+                Indexes of the goods affected.
+            settlements (np.ndarray):
+                Indexes of the settlements affected.
+            production (float):
+                Production multiplier while active.
+            demand (float):
+                Demand multiplier while active.
+            ends (int):
+                The first day the event no longer applies.
+        """
+        self.name: str = name
+        self.goods: np.ndarray = goods
+        self.settlements: np.ndarray = settlements
+        self.production: float = production
+        self.demand: float = demand
+        self.ends: int = ends
+
+
+class Economy:
+    """The markets of every settlement in a region."""
+    def __init__(
+            self,
+            settlements: Iterable[str],
+            goods: Iterable[Good] = DEFAULT_GOODS,
+            seed: int = 0,
+            noise: float = 0.05
+        ) -> None:
+        """Initialize an Economy with no production, demand or routes.
+
+        Args:
+            settlements (Iterable[str]):
+                The settlements' names.
+            goods (Iterable[Good], optional):
+                The goods traded. Defaults to DEFAULT_GOODS.
+            seed (int, optional):
+                Seed of the daily noise. Defaults to 0.
+            noise (float, optional):
+                Standard deviation of the daily random factor on production and demand.
+                Defaults to 0.05.
+        """
+        self.settlements: list[str] = list(settlements)
+        self.goods: list[Good] = list(goods)
+        self._settlement_index: dict[str, int] = {name: i for i, name in enumerate(self.settlements)}
+        self._good_index: dict[str, int] = {good.name: i for i, good in enumerate(self.goods)}
+        self.generator: np.random.Generator = np.random.default_rng(seed)
+        self.noise: float = noise
+        self.day: int = 0
+
+        shape = (len(self.goods), len(self.settlements))
+        # Per good, as columns so they broadcast across settlements.
+        self.base_price: np.ndarray = np.array([[good.base_price] for good in self.goods])
+        self.elasticity: np.ndarray = np.array([[good.elasticity] for good in self.goods])
+        self.spoilage: np.ndarray = np.array([[good.spoilage] for good in self.goods])
+        # Goods x settlements, in units per day except stock and price.
+        self.production: np.ndarray = np.zeros(shape)
+        self.demand: np.ndarray = np.zeros(shape)
+        self.stock: np.ndarray = np.zeros(shape)
+        self.price: np.ndarray = np.repeat(self.base_price, len(self.settlements), axis=1)
+        # The last day's outcome.
+        self.sold: np.ndarray = np.zeros(shape)
+        self.unmet: np.ndarray = np.zeros(shape)
+
+        # Trade routes as parallel arrays, each usable in both directions.
+        self.route_a: np.ndarray = np.zeros(0, dtype=np.intp)
+        self.route_b: np.ndarray = np.zeros(0, dtype=np.intp)
+        self.route_cost: np.ndarray = np.zeros(0)
+        self.route_capacity: np.ndarray = np.zeros(0)
+        # Goods x routes; positive moves goods from a to b. The last day's flows.
+        self.flows: np.ndarray = np.zeros((len(self.goods), 0))
+
+        self.events: list[MarketEvent] = []
+        self._modifiers_dirty: bool = True
+        self._production_modifier: np.ndarray = np.ones(shape)
+        self._demand_modifier: np.ndarray = np.ones(shape)
+
+    def settlement(self, name: str) -> int:
+        """Get a settlement's index.
+
+        Args:
+            name (str):
+                The settlement's name.
+
+        Returns:
+            int: The index along the settlement axis.
+        """
+        return self._settlement_index[name]
+
+    def good(self, name: str) -> int:
+        """Get a good's index.
+
+        Args:
+            name (str):
+                The good's name.
+
+        Returns:
+            int: The index along the good axis.
+        """
+        return self._good_index[name]
+
+    def _indexes(self, names: str | Iterable[str] | None, index: dict[str, int]) -> np.ndarray:
+        """Turn one name, several names or None (all) into an index array."""
+        if names is None:
+            return np.arange(len(index))
+        if isinstance(names, str):
+            names = (names,)
+        return np.array([index[name] for name in names], dtype=np.intp)
+
+    def set_market(
+            self,
+            settlement: str,
+            good: str,
+            production: float | None = None,
+            demand: float | None = None,
+            stock: float | None = None
+        ) -> None:
+        """Set a settlement's production, demand or stock of a good.
+
+        Args:
+            settlement (str):
+                The settlement.
+            good (str):
+                The good.
+            production (float | None, optional):
+                Units produced per day, None to leave unchanged. Defaults to None.
+            demand (float | None, optional):
+                Units wanted per day at the base price, None to leave unchanged. Defaults to None.
+            stock (float | None, optional):
+                Units in store, None to leave unchanged. Defaults to None.
+        """
+        location = (self._good_index[good], self._settlement_index[settlement])
+        if production is not None:
+            self.production[location] = production
+        if demand is not None:
+            self.demand[location] = demand
+        if stock is not None:
+            self.stock[location] = stock
+
+    def add_route(self, a: str, b: str, cost: float, capacity: float) -> None:
+        """Connect two settlements by a trade route.
+
+        Args:
+            a (str):
+                One settlement.
+            b (str):
+                The other settlement.
+            cost (float):
+                Transport cost in gold per unit carried, in either direction.
+            capacity (float):
+                Units of each good the route can carry per day.
+        """
+        self.route_a = np.append(self.route_a, self._settlement_index[a])
+        self.route_b = np.append(self.route_b, self._settlement_index[b])
+        self.route_cost = np.append(self.route_cost, cost)
+        self.route_capacity = np.append(self.route_capacity, capacity)
+        self.flows = np.zeros((len(self.goods), len(self.route_a)))
+
+    def add_event(
+            self,
+            name: str,
+            days: int,
+            goods: str | Iterable[str] | None = None,
+            settlements: str | Iterable[str] | None = None,
+            production: float = 1.0,
+            demand: float = 1.0
+        ) -> MarketEvent:
+        """Start an event scaling production and demand for a number of days.
+
+        Args:
+            name (str):
+                The event's name.
+            days (int):
+                How many days it lasts, starting today.
+            goods (str | Iterable[str] | None, optional):
+                The goods affected, None for all. Defaults to None.
+            settlements (str | Iterable[str] | None, optional):
+                The settlements affected, None for all. Defaults to None.
+            production (float, optional):
+                Production multiplier. Defaults to 1.0.
+            demand (float, optional):
+                Demand multiplier. Defaults to 1.0.
+
+        Returns:
+            MarketEvent: The event.
+        """
+        event = MarketEvent(
+            name,
+            self._indexes(goods, self._good_index),
+            self._indexes(settlements, self._settlement_index),
+            production, demand, self.day + days)
+        self.events.append(event)
+        self._modifiers_dirty = True
+        return event
+
+    def _update_modifiers(self) -> None:
+        """Drop ended events and rebuild the production and demand multipliers if they changed."""
+        active = [event for event in self.events if event.ends > self.day]
+        if len(active) != len(self.events):
+            self.events = active
+            self._modifiers_dirty = True
+        if not self._modifiers_dirty:
+            return
+        self._production_modifier.fill(1.0)
+        self._demand_modifier.fill(1.0)
+        for event in self.events:
+            area = np.ix_(event.goods, event.settlements)
+            self._production_modifier[area] *= event.production
+            self._demand_modifier[area] *= event.demand
+        self._modifiers_dirty = False
+
+    def step(self) -> None:
+        """Advance every market by one day."""
+        self._update_modifiers()
+        shape = self.stock.shape
+        production = self.production * self._production_modifier
+        demand = self.demand * self._demand_modifier
+        if self.noise:
+            production *= np.maximum(self.generator.normal(1.0, self.noise, shape), 0.0)
+            demand *= np.maximum(self.generator.normal(1.0, self.noise, shape), 0.0)
+
+        # Production, then trade out of the day's supply, then local sales of what is left.
+        self.stock = self.stock + production
+        if len(self.route_a):
+            self._trade(demand)
+        # Prices move toward clearing: the price at which normal demand equals what is on offer
+        # today, net of exports and including imports.
+        clearing = self._clearing(demand, self.stock)
+        relative_price = self.price / self.base_price
+        wanted = demand * relative_price ** -self.elasticity
+        np.minimum(wanted, self.stock, out=self.sold)
+        np.subtract(wanted, self.sold, out=self.unmet)
+        self.stock -= self.sold
+
+        self.price += PRICE_ADJUSTMENT * (clearing - self.price)
+        np.clip(self.price, self.base_price / PRICE_LIMIT, self.base_price * PRICE_LIMIT, out=self.price)
+
+        self.stock *= 1.0 - self.spoilage
+        self.day += 1
+
+    def _clearing(self, demand: np.ndarray, offered: np.ndarray) -> np.ndarray:
+        """Get the price at which each market's normal demand buys exactly what is on offer.
+
+        A market with nothing to sell gets a price as high as the limit allows, and one with no
+        demand keeps its price.
+        """
+        ratio = demand / np.maximum(offered, 1e-9)
+        return np.where(
+            demand > 0, self.base_price * ratio ** (1.0 / np.maximum(self.elasticity, 1e-3)), self.price)
+
+    def _trade(self, demand: np.ndarray) -> None:
+        """Move goods along the trade routes toward the markets that need them most.
+
+        Args:
+            demand (np.ndarray):
+                Today's demand at the base price, goods x settlements.
+        """
+        supply_a = self.stock[:, self.route_a]
+        supply_b = self.stock[:, self.route_b]
+        demand_a = demand[:, self.route_a]
+        demand_b = demand[:, self.route_b]
+        # The shipment from a to b after which both have the same demand per unit on offer, and so
+        # the same clearing price. Negative when goods should go from b to a.
+        total = demand_a + demand_b
+        even = np.divide(
+            demand_b * supply_a - demand_a * supply_b, total, out=np.zeros_like(total), where=total > 0)
+        # Only the part of the clearing price gap beyond the transport cost is worth closing.
+        clearing = self._clearing(demand, self.stock)
+        gain = clearing[:, self.route_b] - clearing[:, self.route_a]
+        worth = np.divide(
+            np.maximum(np.sign(even) * gain - self.route_cost, 0.0), np.abs(gain),
+            out=np.zeros_like(gain), where=gain != 0)
+        # A market shares its surplus or shortage between its routes, so that together they do not
+        # overshoot.
+        count = len(self.settlements)
+        degree = np.bincount(self.route_a, minlength=count) + np.bincount(self.route_b, minlength=count)
+        flows = TRADE_RESPONSE * even * worth / np.maximum(degree[self.route_a], degree[self.route_b])
+        np.clip(flows, -self.route_capacity, self.route_capacity, out=flows)
+
+        # Scale down each source's shipments so none sends more than it has in stock. Markets are
+        # addressed by flat good * settlements + settlement indexes so bincount can sum per market.
+        size = self.stock.size
+        rows = np.arange(len(self.goods))[:, None] * len(self.settlements)
+        source = rows + np.where(flows > 0, self.route_a, self.route_b)
+        shipped = np.bincount(source.ravel(), np.abs(flows).ravel(), size).reshape(self.stock.shape)
+        scale = np.divide(self.stock, shipped, out=np.ones_like(self.stock), where=shipped > self.stock)
+        flows *= scale.ravel()[source]
+
+        moved = np.bincount((rows + self.route_b).ravel(), flows.ravel(), size)
+        moved -= np.bincount((rows + self.route_a).ravel(), flows.ravel(), size)
+        self.stock += moved.reshape(self.stock.shape)
+        np.maximum(self.stock, 0.0, out=self.stock)
+        self.flows = flows
+
+    def fast_forward(self, days: int, record_every: int = 0) -> np.ndarray | None:
+        """Advance every market by many days, such as the months between sessions.
+
+        Args:
+            days (int):
+                The number of days.
+            record_every (int, optional):
+                Record prices every this many days, 0 to record nothing. Defaults to 0.
+
+        Returns:
+            np.ndarray | None: If recording, the recorded prices shaped (records, goods,
+                settlements).
+        """
+        history = []
+        for day in range(1, days + 1):
+            self.step()
+            if record_every and day % record_every == 0:
+                history.append(self.price.copy())
+        return np.array(history) if record_every else None
+
+    def fast_forward_months(self, months: int) -> None:
+        """Advance every market by whole months.
+
+        Args:
+            months (int):
+                The number of months.
+        """
+        self.fast_forward(months * DAYS_PER_MONTH)
+
+    def price_of(self, good: str, settlement: str) -> float:
+        """Get the current price of a good in a settlement.
+
+        Args:
+            good (str):
+                The good.
+            settlement (str):
+                The settlement.
+
+        Returns:
+            float: The price in gold per unit.
+        """
+        return float(self.price[self._good_index[good], self._settlement_index[settlement]])
+
+    def price_list(self, settlement: str) -> dict[str, float]:
+        """Get a settlement's price list, such as for a shopkeeper.
+
+        Args:
+            settlement (str):
+                The settlement.
+
+        Returns:
+            dict[str, float]: Each good's name and its price in gold per unit.
+        """
+        column = self.price[:, self._settlement_index[settlement]]
+        return {good.name: float(price) for good, price in zip(self.goods, column)}
@@ -0,0 +1,331 @@
+"""
+Movement and pathfinding over the layered tile grid of a world_map.MapScale.
+
+Only layers whose settings have interacts_with_pathing affect movement. Their tile flags are
+merged per chunk and turned into a movement cost per movement profile (walking, swimming, ...)
+once, so path searches read plain arrays instead of every layer's tiles. Tokens, walls and other
+objects placed on top of the map are tracked as blocked tiles.
+
+Reachable squares for a token are found with a Dijkstra search bounded by the token's speed and
+cached per token. When a tile's blocking changes, only the cached fields that could see the change
+(the tile was reachable, or borders a reachable tile with movement to spare) are dropped.
+
+Moves are 8-directional. Orthogonal steps cost 1 tile of movement and diagonal steps cost 1.5,
+approximating the alternating 5ft/10ft diagonal rule.
+"""
+
+
+from heapq import heappop, heappush
+import math
+from typing import Any, Hashable
+
+import numpy as np
+
+from world_map import CHUNK_SIZE, MapScale, TileFlags
+
+
+Tile = tuple[int, int]
+
+DIAGONAL_COST: float = 1.5
+NEIGHBORS: tuple[tuple[int, int, float], ...] = (
+    (1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+    (1, 1, DIAGONAL_COST), (1, -1, DIAGONAL_COST), (-1, 1, DIAGONAL_COST), (-1, -1, DIAGONAL_COST),
+)
+
+
+class MovementProfile:
+    """How costly each kind of terrain is for a creature, per tile entered."""
+    __slots__ = ("name", "speed", "difficult_cost", "water_cost")
+
+    def __init__(
+            self,
+            name: str,
+            speed: float = 30,
+            difficult_cost: float = 2,
+            water_cost: float = 2
+        ) -> None:
+        """Initialize a MovementProfile instance.
+
+        Args:
+            name (str):
+                The profile's name. Profiles with the same name share cached cost maps.
+            speed (float, optional):
+                Movement per turn in feet. Defaults to 30.
+            difficult_cost (float, optional):
+                The cost of entering difficult terrain, math.inf if impassable. Defaults to 2.
+            water_cost (float, optional):
+                The cost of entering water, math.inf if impassable. Defaults to 2.
+        """
+        self.name: str = name
+        self.speed: float = speed
+        self.difficult_cost: float = difficult_cost
+        self.water_cost: float = water_cost
+
+    @property
+    def cheapest_cost(self) -> float:
+        """The least any tile can cost to enter, at most 1 (plain ground)."""
+        return min(1.0, self.difficult_cost, self.water_cost)
+
+    @classmethod
+    def from_character(cls, character: Any) -> "MovementProfile":
+        """Build a walking profile from a player.Character's Speed and Swimming.
+
+        Args:
+            character (Any):
+                A player.Character.
+
+        Returns:
+            MovementProfile: The profile.
+        """
+        speed = 30 + 5 * character["Agility.Speed"]
+        swimmer = character["Strength.Physical.Swimming"] >= 5
+        return cls(f"walk/{'swim' if swimmer else 'wade'}", speed, 2, 1 if swimmer else 2)
+
+
+class DistanceField:
+    """The cheapest movement cost from a token's tile to every tile it can reach this turn."""
+    __slots__ = ("origin", "profile", "budget", "costs")
+
+    def __init__(self, origin: Tile, profile: MovementProfile, budget: float, costs: dict[Tile, float]) -> None:
+        self.origin: Tile = origin
+        self.profile: MovementProfile = profile
+        self.budget: float = budget
+        self.costs: dict[Tile, float] = costs
+
+    def affected_by(self, tile: Tile) -> bool:
+        """Whether a change to a tile's blocking could change this field."""
+        if tile in self.costs:
+            return True
+        x, y = tile
+        # The tile may cost as little as the profile's cheapest terrain once unblocked.
+        cheapest = self.profile.cheapest_cost
+        for step_x, step_y, step in NEIGHBORS:
+            cost = self.costs.get((x + step_x, y + step_y))
+            if cost is not None and cost + step * cheapest <= self.budget:
+                return True
+        return False
+
+
+class Pathfinder:
+    """Finds paths and reachable squares on one map scale, caching cost maps and distance fields."""
+    def __init__(self, scale: MapScale) -> None:
+        """Initialize a Pathfinder instance.
+
+        Args:
+            scale (MapScale):
+                The map scale to move on.
+        """
+        self.scale: MapScale = scale
+        self.blocked: set[Tile] = set()
+        self._flags: dict[tuple[int, int], np.ndarray] = {}
+        self._costs: dict[tuple[str, int, int], np.ndarray] = {}
+        self._fields: dict[Hashable, DistanceField] = {}
+
+    def _chunk_flags(self, chunk_x: int, chunk_y: int) -> np.ndarray:
+        """Get the merged flags of every pathing layer for one chunk."""
+        flags = self._flags.get((chunk_x, chunk_y))
+        if flags is None:
+            flags = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8)
+            for layer in self.scale.layers.values():
+                if layer.settings.interacts_with_pathing:
+                    tiles = layer.chunk(chunk_x, chunk_y)
+                    if tiles is not None:
+                        flags |= tiles["flags"]
+            self._flags[(chunk_x, chunk_y)] = flags
+        return flags
+
+    def _chunk_costs(self, profile: MovementProfile, chunk_x: int, chunk_y: int) -> np.ndarray:
+        """Get a profile's cost of entering each tile of one chunk."""
+        key = (profile.name, chunk_x, chunk_y)
+        costs = self._costs.get(key)
+        if costs is None:
+            flags = self._chunk_flags(chunk_x, chunk_y)
+            costs = np.ones((CHUNK_SIZE, CHUNK_SIZE), dtype=np.float64)
+            costs[flags & TileFlags.DIFFICULT_TERRAIN != 0] = profile.difficult_cost
+            costs[flags & TileFlags.WATER != 0] = profile.water_cost
+            costs[flags & TileFlags.BLOCKS_MOVEMENT != 0] = math.inf
+            self._costs[key] = costs
+        return costs
+
+    def tile_cost(self, profile: MovementProfile, tile: Tile) -> float:
+        """Get the cost of entering a tile.
+
+        Args:
+            profile (MovementProfile):
+                The movement profile.
+            tile (Tile):
+                The tile as (x, y).
+
+        Returns:
+            float: The cost, math.inf if it cannot be entered.
+        """
+        x, y = tile
+        if not (0 <= x < self.scale.width and 0 <= y < self.scale.height) or tile in self.blocked:
+            return math.inf
+        return self._chunk_costs(profile, x // CHUNK_SIZE, y // CHUNK_SIZE)[y % CHUNK_SIZE, x % CHUNK_SIZE]
+
+    def find_path(self, start: Tile, goal: Tile, profile: MovementProfile) -> list[Tile] | None:
+        """Find the cheapest path between two tiles with A*.
+
+        Args:
+            start (Tile):
+                The starting tile.
+            goal (Tile):
+                The destination tile.
+            profile (MovementProfile):
+                The movement profile.
+
+        Returns:
+            list[Tile] | None: The tiles from start to goal, or None if the goal is unreachable.
+        """
+        goal_x, goal_y = goal
+        # Scaled by the cheapest tile the profile can enter, so it stays admissible when some
+        # terrain costs less than 1.
+        cheapest = profile.cheapest_cost
+
+        def heuristic(x: int, y: int) -> float:
+            dx, dy = abs(x - goal_x), abs(y - goal_y)
+            return cheapest * (max(dx, dy) + (DIAGONAL_COST - 1) * min(dx, dy))
+
+        best: dict[Tile, float] = {start: 0.0}
+        came_from: dict[Tile, Tile] = {}
+        queue = [(heuristic(*start), 0.0, start)]
+        while queue:
+            _, cost, tile = heappop(queue)
+            if tile == goal:
+                path = [tile]
+                while tile in came_from:
+                    tile = came_from[tile]
+                    path.append(tile)
+                return path[::-1]
+            if cost > best[tile]:
+                continue
+            x, y = tile
+            for step_x, step_y, step in NEIGHBORS:
+                neighbor = (x + step_x, y + step_y)
+                new_cost = cost + step * self.tile_cost(profile, neighbor)
+                if new_cost < best.get(neighbor, math.inf):
+                    best[neighbor] = new_cost
+                    came_from[neighbor] = tile
+                    heappush(queue, (new_cost + heuristic(*neighbor), new_cost, neighbor))
+        return None
+
+    def reachable(self, token: Hashable, origin: Tile, profile: MovementProfile) -> DistanceField:
+        """Get every tile a token can reach this turn, reusing its cached field when still valid.
+
+        Args:
+            token (Hashable):
+                The token's id.
+            origin (Tile):
+                The token's current tile.
+            profile (MovementProfile):
+                The token's movement profile.
+
+        Returns:
+            DistanceField: The reachable tiles and their movement costs in tiles.
+        """
+        budget = profile.speed / self.scale.tile_feet
+        field = self._fields.get(token)
+        if field is not None and (
+                field.origin == origin and field.profile.name == profile.name
+                and field.budget == budget):
+            return field
+
+        costs: dict[Tile, float] = {origin: 0.0}
+        queue = [(0.0, origin)]
+        while queue:
+            cost, tile = heappop(queue)
+            if cost > costs[tile]:
+                continue
+            x, y = tile
+            for step_x, step_y, step in NEIGHBORS:
+                neighbor = (x + step_x, y + step_y)
+                new_cost = cost + step * self.tile_cost(profile, neighbor)
+                if new_cost <= budget and new_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = new_cost
+                    heappush(queue, (new_cost, neighbor))
+
+        field = DistanceField(origin, profile, budget, costs)
+        self._fields[token] = field
+        return field
+
+    def forget(self, token: Hashable) -> None:
+        """Drop a token's cached field, such as when it leaves the map.
+
+        Args:
+            token (Hashable):
+                The token's id.
+        """
+        self._fields.pop(token, None)
+
+    def _tile_changed(self, tile: Tile) -> None:
+        """Drop every cached field a blocking change at a tile could affect."""
+        stale = [token for token, field in self._fields.items() if field.affected_by(tile)]
+        for token in stale:
+            del self._fields[token]
+
+    def block(self, tile: Tile) -> None:
+        """Mark a tile as blocked by an object or token.
+
+        Args:
+            tile (Tile):
+                The tile as (x, y).
+        """
+        if tile not in self.blocked:
+            self.blocked.add(tile)
+            self._tile_changed(tile)
+
+    def unblock(self, tile: Tile) -> None:
+        """Clear an object or token's blocking from a tile.
+
+        Args:
+            tile (Tile):
+                The tile as (x, y).
+        """
+        if tile in self.blocked:
+            self.blocked.discard(tile)
+            self._tile_changed(tile)
+
+    def move_blocker(self, old: Tile, new: Tile) -> None:
+        """Move a blocking object from one tile to another.
+
+        Args:
+            old (Tile):
+                The tile it leaves.
+            new (Tile):
+                The tile it enters.
+        """
+        self.unblock(old)
+        self.block(new)
+
+    def invalidate_region(self, x: int, y: int, width: int, height: int) -> None:
+        """Drop cached costs and fields after the map's tiles are edited in a region.
+
+        Args:
+            x (int):
+                The region's left column.
+            y (int):
+                The region's top row.
+            width (int):
+                The region's width in tiles.
+            height (int):
+                The region's height in tiles.
+        """
+        chunks = {
+            (chunk_x, chunk_y)
+            for chunk_x in range(x // CHUNK_SIZE, (x + width - 1) // CHUNK_SIZE + 1)
+            for chunk_y in range(y // CHUNK_SIZE, (y + height - 1) // CHUNK_SIZE + 1)
+        }
+        for chunk in chunks:
+            self._flags.pop(chunk, None)
+        for key in [key for key in self._costs if key[1:] in chunks]:
+            del self._costs[key]
+
+        stale = []
+        for token, field in self._fields.items():
+            if any(
+                    x - 1 <= tile_x <= x + width and y - 1 <= tile_y <= y + height
+                    for tile_x, tile_y in field.costs):
+                stale.append(token)
+        for token in stale:
+            del self._fields[token]
@@ -0,0 +1,245 @@
+"""
+Uniform grid spatial index of creature and object positions on the battle map.
+
+Positions are in feet. Every token is bucketed into a square cell, and an area query only visits
+the cells overlapping the area's bounding box before doing the exact shape test, so resolving an
+area spell costs roughly the number of tokens near the area instead of every token on the map.
+Moving a token only touches its old and new cells.
+
+Supports the area shapes of magic.TargetTypes (sphere, cone and line) plus custom shapes given as a
+bounding box and a containment test.
+"""
+
+
+import math
+from typing import Callable, Hashable, Iterator
+
+
+Point = tuple[float, float]
+
+
+class SpatialIndex:
+    """A uniform grid of token positions."""
+    def __init__(self, cell_size: float = 30) -> None:
+        """Initialize a SpatialIndex instance.
+
+        Args:
+            cell_size (float, optional):
+                The side length of each cell in feet. Something near a typical area radius works
+                best. Defaults to 30.
+        """
+        self.cell_size: float = cell_size
+        self.positions: dict[Hashable, Point] = {}
+        self._cells: dict[tuple[int, int], set[Hashable]] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __contains__(self, token: Hashable) -> bool:
+        return token in self.positions
+
+    def _cell(self, x: float, y: float) -> tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def insert(self, token: Hashable, position: Point) -> None:
+        """Add a token, or move it if it is already indexed.
+
+        Args:
+            token (Hashable):
+                The token's id.
+            position (Point):
+                The token's position in feet.
+        """
+        if token in self.positions:
+            self.move(token, position)
+            return
+        self.positions[token] = position
+        self._cells.setdefault(self._cell(*position), set()).add(token)
+
+    def move(self, token: Hashable, position: Point) -> None:
+        """Move an indexed token. Only touches the cells if it crosses a cell boundary.
+
+        Args:
+            token (Hashable):
+                The token's id.
+            position (Point):
+                The token's new position in feet.
+        """
+        old_cell = self._cell(*self.positions[token])
+        new_cell = self._cell(*position)
+        self.positions[token] = position
+        if old_cell != new_cell:
+            self._discard(token, old_cell)
+            self._cells.setdefault(new_cell, set()).add(token)
+
+    def remove(self, token: Hashable) -> None:
+        """Remove a token from the index.
+
+        Args:
+            token (Hashable):
+                The token's id.
+        """
+        self._discard(token, self._cell(*self.positions.pop(token)))
+
+    def _discard(self, token: Hashable, cell: tuple[int, int]) -> None:
+        bucket = self._cells[cell]
+        bucket.discard(token)
+        if not bucket:
+            del self._cells[cell]
+
+    def _candidates(
+            self,
+            min_x: float,
+            min_y: float,
+            max_x: float,
+            max_y: float
+        ) -> Iterator[tuple[Hashable, Point]]:
+        """Yield every token in the cells overlapping a bounding box."""
+        low_x, low_y = self._cell(min_x, min_y)
+        high_x, high_y = self._cell(max_x, max_y)
+        cells = self._cells
+        positions = self.positions
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > len(cells):
+            # The box covers more cells than are occupied; walk the occupied ones instead.
+            for (cell_x, cell_y), bucket in cells.items():
+                if low_x <= cell_x <= high_x and low_y <= cell_y <= high_y:
+                    for token in bucket:
+                        yield token, positions[token]
+            return
+        for cell_x in range(low_x, high_x + 1):
+            for cell_y in range(low_y, high_y + 1):
+                bucket = cells.get((cell_x, cell_y))
+                if bucket:
+                    for token in bucket:
+                        yield token, positions[token]
+
+    def sphere(self, center: Point, radius: float) -> list[Hashable]:
+        """Find every token within a radius of a point.
+
+        Args:
+            center (Point):
+                The center of the area.
+            radius (float):
+                The radius in feet.
+
+        Returns:
+            list[Hashable]: The tokens inside.
+        """
+        center_x, center_y = center
+        limit = radius * radius
+        return [
+            token for token, (x, y) in self._candidates(
+                center_x - radius, center_y - radius, center_x + radius, center_y + radius)
+            if (x - center_x) ** 2 + (y - center_y) ** 2 <= limit
+        ]
+
+    def cone(self, origin: Point, direction: float, length: float, angle: float = 53.13) -> list[Hashable]:
+        """Find every token in a cone extending from a point.
+
+        Args:
+            origin (Point):
+                The cone's point.
+            direction (float):
+                The direction the cone faces in degrees.
+            length (float):
+                The cone's length in feet.
+            angle (float, optional):
+                The cone's full opening angle in degrees. Defaults to 53.13, a cone as wide as it
+                is long.
+
+        Returns:
+            list[Hashable]: The tokens inside, excluding any exactly at the origin.
+        """
+        origin_x, origin_y = origin
+        facing_x = math.cos(math.radians(direction))
+        facing_y = math.sin(math.radians(direction))
+        min_cos = math.cos(math.radians(angle / 2))
+        limit = length * length
+        hits = []
+        for token, (x, y) in self._candidates(
+                origin_x - length, origin_y - length, origin_x + length, origin_y + length):
+            offset_x = x - origin_x
+            offset_y = y - origin_y
+            distance_sq = offset_x * offset_x + offset_y * offset_y
+            if 0 < distance_sq <= limit and (
+                    offset_x * facing_x + offset_y * facing_y >= min_cos * math.sqrt(distance_sq)):
+                hits.append(token)
+        return hits
+
+    def line(self, start: Point, end: Point, width: float = 5) -> list[Hashable]:
+        """Find every token on a straight line of a given width.
+
+        Args:
+            start (Point):
+                Where the line starts.
+            end (Point):
+                Where the line ends.
+            width (float, optional):
+                The line's width in feet. Defaults to 5.
+
+        Returns:
+            list[Hashable]: The tokens inside.
+        """
+        start_x, start_y = start
+        end_x, end_y = end
+        half = width / 2
+        span_x = end_x - start_x
+        span_y = end_y - start_y
+        length_sq = span_x * span_x + span_y * span_y
+        limit = half * half
+        hits = []
+        for token, (x, y) in self._candidates(
+                min(start_x, end_x) - half, min(start_y, end_y) - half,
+                max(start_x, end_x) + half, max(start_y, end_y) + half):
+            if length_sq:
+                along = max(0.0, min(1.0, ((x - start_x) * span_x + (y - start_y) * span_y) / length_sq))
+            else:
+                along = 0.0
+            closest_x = start_x + along * span_x
+            closest_y = start_y + along * span_y
+            if (x - closest_x) ** 2 + (y - closest_y) ** 2 <= limit:
+                hits.append(token)
+        return hits
+
+    def custom(
+            self,
+            bounds: tuple[float, float, float, float],
+            contains: Callable[[Point], bool]
+        ) -> list[Hashable]:
+        """Find every token inside a custom shape.
+
+        Args:
+            bounds (tuple[float, float, float, float]):
+                The shape's bounding box as (min x, min y, max x, max y).
+            contains (Callable[[Point], bool]):
+                Whether a position is inside the shape.
+
+        Returns:
+            list[Hashable]: The tokens inside.
+        """
+        return [token for token, position in self._candidates(*bounds) if contains(position)]
+
+    def nearest(self, position: Point, radius: float, exclude: set[Hashable] = frozenset()) -> Hashable | None:
+        """Find the closest token within a radius, such as the next arc of chain lightning.
+
+        Args:
+            position (Point):
+                Where to search from.
+            radius (float):
+                The search radius in feet.
+            exclude (set[Hashable], optional):
+                Tokens to skip. Defaults to an empty set.
+
+        Returns:
+            Hashable | None: The closest token, or None if none are in range.
+        """
+        best = None
+        best_distance = radius * radius
+        pos_x, pos_y = position
+        for token, (x, y) in self._candidates(
+                pos_x - radius, pos_y - radius, pos_x + radius, pos_y + radius):
+            distance = (x - pos_x) ** 2 + (y - pos_y) ** 2
+            if distance <= best_distance and token not in exclude:
+                best = token
+                best_distance = distance
+        return best
@@ -0,0 +1,387 @@
+"""
+Line of sight and fog of war over the layered tile grid of a world_map.MapScale.
+
+Tiles flagged BLOCKS_SIGHT on any layer block vision, as do walls, doors and other objects placed
+on top of the map. A token's field of view is found with recursive shadowcasting, one scan per
+octant around the token, and cached per token.
+
+Each octant's scan only reads tiles inside that octant, so when a wall is added, removed or moved
+only the octants of the cached fields that contain the changed tile are marked stale, and only
+those octants are scanned again the next time the field is read. A token that moves or changes its
+vision radius gets a fresh field.
+
+Cached fields answer the common questions without scanning again:
+- whether a caster can see the target of a ranged spell (magic.py requires line of sight),
+- what each player's tokens can see this turn, as a fog of war mask,
+- whether a token spots something hidden (Perception against Stealth in player.py).
+"""
+
+
+import math
+from typing import Any, Hashable, Iterable
+
+import numpy as np
+
+from world_map import CHUNK_SIZE, MapScale, TileFlags
+
+
+Tile = tuple[int, int]
+
+# (xx, xy, yx, yy) transforms from octant-local (dx, dy) offsets, with dy <= 0 and
+# dy <= dx <= 0, to map offsets.
+OCTANTS: tuple[tuple[int, int, int, int], ...] = (
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+)
+
+
+def octants_containing(origin: Tile, tile: Tile) -> list[int]:
+    """Find the octants around an origin whose scan covers a tile. Tiles on an octant's edge are
+    covered by both octants sharing that edge.
+
+    Args:
+        origin (Tile):
+            The scan's origin.
+        tile (Tile):
+            The tile.
+
+    Returns:
+        list[int]: The indexes into OCTANTS.
+    """
+    offset_x, offset_y = tile[0] - origin[0], tile[1] - origin[1]
+    found = []
+    for index, (xx, xy, yx, yy) in enumerate(OCTANTS):
+        # The transforms are signed permutations, so their inverse is their transpose.
+        dx = offset_x * xx + offset_y * yx
+        dy = offset_x * xy + offset_y * yy
+        if dy <= dx <= 0:
+            found.append(index)
+    return found
+
+
+class FieldOfView:
+    """The tiles a token can see, kept per octant so octants can be rescanned on their own."""
+    __slots__ = ("origin", "radius", "octants", "stale", "_visible")
+
+    def __init__(self, origin: Tile, radius: int) -> None:
+        """Initialize an empty FieldOfView instance with every octant stale.
+
+        Args:
+            origin (Tile):
+                The token's tile.
+            radius (int):
+                The vision radius in tiles.
+        """
+        self.origin: Tile = origin
+        self.radius: int = radius
+        self.octants: list[set[Tile]] = [set() for _ in OCTANTS]
+        self.stale: set[int] = set(range(len(OCTANTS)))
+        self._visible: frozenset[Tile] | None = None
+
+    @property
+    def visible(self) -> frozenset[Tile]:
+        """Every visible tile, including the origin."""
+        if self._visible is None:
+            self._visible = frozenset().union(*self.octants)
+        return self._visible
+
+    def __contains__(self, tile: Tile) -> bool:
+        return tile in self.visible
+
+    def mark_stale(self, tile: Tile) -> None:
+        """Mark the octants covering a tile for rescanning, if the tile is within the radius."""
+        offset_x, offset_y = tile[0] - self.origin[0], tile[1] - self.origin[1]
+        if offset_x * offset_x + offset_y * offset_y <= self.radius * (self.radius + 1):
+            self.stale.update(octants_containing(self.origin, tile))
+
+
+class VisibilityEngine:
+    """Computes and caches token fields of view on one map scale."""
+    def __init__(self, scale: MapScale) -> None:
+        """Initialize a VisibilityEngine instance.
+
+        Args:
+            scale (MapScale):
+                The map scale to see across.
+        """
+        self.scale: MapScale = scale
+        self.walls: set[Tile] = set()
+        self._opacity: dict[tuple[int, int], bytes] = {}
+        self._fields: dict[Hashable, FieldOfView] = {}
+
+    def _chunk_opacity(self, chunk_x: int, chunk_y: int) -> bytes:
+        """Get one chunk's sight blocking as one byte per tile, row by row."""
+        opacity = self._opacity.get((chunk_x, chunk_y))
+        if opacity is None:
+            flags = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=np.uint8)
+            for layer in self.scale.layers.values():
+                tiles = layer.chunk(chunk_x, chunk_y)
+                if tiles is not None:
+                    flags |= tiles["flags"]
+            opacity = ((flags & TileFlags.BLOCKS_SIGHT) != 0).astype(np.uint8).tobytes()
+            self._opacity[(chunk_x, chunk_y)] = opacity
+        return opacity
+
+    def blocks_sight(self, tile: Tile) -> bool:
+        """Whether a tile blocks sight. Tiles off the map do.
+
+        Args:
+            tile (Tile):
+                The tile as (x, y).
+
+        Returns:
+            bool: Whether it blocks sight.
+        """
+        x, y = tile
+        if not (0 <= x < self.scale.width and 0 <= y < self.scale.height) or tile in self.walls:
+            return True
+        opacity = self._chunk_opacity(x // CHUNK_SIZE, y // CHUNK_SIZE)
+        return opacity[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE] == 1
+
+    def _scan_octant(self, origin: Tile, radius: int, octant: int) -> set[Tile]:
+        """Shadowcast one octant around an origin."""
+        xx, xy, yx, yy = OCTANTS[octant]
+        origin_x, origin_y = origin
+        width, height = self.scale.width, self.scale.height
+        radius_squared = radius * (radius + 1)
+        blocks_sight = self.blocks_sight
+        visible: set[Tile] = {origin}
+
+        # (row, start slope, end slope) of each unfinished span of rows.
+        spans = [(1, 1.0, 0.0)]
+        while spans:
+            row, start, end = spans.pop()
+            if start < end:
+                continue
+            for distance in range(row, radius + 1):
+                dy = -distance
+                blocked = False
+                next_start = start
+                for dx in range(-distance, 1):
+                    left_slope = (dx - 0.5) / (dy + 0.5)
+                    right_slope = (dx + 0.5) / (dy - 0.5)
+                    if start < right_slope:
+                        continue
+                    if end > left_slope:
+                        break
+                    tile = (origin_x + dx * xx + dy * xy, origin_y + dx * yx + dy * yy)
+                    if dx * dx + dy * dy <= radius_squared and 0 <= tile[0] < width \
+                            and 0 <= tile[1] < height:
+                        visible.add(tile)
+                    opaque = blocks_sight(tile)
+                    if blocked:
+                        if opaque:
+                            next_start = right_slope
+                        else:
+                            blocked = False
+                            start = next_start
+                    elif opaque and distance < radius:
+                        blocked = True
+                        spans.append((distance + 1, start, left_slope))
+                        next_start = right_slope
+                if blocked:
+                    break
+        return visible
+
+    def field_of_view(self, token: Hashable, origin: Tile, radius: int) -> FieldOfView:
+        """Get what a token can see, rescanning only the octants that went stale.
+
+        Args:
+            token (Hashable):
+                The token's id.
+            origin (Tile):
+                The token's tile.
+            radius (int):
+                The vision radius in tiles.
+
+        Returns:
+            FieldOfView: The field.
+        """
+        field = self._fields.get(token)
+        if field is None or field.origin != origin or field.radius != radius:
+            field = FieldOfView(origin, radius)
+            self._fields[token] = field
+        if field.stale:
+            for octant in field.stale:
+                field.octants[octant] = self._scan_octant(origin, radius, octant)
+            field.stale.clear()
+            field._visible = None
+        return field
+
+    def forget(self, token: Hashable) -> None:
+        """Drop a token's cached field, such as when it leaves the map.
+
+        Args:
+            token (Hashable):
+                The token's id.
+        """
+        self._fields.pop(token, None)
+
+    def _tile_changed(self, tile: Tile) -> None:
+        for field in self._fields.values():
+            field.mark_stale(tile)
+
+    def add_wall(self, tile: Tile) -> None:
+        """Mark a tile as blocking sight because of an object, such as a closed door.
+
+        Args:
+            tile (Tile):
+                The tile as (x, y).
+        """
+        if tile not in self.walls:
+            self.walls.add(tile)
+            self._tile_changed(tile)
+
+    def remove_wall(self, tile: Tile) -> None:
+        """Clear an object's sight blocking from a tile, such as an opened door.
+
+        Args:
+            tile (Tile):
+                The tile as (x, y).
+        """
+        if tile in self.walls:
+            self.walls.discard(tile)
+            self._tile_changed(tile)
+
+    def move_wall(self, old: Tile, new: Tile) -> None:
+        """Move a sight blocking object from one tile to another.
+
+        Args:
+            old (Tile):
+                The tile it leaves.
+            new (Tile):
+                The tile it enters.
+        """
+        self.remove_wall(old)
+        self.add_wall(new)
+
+    def invalidate_region(self, x: int, y: int, width: int, height: int) -> None:
+        """Drop cached sight blocking after the map's tiles are edited in a region.
+
+        Args:
+            x (int):
+                The region's left column.
+            y (int):
+                The region's top row.
+            width (int):
+                The region's width in tiles.
+            height (int):
+                The region's height in tiles.
+        """
+        for chunk_x in range(x // CHUNK_SIZE, (x + width - 1) // CHUNK_SIZE + 1):
+            for chunk_y in range(y // CHUNK_SIZE, (y + height - 1) // CHUNK_SIZE + 1):
+                self._opacity.pop((chunk_x, chunk_y), None)
+        # A rectangle spans every octant its corners and edge midpoints fall in.
+        right, bottom = x + width - 1, y + height - 1
+        for field in self._fields.values():
+            origin_x, origin_y = field.origin
+            if x <= origin_x <= right and y <= origin_y <= bottom:
+                field.stale.update(range(len(OCTANTS)))
+                continue
+            nearest_x = min(max(origin_x, x), right)
+            nearest_y = min(max(origin_y, y), bottom)
+            if (nearest_x - origin_x) ** 2 + (nearest_y - origin_y) ** 2 \
+                    > field.radius * (field.radius + 1):
+                continue
+            points = (
+                (x, y), (right, y), (x, bottom), (right, bottom),
+                (nearest_x, y), (nearest_x, bottom), (x, nearest_y), (right, nearest_y),
+            )
+            for point in points:
+                field.stale.update(octants_containing(field.origin, point))
+
+    def line_of_sight(self, start: Tile, end: Tile) -> bool:
+        """Check whether anything blocks sight between two tiles, without a field of view.
+
+        Walks the tiles along the line between the two tile centres; the end tiles themselves do
+        not block. A single line is stricter than shadowcasting around corners, so prefer a cached
+        field of view when the viewer has one.
+
+        Args:
+            start (Tile):
+                The viewer's tile.
+            end (Tile):
+                The viewed tile.
+
+        Returns:
+            bool: Whether the end tile can be seen from the start tile.
+        """
+        start_x, start_y = start
+        end_x, end_y = end
+        steps = max(abs(end_x - start_x), abs(end_y - start_y))
+        for step in range(1, steps):
+            fraction = step / steps
+            tile = (round(start_x + (end_x - start_x) * fraction),
+                    round(start_y + (end_y - start_y) * fraction))
+            if self.blocks_sight(tile):
+                return False
+        return True
+
+    def can_target(
+            self,
+            token: Hashable,
+            origin: Tile,
+            target: Tile,
+            range_ft: float,
+            radius: int | None = None
+        ) -> bool:
+        """Check the range and line of sight requirement of a ranged spell.
+
+        Args:
+            token (Hashable):
+                The caster's token id.
+            origin (Tile):
+                The caster's tile.
+            target (Tile):
+                The target's tile.
+            range_ft (float):
+                The spell's range in feet.
+            radius (int | None, optional):
+                The caster's vision radius in tiles. If given, the caster's cached field of view
+                answers the sight check; otherwise a single line is traced. Defaults to None.
+
+        Returns:
+            bool: Whether the caster can target the tile.
+        """
+        distance = math.dist(origin, target) * self.scale.tile_feet
+        if distance > range_ft:
+            return False
+        if radius is not None:
+            return target in self.field_of_view(token, origin, radius)
+        return self.line_of_sight(origin, target)
+
+    def fog_mask(self, fields: Iterable[FieldOfView]) -> np.ndarray:
+        """Build a player's fog of war mask from their tokens' fields of view.
+
+        Args:
+            fields (Iterable[FieldOfView]):
+                The fields of the player's tokens.
+
+        Returns:
+            np.ndarray: A [y, x] bool array, True where the player can see.
+        """
+        mask = np.zeros((self.scale.height, self.scale.width), dtype=bool)
+        for field in fields:
+            visible = field.visible
+            if visible:
+                columns, rows = np.array(tuple(visible), dtype=np.intp).T
+                mask[rows, columns] = True
+        return mask
+
+    def spots(self, field: FieldOfView, tile: Tile, observer: Any, hidden: Any) -> bool:
+        """Check whether a token passively spots something hidden on a tile.
+
+        Args:
+            field (FieldOfView):
+                The observer's field of view.
+            tile (Tile):
+                The hidden thing's tile.
+            observer (Any):
+                The observing player.Character.
+            hidden (Any):
+                The hiding player.Character.
+
+        Returns:
+            bool: Whether the tile is in view and the observer's Perception beats the Stealth.
+        """
+        return tile in field and observer["Wisdom.Social.Perception"] >= hidden["Agility.Stealth"]
@@ -0,0 +1,471 @@
+"""
+Chunked tile storage for the WorldMap -> MapScale -> Layer -> Tile hierarchy sketched in the VTT's
+MapAssets/map_scale_layer.gd.
+
+Each layer stores its tiles as a typed NumPy record (element id and flag bits) split into square
+chunks. A layer backed by a directory keeps one memory-mapped .npy file per chunk, opens chunks on
+first access and closes the least recently used ones, so a continent-sized map only holds the
+chunks around the viewport in memory. Chunks that were never written are not stored at all and
+read back as empty tiles.
+
+Tile arrays are indexed [y, x].
+
+On disk a world map is a directory with a map.json describing its scales and layers and one
+subdirectory per scale and layer holding the chunk files:
+    map.json
+    <scale>/<layer>/<chunk x>_<chunk y>.npy
+"""
+
+
+from collections import OrderedDict
+from enum import IntFlag
+import json
+import os
+from typing import Iterator
+
+import numpy as np
+
+
+CHUNK_SIZE: int = 64
+TILE_DTYPE: np.dtype = np.dtype([("element", np.uint16), ("flags", np.uint8)])
+
+
+class TileFlags(IntFlag):
+    """Bit flags stored with every tile."""
+    NONE = 0
+    BLOCKS_MOVEMENT = 1
+    BLOCKS_SIGHT = 2
+    DIFFICULT_TERRAIN = 4
+    WATER = 8
+
+
+class LayerSettings:
+    """The per-layer settings listed in the VTT's table_top.gd."""
+    __slots__ = (
+        "visible_to_players", "visibility_can_be_toggled", "players_can_interact",
+        "player_clicks_pass_through", "z_index", "interacts_with_pathing",
+    )
+
+    def __init__(
+            self,
+            visible_to_players: bool = True,
+            visibility_can_be_toggled: bool = True,
+            players_can_interact: bool = True,
+            player_clicks_pass_through: bool = False,
+            z_index: int = 0,
+            interacts_with_pathing: bool = False
+        ) -> None:
+        """Initialize a LayerSettings instance.
+
+        Args:
+            visible_to_players (bool, optional):
+                Whether anyone other than the GM can see objects in the layer. Defaults to True.
+            visibility_can_be_toggled (bool, optional):
+                Whether players can hide the layer to see or click what is beneath. Defaults to
+                True.
+            players_can_interact (bool, optional):
+                Whether players can interact with anything on the layer. Defaults to True.
+            player_clicks_pass_through (bool, optional):
+                Whether clicks pass through when players cannot interact. Defaults to False.
+            z_index (int, optional):
+                The order the layers are displayed in. Defaults to 0.
+            interacts_with_pathing (bool, optional):
+                Whether objects in the layer affect movement. Defaults to False.
+        """
+        self.visible_to_players: bool = visible_to_players
+        self.visibility_can_be_toggled: bool = visibility_can_be_toggled
+        self.players_can_interact: bool = players_can_interact
+        self.player_clicks_pass_through: bool = player_clicks_pass_through
+        self.z_index: int = z_index
+        self.interacts_with_pathing: bool = interacts_with_pathing
+
+    def to_dict(self) -> dict[str, bool | int]:
+        """Convert the settings to a JSON-ready dict."""
+        return {name: getattr(self, name) for name in LayerSettings.__slots__}
+
+
+# The premade layers from table_top.gd.
+PREMADE_LAYERS: dict[str, LayerSettings] = {
+    "Map Layer": LayerSettings(
+        visible_to_players=True, visibility_can_be_toggled=True, players_can_interact=False,
+        z_index=0, interacts_with_pathing=True),
+}
+
+
+def _premade_settings(name: str) -> LayerSettings | None:
+    """Get a copy of a premade layer's settings, so editing one map's layer leaves the defaults."""
+    premade = PREMADE_LAYERS.get(name)
+    return None if premade is None else LayerSettings(**premade.to_dict())
+
+
+class Layer:
+    """One layer of tiles, stored in chunks that are loaded on demand."""
+    def __init__(
+            self,
+            name: str,
+            width: int,
+            height: int,
+            settings: LayerSettings | None = None,
+            directory: str | None = None,
+            max_loaded_chunks: int = 256
+        ) -> None:
+        """Initialize a Layer instance.
+
+        Args:
+            name (str):
+                The layer's name.
+            width (int):
+                The width in tiles.
+            height (int):
+                The height in tiles.
+            settings (LayerSettings | None, optional):
+                The layer's settings. Defaults to the LayerSettings defaults.
+            directory (str | None, optional):
+                Where to memory-map chunk files. Kept fully in memory if None. Defaults to None.
+            max_loaded_chunks (int, optional):
+                How many memory-mapped chunks stay open at once. Defaults to 256.
+        """
+        self.name: str = name
+        self.width: int = width
+        self.height: int = height
+        self.settings: LayerSettings = settings or LayerSettings()
+        self.directory: str | None = directory
+        self.max_loaded_chunks: int = max_loaded_chunks
+        self._chunks: OrderedDict[tuple[int, int], np.ndarray] = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _chunk_path(self, chunk: tuple[int, int]) -> str:
+        return os.path.join(self.directory, f"{chunk[0]}_{chunk[1]}.npy")
+
+    def chunk(self, chunk_x: int, chunk_y: int, create: bool = False) -> np.ndarray | None:
+        """Get a chunk's tiles, loading it if needed.
+
+        Args:
+            chunk_x (int):
+                The chunk column.
+            chunk_y (int):
+                The chunk row.
+            create (bool, optional):
+                Create the chunk if it does not exist yet. Defaults to False.
+
+        Returns:
+            np.ndarray | None: The chunk's CHUNK_SIZE x CHUNK_SIZE tiles, or None if it is empty.
+        """
+        key = (chunk_x, chunk_y)
+        tiles = self._chunks.get(key)
+        if tiles is not None:
+            self._chunks.move_to_end(key)
+            return tiles
+
+        if self.directory is None:
+            if not create:
+                return None
+            tiles = np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=TILE_DTYPE)
+        else:
+            path = self._chunk_path(key)
+            if os.path.exists(path):
+                tiles = np.lib.format.open_memmap(path, mode="r+")
+            elif create:
+                tiles = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=TILE_DTYPE, shape=(CHUNK_SIZE, CHUNK_SIZE))
+            else:
+                return None
+
+        self._chunks[key] = tiles
+        while self.directory is not None and len(self._chunks) > self.max_loaded_chunks:
+            _, evicted = self._chunks.popitem(last=False)
+            evicted.flush()
+        return tiles
+
+    def _chunk_spans(
+            self,
+            x: int,
+            y: int,
+            width: int,
+            height: int
+        ) -> Iterator[tuple[int, int, tuple[slice, slice], tuple[slice, slice]]]:
+        """Yield (chunk x, chunk y, chunk slice, region slice) for every chunk under a region."""
+        for chunk_y in range(y // CHUNK_SIZE, (y + height - 1) // CHUNK_SIZE + 1):
+            top = max(y, chunk_y * CHUNK_SIZE)
+            bottom = min(y + height, (chunk_y + 1) * CHUNK_SIZE)
+            for chunk_x in range(x // CHUNK_SIZE, (x + width - 1) // CHUNK_SIZE + 1):
+                left = max(x, chunk_x * CHUNK_SIZE)
+                right = min(x + width, (chunk_x + 1) * CHUNK_SIZE)
+                yield (
+                    chunk_x, chunk_y,
+                    (slice(top - chunk_y * CHUNK_SIZE, bottom - chunk_y * CHUNK_SIZE),
+                     slice(left - chunk_x * CHUNK_SIZE, right - chunk_x * CHUNK_SIZE)),
+                    (slice(top - y, bottom - y), slice(left - x, right - x)),
+                )
+
+    def _clip(self, x: int, y: int, width: int, height: int) -> tuple[int, int, int, int]:
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + width, self.width), min(y + height, self.height)
+        return left, top, max(right - left, 0), max(bottom - top, 0)
+
+    def read(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        """Copy a region of tiles. Tiles outside the layer or in empty chunks read as zeros.
+
+        Args:
+            x (int):
+                The region's left column.
+            y (int):
+                The region's top row.
+            width (int):
+                The region's width in tiles.
+            height (int):
+                The region's height in tiles.
+
+        Returns:
+            np.ndarray: The tiles, shaped (height, width).
+        """
+        region = np.zeros((height, width), dtype=TILE_DTYPE)
+        left, top, clipped_width, clipped_height = self._clip(x, y, width, height)
+        if not clipped_width or not clipped_height:
+            return region
+        for chunk_x, chunk_y, inside, outside in self._chunk_spans(
+                left, top, clipped_width, clipped_height):
+            tiles = self.chunk(chunk_x, chunk_y)
+            if tiles is not None:
+                region[top - y:, left - x:][outside] = tiles[inside]
+        return region
+
+    def write(self, x: int, y: int, tiles: np.ndarray) -> None:
+        """Write a region of tiles, creating chunks as needed. Parts outside the layer are dropped.
+
+        Args:
+            x (int):
+                The region's left column.
+            y (int):
+                The region's top row.
+            tiles (np.ndarray):
+                The TILE_DTYPE tiles to write, shaped (height, width).
+        """
+        height, width = tiles.shape
+        left, top, clipped_width, clipped_height = self._clip(x, y, width, height)
+        if not clipped_width or not clipped_height:
+            return
+        source = tiles[top - y:top - y + clipped_height, left - x:left - x + clipped_width]
+        for chunk_x, chunk_y, inside, outside in self._chunk_spans(
+                left, top, clipped_width, clipped_height):
+            self.chunk(chunk_x, chunk_y, create=True)[inside] = source[outside]
+
+    def _check_bounds(self, x: int, y: int) -> None:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f"Tile ({x}, {y}) is outside the {self.width}x{self.height} layer")
+
+    def get(self, x: int, y: int) -> np.void:
+        """Get a single tile.
+
+        Args:
+            x (int):
+                The tile's column.
+            y (int):
+                The tile's row.
+
+        Returns:
+            np.void: The tile record.
+
+        Raises:
+            IndexError: If the tile is outside the layer.
+        """
+        self._check_bounds(x, y)
+        tiles = self.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+        if tiles is None:
+            return np.zeros((), dtype=TILE_DTYPE)[()]
+        return tiles[y % CHUNK_SIZE, x % CHUNK_SIZE]
+
+    def set(self, x: int, y: int, element: int, flags: TileFlags = TileFlags.NONE) -> None:
+        """Set a single tile.
+
+        Args:
+            x (int):
+                The tile's column.
+            y (int):
+                The tile's row.
+            element (int):
+                The element id placed on the tile.
+            flags (TileFlags, optional):
+                The tile's flags. Defaults to TileFlags.NONE.
+
+        Raises:
+            IndexError: If the tile is outside the layer.
+        """
+        self._check_bounds(x, y)
+        self.chunk(x // CHUNK_SIZE, y // CHUNK_SIZE, create=True)[y % CHUNK_SIZE, x % CHUNK_SIZE] = (
+            element, flags)
+
+    def load_around(self, x: int, y: int, radius: int) -> None:
+        """Open every stored chunk within a radius of a tile, such as around the viewport, ahead
+        of reads.
+
+        Args:
+            x (int):
+                The center column.
+            y (int):
+                The center row.
+            radius (int):
+                The radius in tiles.
+        """
+        left, top, width, height = self._clip(x - radius, y - radius, 2 * radius + 1, 2 * radius + 1)
+        for chunk_x, chunk_y, _, _ in self._chunk_spans(left, top, width, height):
+            self.chunk(chunk_x, chunk_y)
+
+    def flush(self) -> None:
+        """Write every open memory-mapped chunk to disk."""
+        if self.directory is not None:
+            for tiles in self._chunks.values():
+                tiles.flush()
+
+    def close(self) -> None:
+        """Flush and release every open chunk."""
+        self.flush()
+        if self.directory is not None:
+            self._chunks.clear()
+
+
+class MapScale:
+    """One zoom level of a world map (continent, region, city, ...), holding its layers."""
+    def __init__(
+            self,
+            name: str,
+            width: int,
+            height: int,
+            tile_feet: float = 5,
+            directory: str | None = None
+        ) -> None:
+        """Initialize a MapScale instance.
+
+        Args:
+            name (str):
+                The scale's name.
+            width (int):
+                The width in tiles.
+            height (int):
+                The height in tiles.
+            tile_feet (float, optional):
+                How many feet one tile spans. Defaults to 5.
+            directory (str | None, optional):
+                Where the scale's layers store their chunks. Kept in memory if None. Defaults to
+                None.
+        """
+        self.name: str = name
+        self.width: int = width
+        self.height: int = height
+        self.tile_feet: float = tile_feet
+        self.directory: str | None = directory
+        self.layers: dict[str, Layer] = {}
+
+    def add_layer(self, name: str, settings: LayerSettings | None = None) -> Layer:
+        """Add a layer to the scale. Premade layers get their premade settings by default.
+
+        Args:
+            name (str):
+                The layer's name.
+            settings (LayerSettings | None, optional):
+                The layer's settings. Defaults to None.
+
+        Returns:
+            Layer: The new layer.
+        """
+        directory = None if self.directory is None else os.path.join(self.directory, name)
+        layer = Layer(
+            name, self.width, self.height, settings or _premade_settings(name), directory)
+        self.layers[name] = layer
+        return layer
+
+    def ordered_layers(self) -> list[Layer]:
+        """Get the layers from bottom to top by z index."""
+        return sorted(self.layers.values(), key=lambda layer: layer.settings.z_index)
+
+    def close(self) -> None:
+        """Flush and release every layer's chunks."""
+        for layer in self.layers.values():
+            layer.close()
+
+
+class WorldMap:
+    """Every scale of a campaign's map, optionally stored in a directory on disk."""
+    METADATA_FILE: str = "map.json"
+
+    def __init__(self, directory: str | None = None) -> None:
+        """Initialize a WorldMap instance.
+
+        Args:
+            directory (str | None, optional):
+                Where the map is stored. Kept in memory if None. Defaults to None.
+        """
+        self.directory: str | None = directory
+        self.scales: dict[str, MapScale] = {}
+
+    def add_scale(self, name: str, width: int, height: int, tile_feet: float = 5) -> MapScale:
+        """Add a scale to the map.
+
+        Args:
+            name (str):
+                The scale's name.
+            width (int):
+                The width in tiles.
+            height (int):
+                The height in tiles.
+            tile_feet (float, optional):
+                How many feet one tile spans. Defaults to 5.
+
+        Returns:
+            MapScale: The new scale.
+        """
+        directory = None if self.directory is None else os.path.join(self.directory, name)
+        scale = MapScale(name, width, height, tile_feet, directory)
+        self.scales[name] = scale
+        return scale
+
+    def save(self) -> None:
+        """Flush every chunk and write the map's metadata."""
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for scale in self.scales.values():
+            for layer in scale.layers.values():
+                layer.flush()
+        metadata = {
+            name: {
+                "width": scale.width,
+                "height": scale.height,
+                "tile_feet": scale.tile_feet,
+                "layers": {
+                    layer_name: layer.settings.to_dict()
+                    for layer_name, layer in scale.layers.items()
+                },
+            }
+            for name, scale in self.scales.items()
+        }
+        with open(os.path.join(self.directory, WorldMap.METADATA_FILE), "w", encoding="utf-8") as file:
+            json.dump(metadata, file, indent=4)
+
+    @classmethod
+    def open(cls, directory: str) -> "WorldMap":
+        """Open a saved map. Only the metadata is read; chunks load as they are accessed.
+
+        Args:
+            directory (str):
+                Where the map is stored.
+
+        Returns:
+            WorldMap: The map.
+        """
+        world = cls(directory)
+        with open(os.path.join(directory, WorldMap.METADATA_FILE), encoding="utf-8") as file:
+            metadata = json.load(file)
+        for name, scale_data in metadata.items():
+            scale = world.add_scale(
+                name, scale_data["width"], scale_data["height"], scale_data["tile_feet"])
+            for layer_name, settings in scale_data["layers"].items():
+                scale.add_layer(layer_name, LayerSettings(**settings))
+        return world
+
+    def close(self) -> None:
+        """Save the map and release every open chunk."""
+        self.save()
+        for scale in self.scales.values():
+            scale.close()